@@ -26,6 +26,11 @@ module dram_read_requester
         
         input  wire   [INSTRUMENT_COUNT-1:0] instr_trig_debug,
 
+        // Note on from uart_param_controller
+        input  wire        uart_note_valid,
+        input  wire  [3:0] uart_note_instrument,
+        input  wire  [6:0] uart_note_velocity,
+
         output logic [6:0] midi_key,
         output logic [6:0] midi_vel,
         output logic       midi_dout_valid
@@ -79,15 +84,34 @@ module dram_read_requester
         .receiver_axis_prog_empty()
     );
 
+    logic       midi_proc_dout_valid;
+    logic [6:0] midi_proc_key;
+    logic [6:0] midi_proc_vel;
+
     midi_processor midi_proc (
         .clk(clk),
         .rst(rst),
         .din(midi_din),
-        .dout_valid(midi_dout_valid),
-        .key(midi_key),
-        .velocity(midi_vel)
+        .dout_valid(midi_proc_dout_valid),
+        .key(midi_proc_key),
+        .velocity(midi_proc_vel)
     );
 
+    // UART notes are merged into the MIDI note stream as the instrument's
+    //  MIDI key. Both are single-cycle pulses, so they only collide if they
+    //  complete on the same clock cycle (the MIDI note is dropped).
+    always_comb begin
+        if (uart_note_valid && uart_note_instrument < INSTRUMENT_COUNT) begin
+            midi_dout_valid = 1'b1;
+            midi_key = MIDI_KEYS[uart_note_instrument];
+            midi_vel = uart_note_velocity;
+        end else begin
+            midi_dout_valid = midi_proc_dout_valid;
+            midi_key = midi_proc_key;
+            midi_vel = midi_proc_vel;
+        end
+    end
+
     // Note: velocity will be one cycle behind midi_vel
     // Also: velocity will apply to sample_mixer before corresponding
     //  samples actually get there. This shouldn't be perceptible.
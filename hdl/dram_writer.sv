@@ -25,7 +25,14 @@ module dram_writer
         output logic         fifo_receiver_axis_tvalid,
         input  wire          fifo_receiver_axis_tready,
         output logic [127:0] fifo_receiver_axis_tdata,
-        output logic         fifo_receiver_axis_tlast
+        output logic         fifo_receiver_axis_tlast,
+
+        // Single-instrument sample updates: {DRAM address, 128-bit chunk}
+        output logic         update_fifo_receiver_axis_tvalid,
+        input  wire          update_fifo_receiver_axis_tready,
+        output logic [151:0] update_fifo_receiver_axis_tdata,
+
+        output logic         sample_update_active
     );
 
     // Synchronize addr_offsets_valid to clk_pixel.
@@ -121,6 +128,67 @@ module dram_writer
     logic [23:0] addr_offset;
     logic        addr_offset_valid;
 
+    // Sample updates bypass the video stacker and write FIFO, since those
+    //  are in use once the video frame buffer is running.
+    logic [23:0] update_addr;
+    logic        update_addr_valid;
+
+    logic        update_axis_tvalid;
+    logic        update_axis_tready;
+    logic [15:0] update_axis_tdata;
+
+    logic         update_chunk_axis_tvalid;
+    logic         update_chunk_axis_tready;
+    logic [127:0] update_chunk_axis_tdata;
+
+    stacker update_stacker (
+        .clk(clk_pixel),
+        .rst(rst_pixel | update_addr_valid),
+
+        .pixel_tvalid(update_axis_tvalid),
+        .pixel_tready(update_axis_tready),
+        .pixel_tdata(update_axis_tdata),
+        .pixel_tlast(1'b0),
+
+        .chunk_tvalid(update_chunk_axis_tvalid),
+        .chunk_tready(update_chunk_axis_tready),
+        .chunk_tdata(update_chunk_axis_tdata),
+        .chunk_tlast()
+    );
+
+    // DRAM address of the next update chunk
+    logic [23:0] update_chunk_addr;
+    always_ff @ (posedge clk_pixel) begin
+        if (rst_pixel) begin
+            update_chunk_addr <= 0;
+        end else begin
+            if (update_addr_valid) begin
+                update_chunk_addr <= update_addr;
+            end else if (update_chunk_axis_tvalid && update_chunk_axis_tready) begin
+                update_chunk_addr <= update_chunk_addr + 1;
+            end
+        end
+    end
+
+    clockdomain_fifo #(
+        .DEPTH(16), .WIDTH(152), .PROGFULL_DEPTH(6)
+    ) dram_update_fifo (
+        .sender_rst(rst_pixel),
+        .sender_clk(clk_pixel),
+        .sender_axis_tvalid(update_chunk_axis_tvalid),
+        .sender_axis_tready(update_chunk_axis_tready),
+        .sender_axis_tdata({update_chunk_addr, update_chunk_axis_tdata}),
+        .sender_axis_tlast(1'b0),
+        .sender_axis_prog_full(),
+
+        .receiver_clk(clk_dram_ctrl),
+        .receiver_axis_tvalid(update_fifo_receiver_axis_tvalid),
+        .receiver_axis_tready(update_fifo_receiver_axis_tready),
+        .receiver_axis_tdata(update_fifo_receiver_axis_tdata),
+        .receiver_axis_tlast(),
+        .receiver_axis_prog_empty()
+    );
+
     sample_loader #(
         .INSTRUMENT_COUNT(INSTRUMENT_COUNT)
     ) sample_loader_i (
@@ -133,7 +201,16 @@ module dram_writer
         
         .sample_axis_tvalid(sample_axis_tvalid),
         .sample_axis_tdata(sample_axis_tdata),
-        .sample_axis_tlast(sample_axis_tlast)
+        .sample_axis_tlast(sample_axis_tlast),
+
+        .update_addr(update_addr),
+        .update_addr_valid(update_addr_valid),
+
+        .update_axis_tvalid(update_axis_tvalid),
+        .update_axis_tready(update_axis_tready),
+        .update_axis_tdata(update_axis_tdata),
+
+        .update_active(sample_update_active)
     );
 
     addr_offsets_cdc #(
@@ -0,0 +1,145 @@
+`timescale 1ns / 1ps
+`default_nettype none
+
+/*
+ * rice_decoder
+ *
+ * Streaming decoder for compressed audio samples sent by send_wav.py.
+ * Samples are delta coded (x[n] - x[n-1], 16-bit wraparound), zigzag mapped
+ * to unsigned, and Rice coded. Each block of BLOCK_SIZE samples starts with
+ * a 4-bit Rice parameter k. Each sample is q ones, a zero, then the k LSBs
+ * of u (where q = u >> k), or ESCAPE ones then the raw 16-bit u.
+ * Bits are LSB first. One bit is decoded per cycle, so each byte must be
+ * given at least 8 cycles before the next (UART bytes are much slower).
+ */
+
+module rice_decoder
+    #(
+        parameter BLOCK_SIZE = 32,
+        parameter ESCAPE = 16
+    )
+    (
+        input wire clk,
+        input wire rst,  // Also resets the predictor (start of a sample)
+
+        input wire        din_valid,
+        input wire  [7:0] din,
+
+        output logic        dout_valid,
+        output logic [15:0] dout
+    );
+
+    enum {K, Q, R} state;
+
+    logic [7:0]  bits;
+    logic [3:0]  bits_left;
+    logic        bit_in;
+    assign bit_in = bits[0];
+
+    logic [3:0]  k;
+    logic [4:0]  q;
+    logic [15:0] r;
+    logic [4:0]  r_index;
+    logic        escape;
+    logic [$clog2(BLOCK_SIZE)-1:0] block_counter;
+
+    logic [15:0] u;
+    logic [15:0] r_next;
+    logic [15:0] delta;
+    always_comb begin
+        r_next = r | ({15'b0, bit_in} << r_index);
+        if (state == Q) begin
+            // Zero-length remainder (k == 0)
+            u = {11'b0, q};
+        end else if (escape) begin
+            u = r_next;
+        end else begin
+            u = ({11'b0, q} << k) | r_next;
+        end
+        delta = (u >> 1) ^ {16{u[0]}};
+    end
+
+    logic emit;
+    assign emit = (bits_left != 0) && (
+        (state == Q && !bit_in && k == 0) ||
+        (state == R && r_index == (escape ? 15 : k - 1))
+    );
+
+    always_ff @ (posedge clk) begin
+        if (rst) begin
+            state <= K;
+            bits <= 0;
+            bits_left <= 0;
+            k <= 0;
+            q <= 0;
+            r <= 0;
+            r_index <= 0;
+            escape <= 0;
+            block_counter <= 0;
+
+            dout_valid <= 0;
+            dout <= 0;
+        end else begin
+            dout_valid <= 0;
+
+            if (din_valid) begin
+                bits <= din;
+                bits_left <= 8;
+            end else if (bits_left != 0) begin
+                bits <= bits >> 1;
+                bits_left <= bits_left - 1;
+
+                case (state)
+                    K: begin
+                        k <= {bit_in, k[3:1]};
+                        r_index <= r_index + 1;
+                        if (r_index == 3) begin
+                            q <= 0;
+                            state <= Q;
+                        end
+                    end
+
+                    Q: begin
+                        r <= 0;
+                        r_index <= 0;
+                        if (bit_in) begin
+                            q <= q + 1;
+                            if (q == ESCAPE - 1) begin
+                                escape <= 1;
+                                state <= R;
+                            end
+                        end else if (k != 0) begin
+                            escape <= 0;
+                            state <= R;
+                        end
+                    end
+
+                    R: begin
+                        r <= r_next;
+                        r_index <= r_index + 1;
+                    end
+
+                    default: begin
+                        state <= K;
+                    end
+                endcase
+
+                if (emit) begin
+                    dout <= dout + delta;
+                    dout_valid <= 1;
+                    q <= 0;
+                    r_index <= 0;
+                    if (block_counter == BLOCK_SIZE - 1) begin
+                        block_counter <= 0;
+                        state <= K;
+                    end else begin
+                        block_counter <= block_counter + 1;
+                        state <= Q;
+                    end
+                end
+            end
+        end
+    end
+endmodule
+
+`default_nettype wire
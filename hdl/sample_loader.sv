@@ -16,9 +16,39 @@ module sample_loader
 
         output logic        sample_axis_tvalid,
         output logic [15:0] sample_axis_tdata,
-        output logic        sample_axis_tlast
+        output logic        sample_axis_tlast,
+
+        // Addressed single-instrument updates (after the full kit is loaded)
+        // update_addr is the DRAM address of the first 128-bit chunk
+        output logic [23:0] update_addr,
+        output logic        update_addr_valid,
+
+        output logic        update_axis_tvalid,
+        input  wire         update_axis_tready,
+        output logic [15:0] update_axis_tdata,
+
+        // High while an update is in progress, so that the parameter UART
+        //  receiver ignores the sample bytes
+        output logic        update_active
     );
 
+    // Each instrument (and each update) starts with a 3-byte sample count.
+    // If COMPRESSED_FLAG is set, the samples are Rice coded (see
+    //  rice_decoder) instead of raw 16-bit PCM.
+    localparam COMPRESSED_FLAG = 23;
+
+    // Update frame (sent on a 2-byte boundary of the parameter stream):
+    //  [UPDATE_OPCODE] [slot] [3-byte DRAM offset] [3-byte sample count]
+    //  followed by the samples (LSB first).
+    // The rest of the slot is filled with zeros after the samples are
+    //  written, so a shorter replacement doesn't play the old sample's tail.
+    // Frames that don't fit in the slot are consumed but not written.
+    localparam UPDATE_OPCODE = 8'hC0;
+    localparam UPDATE_HEADER_BYTES = 7;
+
+    // Keep update_active high for ~2 UART bytes after the last sample byte
+    localparam UPDATE_GUARD_CYCLES = 1024;
+
     logic        uart_dout_valid;
     logic [7:0]  uart_dout;
 
@@ -30,6 +60,9 @@ module sample_loader
 
     logic [23:0] total_sample_counter;
 
+    // End address (exclusive) of each instrument's DRAM region
+    logic [23:0] slot_ends [INSTRUMENT_COUNT-1:0];
+
     uart_receive #(
         .INPUT_CLOCK_FREQ(74250000),
         //.BAUD_RATE(115200)
@@ -42,6 +75,94 @@ module sample_loader
         .dout(uart_dout)
     );
 
+    enum {UPD_IDLE, UPD_HEADER, UPD_CHECK, UPD_DATA, UPD_FILL, UPD_GUARD} update_state;
+
+    logic        pair_byte_num;
+    logic [2:0]  update_header_byte_num;
+    logic [55:0] update_header;
+
+    logic [7:0]  update_slot;
+    logic [23:0] update_offset;
+    logic [22:0] update_size;
+    logic        update_compressed;
+    assign update_slot = update_header[7:0];
+    assign update_offset = update_header[31:8];
+    assign update_size = update_header[54:32];
+    assign update_compressed = update_header[32+COMPRESSED_FLAG];
+
+    logic        update_write;  // Low if the frame didn't fit in its slot
+    logic        update_byte_num;
+    logic [22:0] update_counter;
+    logic [26:0] update_fill_counter;
+    logic [$clog2(UPDATE_GUARD_CYCLES)-1:0] update_guard_counter;
+
+    // Decoder is shared between the full kit load and updates, which never
+    //  overlap
+    logic        loading;
+    assign loading = instrument_counter < INSTRUMENT_COUNT;
+
+    logic [7:0]  raw_sample_lsb;
+
+    logic        decoder_rst;
+    logic        decoder_din_valid;
+    logic        decoder_dout_valid;
+    logic [15:0] decoder_dout;
+
+    logic        load_sample_valid;
+    logic [15:0] load_sample;
+    logic        load_sample_last;
+
+    logic        update_sample_valid;
+    logic [15:0] update_sample;
+    logic        update_sample_last;
+
+    always_comb begin
+        if (sample_size[COMPRESSED_FLAG]) begin
+            load_sample_valid = loading && sample_size_byte_num == 3 && decoder_dout_valid;
+            load_sample = decoder_dout;
+        end else begin
+            load_sample_valid = loading && sample_size_byte_num == 3 && uart_dout_valid && sample_byte_num;
+            load_sample = {uart_dout, raw_sample_lsb};
+        end
+        load_sample_last = load_sample_valid && (sample_counter == sample_size[22:0] - 1);
+
+        if (update_compressed) begin
+            update_sample_valid = update_state == UPD_DATA && decoder_dout_valid;
+            update_sample = decoder_dout;
+        end else begin
+            update_sample_valid = update_state == UPD_DATA && uart_dout_valid && update_byte_num;
+            update_sample = {uart_dout, raw_sample_lsb};
+        end
+        update_sample_last = update_sample_valid && (update_counter == 1);
+
+        if (loading) begin
+            decoder_din_valid = uart_dout_valid && sample_size_byte_num == 3 && sample_size[COMPRESSED_FLAG];
+            decoder_rst = rst_pixel || sample_size_byte_num != 3 || load_sample_last;
+        end else begin
+            decoder_din_valid = uart_dout_valid && update_state == UPD_DATA && update_compressed;
+            decoder_rst = rst_pixel || update_state != UPD_DATA || update_sample_last;
+        end
+    end
+
+    rice_decoder sample_decoder (
+        .clk(clk_pixel),
+        .rst(decoder_rst),
+        .din_valid(decoder_din_valid),
+        .din(uart_dout),
+        .dout_valid(decoder_dout_valid),
+        .dout(decoder_dout)
+    );
+
+    always_ff @ (posedge clk_pixel) begin
+        if (rst_pixel) begin
+            raw_sample_lsb <= 0;
+        end else begin
+            if (uart_dout_valid) begin
+                raw_sample_lsb <= uart_dout;
+            end
+        end
+    end
+
     always_ff @ (posedge clk_pixel) begin
         if (rst_pixel) begin
             sample_size_byte_num <= 0;
@@ -51,14 +172,27 @@ module sample_loader
             instrument_counter <= 0;
 
             total_sample_counter <= 0;
-            
+            for (int i=0; i<INSTRUMENT_COUNT; i++) begin
+                slot_ends[i] <= 0;
+            end
+
             addr_offset <= 0;
             addr_offset_valid <= 0;
             sample_axis_tvalid <= 0;
             sample_axis_tdata <= 0;
             sample_axis_tlast <= 0;
         end else begin
-            if (uart_dout_valid && instrument_counter < INSTRUMENT_COUNT) begin
+            if (sample_axis_tvalid) begin
+                sample_axis_tvalid <= 0;
+            end
+            if (sample_axis_tlast) begin
+                sample_axis_tlast <= 0;
+            end
+            if (addr_offset_valid) begin
+                addr_offset_valid <= 0;
+            end
+
+            if (uart_dout_valid && loading) begin
                 if (sample_size_byte_num < 3) begin
                     // LSB first
                     sample_size <= {uart_dout, sample_size[23:8]};
@@ -68,36 +202,156 @@ module sample_loader
                     sample_byte_num <= 0;
                     sample_counter <= 0;
                 end else begin
-                    // Reading sample data
-                    if (sample_byte_num) begin
-                        // Second byte of sample (MSB)
-                        sample_axis_tvalid <= 1;
-                        sample_counter <= sample_counter + 1;
-                        total_sample_counter <= total_sample_counter + 1;
-                        if (sample_counter == sample_size - 1) begin
-                            sample_size_byte_num <= 0;
-                            instrument_counter <= instrument_counter + 1;
-                            addr_offset <= (total_sample_counter + 1) >> 3;
-                            addr_offset_valid <= 1;
-                            if (instrument_counter == INSTRUMENT_COUNT - 1) begin
-                                sample_axis_tlast <= 1;
-                            end
-                        end
-                    end
                     sample_byte_num <= ~sample_byte_num;
-                    sample_axis_tdata <= {uart_dout, sample_axis_tdata[15:8]};
                 end
             end
 
-            if (sample_axis_tvalid) begin
-                sample_axis_tvalid <= 0;
+            if (load_sample_valid) begin
+                sample_axis_tvalid <= 1;
+                sample_axis_tdata <= load_sample;
+                sample_counter <= sample_counter + 1;
+                total_sample_counter <= total_sample_counter + 1;
+                if (load_sample_last) begin
+                    sample_size_byte_num <= 0;
+                    instrument_counter <= instrument_counter + 1;
+                    addr_offset <= (total_sample_counter + 1) >> 3;
+                    addr_offset_valid <= 1;
+                    slot_ends[instrument_counter] <= (total_sample_counter + 1) >> 3;
+                    if (instrument_counter == INSTRUMENT_COUNT - 1) begin
+                        sample_axis_tlast <= 1;
+                    end
+                end
             end
-            if (sample_axis_tlast) begin
-                sample_axis_tlast <= 0;
+        end
+    end
+
+    logic [23:0] update_slot_start;
+    logic [23:0] update_slot_end;
+    logic        update_fits;
+    always_comb begin
+        if (update_slot < INSTRUMENT_COUNT) begin
+            update_slot_start = (update_slot == 0) ? 24'b0 : slot_ends[update_slot-1];
+            update_slot_end = slot_ends[update_slot];
+        end else begin
+            update_slot_start = 24'b0;
+            update_slot_end = 24'b0;
+        end
+        update_fits =
+            (update_slot < INSTRUMENT_COUNT) &&
+            (update_size[2:0] == 3'b0) &&
+            (update_offset >= update_slot_start) &&
+            (update_offset + (update_size >> 3) <= update_slot_end);
+    end
+
+    always_ff @ (posedge clk_pixel) begin
+        if (rst_pixel) begin
+            update_state <= UPD_IDLE;
+            pair_byte_num <= 0;
+            update_header_byte_num <= 0;
+            update_header <= 0;
+            update_write <= 0;
+            update_byte_num <= 0;
+            update_counter <= 0;
+            update_fill_counter <= 0;
+            update_guard_counter <= 0;
+
+            update_addr <= 0;
+            update_addr_valid <= 0;
+            update_axis_tvalid <= 0;
+            update_axis_tdata <= 0;
+            update_active <= 0;
+        end else begin
+            if (update_addr_valid) begin
+                update_addr_valid <= 0;
             end
-            if (addr_offset_valid) begin
-                addr_offset_valid <= 0;
+            if (update_axis_tvalid && update_axis_tready) begin
+                update_axis_tvalid <= 0;
             end
+
+            case (update_state)
+                UPD_IDLE: begin
+                    // Only look for updates once the full kit is loaded
+                    if (uart_dout_valid && !loading) begin
+                        if (!pair_byte_num && uart_dout == UPDATE_OPCODE) begin
+                            update_header_byte_num <= 0;
+                            update_active <= 1;
+                            update_state <= UPD_HEADER;
+                        end else begin
+                            pair_byte_num <= ~pair_byte_num;
+                        end
+                    end
+                end
+
+                UPD_HEADER: begin
+                    if (uart_dout_valid) begin
+                        update_header <= {uart_dout, update_header[55:8]};
+                        update_header_byte_num <= update_header_byte_num + 1;
+                        if (update_header_byte_num == UPDATE_HEADER_BYTES - 1) begin
+                            update_state <= UPD_CHECK;
+                        end
+                    end
+                end
+
+                UPD_CHECK: begin
+                    update_byte_num <= 0;
+                    update_counter <= update_size;
+                    update_write <= update_fits;
+                    if (update_fits) begin
+                        update_addr <= update_offset;
+                        update_addr_valid <= 1;
+                        update_fill_counter <= (update_slot_end - update_offset - (update_size >> 3)) << 3;
+                    end
+                    if (update_size != 0) begin
+                        update_state <= UPD_DATA;
+                    end else begin
+                        update_guard_counter <= 0;
+                        update_state <= update_fits ? UPD_FILL : UPD_GUARD;
+                    end
+                end
+
+                UPD_DATA: begin
+                    // Samples of frames that don't fit are still decoded, so
+                    //  that the end of a compressed frame can be found
+                    if (uart_dout_valid) begin
+                        update_byte_num <= ~update_byte_num;
+                    end
+                    if (update_sample_valid) begin
+                        update_axis_tvalid <= update_write;
+                        update_axis_tdata <= update_sample;
+                        update_counter <= update_counter - 1;
+                        if (update_sample_last) begin
+                            update_guard_counter <= 0;
+                            update_state <= update_write ? UPD_FILL : UPD_GUARD;
+                        end
+                    end
+                end
+
+                UPD_FILL: begin
+                    if (update_fill_counter == 0) begin
+                        if (!update_axis_tvalid) begin
+                            update_guard_counter <= 0;
+                            update_state <= UPD_GUARD;
+                        end
+                    end else if (!update_axis_tvalid || update_axis_tready) begin
+                        update_axis_tdata <= 16'b0;
+                        update_axis_tvalid <= 1;
+                        update_fill_counter <= update_fill_counter - 1;
+                    end
+                end
+
+                UPD_GUARD: begin
+                    update_guard_counter <= update_guard_counter + 1;
+                    if (update_guard_counter == UPDATE_GUARD_CYCLES - 1) begin
+                        pair_byte_num <= 0;
+                        update_active <= 0;
+                        update_state <= UPD_IDLE;
+                    end
+                end
+
+                default: begin
+                    update_state <= UPD_IDLE;
+                end
+            endcase
         end
     end
 endmodule
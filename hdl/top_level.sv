@@ -122,6 +122,11 @@ module top_level
     logic sample_load_complete;
     assign sample_load_complete = sample_load_complete_buf[0];
 
+    logic sample_update_active_pixel;
+    logic sample_update_active_buf [1:0];
+    logic sample_update_active;
+    assign sample_update_active = sample_update_active_buf[0];
+
     logic sample_load_complete_pixel_buf[1:0];
     logic sample_load_complete_pixel;
     assign sample_load_complete_pixel = sample_load_complete_buf[0];
@@ -184,11 +189,15 @@ module top_level
     logic [9:0] distortion_drive_uart;
     logic [9:0] crush_pressure_uart;
     logic       delay_rate_fast_uart;
+    logic       note_valid_uart;
+    logic [3:0] note_instrument_uart;
+    logic [6:0] note_velocity_uart;
     uart_param_controller uart_ctrl (
         .clk(clk),
         .rst(rst),
 
         .en(sample_load_complete & addr_offsets_valid),
+        .hold(sample_update_active),
         .uart_din(uart_din),
         
         .volume(volume_uart),
@@ -203,7 +212,10 @@ module top_level
         .filter_cutoff(filter_cutoff_uart),
         .distortion_drive(distortion_drive_uart),
         .crush_pressure(crush_pressure_uart),
-        .delay_rate_fast(delay_rate_fast_uart)
+        .delay_rate_fast(delay_rate_fast_uart),
+        .note_valid(note_valid_uart),
+        .note_instrument(note_instrument_uart),
+        .note_velocity(note_velocity_uart)
     );
 
     always_comb begin
@@ -257,6 +269,7 @@ module top_level
                 uart_rxd_buf[i] <= 0;
                 midi_din_buf[i] <= 0;
                 sample_load_complete_buf[i] <= 0;
+                sample_update_active_buf[i] <= 0;
                 instr_debug_btn_buf[i] <= 0;
             end
         end else begin
@@ -267,6 +280,10 @@ module top_level
             // From 83.333 MHz to 100 MHz
             sample_load_complete_buf <= {sample_load_complete_dram_ctrl, sample_load_complete_buf[1]};
 
+            // sample_update_active CDC
+            // From 74.25 MHz to 100 MHz
+            sample_update_active_buf <= {sample_update_active_pixel, sample_update_active_buf[1]};
+
             instr_debug_btn_buf <= {btn[3:1], instr_debug_btn_buf[1]};
         end
     end
@@ -339,6 +356,10 @@ module top_level
     logic         write_axis_valid;
     logic         write_axis_ready;
 
+    logic [151:0] update_axis_data;
+    logic         update_axis_valid;
+    logic         update_axis_ready;
+
     dram_writer #(
         .INSTRUMENT_COUNT(INSTRUMENT_COUNT)
     ) dwr (
@@ -361,7 +382,13 @@ module top_level
         .fifo_receiver_axis_tvalid(write_axis_valid),
         .fifo_receiver_axis_tready(write_axis_ready),
         .fifo_receiver_axis_tdata(write_axis_data),
-        .fifo_receiver_axis_tlast(write_axis_tlast)
+        .fifo_receiver_axis_tlast(write_axis_tlast),
+
+        .update_fifo_receiver_axis_tvalid(update_axis_valid),
+        .update_fifo_receiver_axis_tready(update_axis_ready),
+        .update_fifo_receiver_axis_tdata(update_axis_data),
+
+        .sample_update_active(sample_update_active_pixel)
     );
 
     logic [39:0]  read_addr_axis_data;
@@ -398,6 +425,10 @@ module top_level
 
         .instr_trig_debug(instr_trig_debug),
 
+        .uart_note_valid(note_valid_uart),
+        .uart_note_instrument(note_instrument_uart),
+        .uart_note_velocity(note_velocity_uart),
+
         .midi_key(midi_key),
         .midi_vel(midi_vel),
         .midi_dout_valid(midi_msg_valid)
@@ -488,6 +519,10 @@ module top_level
         .write_axis_valid(write_axis_valid),
         .write_axis_ready(write_axis_ready),
 
+        .update_axis_data(update_axis_data),
+        .update_axis_valid(update_axis_valid),
+        .update_axis_ready(update_axis_ready),
+
         .read_addr_axis_data(read_addr_axis_data),
         .read_addr_axis_tlast(read_addr_axis_tlast),
         .read_addr_axis_valid(read_addr_axis_valid),
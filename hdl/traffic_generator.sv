@@ -23,6 +23,11 @@ module traffic_generator
         input wire           write_axis_valid,
         output logic         write_axis_ready,
 
+        // Sample update AXIS FIFO input: {address, data}
+        input wire   [151:0] update_axis_data,
+        input wire           update_axis_valid,
+        output logic         update_axis_ready,
+
         // Read address AXIS FIFO input
         input wire   [39:0]  read_addr_axis_data,
         input wire           read_addr_axis_tlast,
@@ -51,11 +56,14 @@ module traffic_generator
     // WR_VIDEO: Write video data from write FIFO to DRAM
     // RD_AUDIO: Give DRAM read request using address in read_addr FIFO
     // RD_VIDEO: Give DRAM read request using an address counter
-    enum {RST, WR_AUDIO, WR_VIDEO, RD_AUDIO, RD_VIDEO} state;
+    // WR_UPDATE: Write a replacement audio sample chunk to its own address
+    enum {RST, WR_AUDIO, WR_VIDEO, RD_AUDIO, RD_VIDEO, WR_UPDATE} state;
 
     assign write_axis_ready =
         !memrequest_busy && 
         ((state == WR_AUDIO) || (state == WR_VIDEO));
+
+    assign update_axis_ready = !memrequest_busy && (state == WR_UPDATE);
     
     // read_addr FIFO is only for audio
     assign read_addr_axis_ready = !memrequest_busy && (state == RD_AUDIO);
@@ -199,7 +207,7 @@ module traffic_generator
                 // 
                 // dram_writer can send 1 chunk every 8 74.25 MHz cycles.
                 // traffic_generator accesses write FIFO every 3 83.333 MHz
-                //  cycles.
+                //  cycles (4 while a sample update is being written).
                 // Therefore, the write FIFO should not overflow.
                 // 
                 // dram_read_requester sends 1 address even less frequently
@@ -212,6 +220,10 @@ module traffic_generator
                         state <= RD_VIDEO;
                     end
                     RD_VIDEO: begin
+                        // Only spend a slot on updates when one is waiting
+                        state <= update_axis_valid ? WR_UPDATE : RD_AUDIO;
+                    end
+                    WR_UPDATE: begin
                         state <= RD_AUDIO;
                     end
                     default: begin
@@ -247,6 +259,13 @@ module traffic_generator
                 memrequest_write_enable = 0;
                 memrequest_write_data = 0;
             end
+            WR_UPDATE: begin
+                memrequest_addr = update_axis_data[151:128];
+                memrequest_sample_period = 14'b0;
+                memrequest_en = update_axis_valid && !memrequest_busy;
+                memrequest_write_enable = update_axis_valid && !memrequest_busy;
+                memrequest_write_data = update_axis_data[127:0];
+            end
             RD_VIDEO: begin
                 memrequest_addr = video_read_request_address;
                 memrequest_sample_period = 14'b0;
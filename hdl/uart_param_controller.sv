@@ -7,6 +7,7 @@ module uart_param_controller
         input wire rst,
 
         input wire en,
+        input wire hold,  // Ignore received bytes (e.g. sample update data)
         input wire uart_din,
 
         output logic [9:0] volume,
@@ -21,9 +22,19 @@ module uart_param_controller
         output logic [9:0] filter_cutoff,
         output logic [9:0] distortion_drive,
         output logic [9:0] crush_pressure,
-        output logic       delay_rate_fast
+        output logic       delay_rate_fast,
+
+        // Note on (bypasses the 31.25 kbaud MIDI input)
+        // Key 13 triggers instruments 0-7, key 14 instruments 8-15:
+        //  param_value = {instrument[2:0], velocity[6:0]}
+        output logic       note_valid,
+        output logic [3:0] note_instrument,
+        output logic [6:0] note_velocity
     );
 
+    localparam NOTE_KEY_LOW = 4'd13;
+    localparam NOTE_KEY_HIGH = 4'd14;
+
     logic [7:0] uart_dout;
     logic       uart_dout_valid;
 
@@ -62,11 +73,22 @@ module uart_param_controller
             distortion_drive <= 10'd512;
             crush_pressure <= 10'd0;
             delay_rate_fast <= 1'b0;
+
+            note_valid <= 1'b0;
+            note_instrument <= 4'b0;
+            note_velocity <= 7'b0;
        
             uart_dout_hold <= 8'b0;
             uart_byte_num <= 1'b0;
         end else begin
-            if (uart_dout_valid) begin
+            if (note_valid) begin
+                note_valid <= 1'b0;
+            end
+
+            if (hold) begin
+                // Resynchronize to the start of a parameter frame
+                uart_byte_num <= 1'b0;
+            end else if (uart_dout_valid) begin
                 uart_byte_num <= ~uart_byte_num;
                 if (uart_byte_num) begin
                     case (param_key)
@@ -83,6 +105,11 @@ module uart_param_controller
                         4'd10: distortion_drive <= param_value;
                         4'd11: crush_pressure <= param_value;
                         4'd12: delay_rate_fast <= param_value[9];
+                        NOTE_KEY_LOW, NOTE_KEY_HIGH: begin
+                            note_valid <= 1'b1;
+                            note_instrument <= {param_key == NOTE_KEY_HIGH, param_value[9:7]};
+                            note_velocity <= param_value[6:0];
+                        end
                     endcase
                 end else begin
                     uart_dout_hold <= uart_dout[5:0];
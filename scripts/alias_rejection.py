@@ -0,0 +1,92 @@
+import argparse
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+
+import render_pattern
+import send_wav
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'sim' / 'model'))
+import audio_distortion_model
+import resampler_model
+import upsampler_model
+
+
+# Image and alias rejection of the upsampler.sv and downsampler.sv FIRs on
+# the kit (media/resampled, run send_wav.py first), from the bit-exact
+# polyphase models and the .mem coefficients.
+#   upsampler: output power below the base Nyquist over the power of the
+#     images above it
+#   downsampler: power of the x4 input above the base Nyquist over what of
+#     it folds into the audio band; the input is the audio_distortion.sv
+#     output at the x4 rate, which is where the downsampler has real
+#     content to reject. The same filter as a plain decimator of the
+#     designed coefficients is shown alongside: downsampler.sv accumulates
+#     bank 0 twice and swaps the odd phases (resampler_model.py), which
+#     costs most of the designed stopband.
+# The high band is split off with an FFT and decimated without rounding,
+# so the figures are the filters' and not the 16-bit noise floor.
+
+AUDIO_BAND = 20000
+
+
+def band_power(x, sample_rate, lo, hi):
+    spectrum = np.abs(np.fft.rfft(np.asarray(x, dtype=np.float64)))**2
+    freqs = np.fft.rfftfreq(len(x), 1/sample_rate)
+    return np.sum(spectrum[(freqs >= lo) & (freqs < hi)])
+
+
+def high_band(x, sample_rate, cutoff):
+    spectrum = np.fft.rfft(np.asarray(x, dtype=np.float64))
+    freqs = np.fft.rfftfreq(len(x), 1/sample_rate)
+    return np.fft.irfft(np.where(freqs >= cutoff, spectrum, 0), len(x))
+
+
+def to_db(num, den):
+    if den == 0:
+        return math.inf
+    return 10 * math.log10(num / den)
+
+
+def image_rejection(x, ratio):
+    fs = render_pattern.BASE_SAMPLE_RATE
+    y = upsampler_model.upsample(x, ratio)
+    return to_db(band_power(y, fs*ratio, 0, fs/2), band_power(y, fs*ratio, fs/2, fs*ratio/2))
+
+
+def decimate(x, taps):
+    # Same phase as resampler_model.downsample(), before the >> 19
+    return np.convolve(x, taps)[resampler_model.DOWNSAMPLE-1:len(x):resampler_model.DOWNSAMPLE]
+
+
+def alias_rejection(x, pot_drive, coeffs):
+    # (downsampler.sv, designed filter)
+    fs = render_pattern.BASE_SAMPLE_RATE
+    x4 = audio_distortion_model.distort(upsampler_model.upsample(x, 4), pot_drive)
+    hi = high_band(x4, fs*4, fs/2)
+    hi_power = band_power(hi, fs*4, 0, fs*2)
+    rejection = []
+    for taps in [resampler_model.get_downsampler_taps(coeffs), coeffs]:
+        alias = decimate(hi, taps / 2**19)
+        rejection.append(to_db(hi_power, band_power(alias, fs, 0, AUDIO_BAND)))
+    return rejection
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Image/alias rejection of the upsampler and downsampler FIRs on the kit')
+    parser.add_argument('--drive', type=int, action='append', help='distortion_drive pot values (default 128, 512, 1023)')
+    parser.add_argument('--seconds', type=float, default=0.5, help='Seconds of each sample to use (0 for all of it)')
+    args = parser.parse_args()
+    drives = args.drive or [128, 512, 1023]
+    coeffs = resampler_model.load_coeffs()
+
+    # Alias columns are downsampler.sv / designed filter
+    print(f'{"sample":<12}{"x4 image":>10}{"x16 image":>11}' + ''.join(f'{f"alias@{d}":>16}' for d in drives) + '  (dB)')
+    for sample_name, x in zip(send_wav.samples, render_pattern.load_kit()):
+        if args.seconds:
+            x = x[:int(args.seconds * render_pattern.BASE_SAMPLE_RATE)]
+        images = f'{image_rejection(x, 4):>10.1f}{image_rejection(x, 16):>11.1f}'
+        aliases = ''.join(f'{f"{hdl:.1f} / {design:.1f}":>16}' for hdl, design in (alias_rejection(x, d, coeffs) for d in drives))
+        print(f'{sample_name:<12}{images}{aliases}')
@@ -0,0 +1,48 @@
+import time
+
+import numpy as np
+
+import send_wav
+
+
+# Compression ratio and estimated load time of the kit with and without
+# Rice coding. Run from the repository root (like send_wav.py).
+
+# 8N1 -> 10 bits on the wire per byte
+def wire_time(num_bytes):
+    return num_bytes * 10 / send_wav.BAUD
+
+
+def benchmark():
+    total_raw_bytes = 0
+    total_compressed_bytes = 0
+    total_encode_time = 0
+
+    print(f'{"sample":>10} {"raw [B]":>9} {"comp [B]":>9} {"ratio":>6} {"encode [ms]":>12}')
+    for sample_name in send_wav.samples:
+        padded_wav_samples = send_wav.load_sample(sample_name)
+        raw = send_wav.get_payload(padded_wav_samples, compress=False)
+
+        start = time.perf_counter()
+        compressed = send_wav.get_payload(padded_wav_samples, compress=True)
+        encode_time = time.perf_counter() - start
+
+        decoded = send_wav.rice_decode(compressed[3:], len(padded_wav_samples))
+        assert np.array_equal(decoded, padded_wav_samples), f'{sample_name}: round trip failed'
+
+        total_raw_bytes += len(raw)
+        total_compressed_bytes += len(compressed)
+        total_encode_time += encode_time
+        print(f'{sample_name:>10} {len(raw):>9} {len(compressed):>9} {len(raw)/len(compressed):>6.2f} {encode_time*1e3:>12.1f}')
+
+    print()
+    print(f'Total: {total_raw_bytes} -> {total_compressed_bytes} bytes ({total_raw_bytes/total_compressed_bytes:.2f}x)')
+    print(f'Raw load time:        {wire_time(total_raw_bytes):.3f} s')
+    # Encoding overlaps transmission in send_wav (except the first instrument),
+    # so the serial encode time is an upper bound
+    print(f'Compressed load time: {wire_time(total_compressed_bytes):.3f} s '
+          f'(+ at most {total_encode_time:.3f} s encoding)')
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,100 @@
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import scipy.signal
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'sim' / 'model'))
+import dlt_sig_dac_model
+
+
+# THD+N of the delta-sigma DACs from the bit-exact model
+# Same analysis as sim/test_delta_sigma.py, which gets its bit stream from
+# an HDL sim at one callback per clock. The input is a sine at the x16 rate
+# (each sample held for HOLD_CYCLES, as audio_processor.sv feeds the DAC),
+# rounded up to a whole number of periods.
+
+CLK_FREQ = 100_000_000
+SAMPLE_RATE = CLK_FREQ / dlt_sig_dac_model.HOLD_CYCLES
+SAMPLE_MAX = 2**15-1
+OUTPUT_GAIN = 10**(14.5/20)  # Signal at -0 dB
+FILTER_FREQ = 28000  # First order analog filter on the board
+FUNDAMENTAL_BINS = 4  # Zeroed on each side of the fundamental
+
+DACS = {1: dlt_sig_dac_model.dac_1st_order, 2: dlt_sig_dac_model.dac_2nd_order}
+
+
+def get_input(freq, level_db, n_samples):
+    n_periods = math.ceil(n_samples * freq / SAMPLE_RATE)
+    n_samples = round(n_periods * SAMPLE_RATE / freq)
+    gain = 10**(level_db/20)
+    angle = 2 * np.pi * freq / SAMPLE_RATE * np.arange(n_samples)
+    return (gain * 2**15 * np.sin(angle)).astype(np.int64).clip(-SAMPLE_MAX-1, SAMPLE_MAX)
+
+
+def to_analog(bits):
+    # Output levels with the slower fall after a 1 (test_delta_sigma.py)
+    y = np.where(bits == 1, 1.0, -1.0)
+    y[1:][(bits[1:] == 0) & (bits[:-1] == 1)] = -0.9
+    y *= OUTPUT_GAIN
+    return y - np.mean(y)
+
+
+def get_thdn(y, freq):
+    n = len(y)
+    window = scipy.signal.windows.flattop(n, sym=False)
+    sos = scipy.signal.butter(1, FILTER_FREQ, fs=CLK_FREQ, output='sos')
+    filtered = scipy.signal.sosfilt(sos, y)
+    mags = 2.0 / n * np.abs(np.fft.rfft(filtered * window))[:n//2]
+
+    fundamental = round(freq * n / CLK_FREQ)
+    mags[max(fundamental - FUNDAMENTAL_BINS, 0):fundamental + FUNDAMENTAL_BINS + 1] = 0
+    thdn = {}
+    for name, stop in [('total', CLK_FREQ // 2), ('<1MHz', 1_000_000), ('audio', 20_000)]:
+        cutoff = min(math.ceil(stop * n / CLK_FREQ), n // 2)
+        thdn[name] = math.sqrt(np.sum(np.square(mags[:cutoff])))
+    return thdn, filtered, window
+
+
+def plot(y, filtered, window):
+    import matplotlib.pyplot as plt
+    fig, (ax1, ax2) = plt.subplots(2)
+    ax1.magnitude_spectrum(y, Fs=CLK_FREQ, window=window, scale='dB')
+    ax1.set_ybound(-140, 1)
+    ax1.set_xbound(0, 20000)
+    ax1.set_title('Audio Range')
+    ax2.magnitude_spectrum(y, Fs=CLK_FREQ, window=window, scale='dB')
+    ax2.magnitude_spectrum(filtered, Fs=CLK_FREQ, window=window, scale='dB')
+    ax2.legend(['direct dac output', 'analog filtered'])
+    ax2.set_xscale('log')
+    ax2.set_ybound(-180, 1)
+    ax2.set_xbound(100, CLK_FREQ // 2)
+    ax2.set_title('Full Range')
+    plt.show()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='THD+N of the dlt_sig_dac model on a sine')
+    parser.add_argument('--order', type=int, choices=DACS, default=2, help='DAC order')
+    parser.add_argument('--freq', type=float, default=4000, help='Sine frequency (Hz)')
+    parser.add_argument('--level', type=float, default=0, help='Sine level (dBFS)')
+    parser.add_argument('--samples', type=int, default=2**16, help='Input samples at the x16 rate (x142 clocks each)')
+    parser.add_argument('--plot', action='store_true', help='Plot the spectra')
+    args = parser.parse_args()
+
+    x = get_input(args.freq, args.level, args.samples)
+    start = time.perf_counter()
+    bits = DACS[args.order](x)
+    elapsed = time.perf_counter() - start
+    print(f'{len(bits)} clocks ({len(bits)/CLK_FREQ*1000:.1f} ms) in {elapsed:.2f} s')
+
+    y = to_analog(bits)
+    thdn, filtered, window = get_thdn(y, args.freq)
+    for name, value in thdn.items():
+        print(f'{name} THDN: {value}  ({20 * math.log10(value)}dB)')
+
+    if args.plot:
+        plot(y, filtered, window)
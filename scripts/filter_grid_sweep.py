@@ -0,0 +1,155 @@
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'sim' / 'model'))
+import audio_filter_model
+
+
+# Maps clipping and stability of audio_filter_x4.sv over the cutoff/quality
+# knob space. Each configuration gets a full-scale square burst followed by
+# silence. At the end of the silence, an output swinging by more than
+# RING_THRESHOLD without getting any smaller is treated as self-oscillation,
+# and a constant non-zero output as a DC offset left by the truncating
+# one-pole stages (deadband).
+
+SAMPLE_RATE = 1 / (2272/4 * 10e-9)  # audio_filter_oversampled.sv
+SAMPLE_MAX = 2**15-1
+BURST_FREQ = 1000
+BURST_SAMPLES = 1024
+TAIL_SAMPLES = 2048
+TAIL_WINDOW = 256  # Last two windows of the tail are compared for decay
+RING_THRESHOLD = 64
+CHUNK_SIZE = 1<<16  # Configurations per pass, bounds memory
+CHECK_COUNT = 8
+
+
+def get_stimulus():
+    n = np.arange(BURST_SAMPLES + TAIL_SAMPLES)
+    x = np.where(np.sin(2*np.pi*BURST_FREQ*n/SAMPLE_RATE) > 0, SAMPLE_MAX, -SAMPLE_MAX-1)
+    x[BURST_SAMPLES:] = 0
+    return x
+
+
+def sweep_chunk(pot_cutoff, pot_quality, x, soft_clip):
+    grid = audio_filter_model.FilterGrid(pot_cutoff, pot_quality, soft_clip)
+    peak_burst = np.zeros(grid.shape, dtype=np.int64)
+    peak_tail_early = np.zeros(grid.shape, dtype=np.int64)
+    tail_max = np.full(grid.shape, -2**15, dtype=np.int64)
+    tail_min = np.full(grid.shape, 2**15-1, dtype=np.int64)
+    for i, sample in enumerate(x):
+        y = grid.step(sample).reshape(grid.shape)
+        if i < BURST_SAMPLES:
+            np.maximum(peak_burst, np.abs(y), out=peak_burst)
+        elif i >= len(x) - TAIL_WINDOW:
+            np.maximum(tail_max, y, out=tail_max)
+            np.minimum(tail_min, y, out=tail_min)
+        elif i >= len(x) - 2*TAIL_WINDOW:
+            np.maximum(peak_tail_early, np.abs(y), out=peak_tail_early)
+    return {
+        'peak_burst': peak_burst,
+        'peak_tail_early': peak_tail_early,
+        'tail_max': tail_max,
+        'tail_min': tail_min,
+        **grid.stats()
+    }
+
+
+def sweep(step, soft_clip, chunk_size=CHUNK_SIZE):
+    pots = np.arange(0, 1024, step)
+    pot_cutoff, pot_quality = [a.ravel() for a in np.meshgrid(pots, pots, indexing='ij')]
+    x = get_stimulus()
+
+    results = {}
+    start = time.perf_counter()
+    for chunk_start in range(0, pot_cutoff.size, chunk_size):
+        chunk = slice(chunk_start, chunk_start + chunk_size)
+        chunk_results = sweep_chunk(pot_cutoff[chunk], pot_quality[chunk], x, soft_clip)
+        for name, values in chunk_results.items():
+            results.setdefault(name, []).append(values)
+        done = min(chunk_start + chunk_size, pot_cutoff.size)
+        print(f'{done}/{pot_cutoff.size} configurations, {time.perf_counter()-start:.1f} s')
+
+    results = {name: np.concatenate(values).reshape(len(pots), len(pots)) for name, values in results.items()}
+    results['pots'] = pots
+    return results
+
+
+def check(results, soft_clip, count=CHECK_COUNT):
+    # Spot-check the batched model against the scalar filter_step
+    rng = np.random.default_rng(0)
+    pots = results['pots']
+    x = get_stimulus()
+    for i, j in rng.integers(0, len(pots), size=(count, 2)):
+        s = [0, 0, 0, 0]
+        y = []
+        for sample in x:
+            u, s = audio_filter_model.filter_step(sample, s, pots[i], pots[j], soft_clip)
+            y.append(u)
+        expected = {
+            'peak_burst': max(abs(u) for u in y[:BURST_SAMPLES]),
+            'peak_tail_early': max(abs(u) for u in y[-2*TAIL_WINDOW:-TAIL_WINDOW]),
+            'tail_max': max(y[-TAIL_WINDOW:]),
+            'tail_min': min(y[-TAIL_WINDOW:]),
+        }
+        for name, value in expected.items():
+            assert value == results[name][i, j], f'Mismatch in {name} at pots {pots[i], pots[j]}'
+    print(f'{count} configurations match the scalar model')
+
+
+def get_peak_tail(results):
+    return np.maximum(np.abs(results['tail_max']), np.abs(results['tail_min']))
+
+
+def plot(results):
+    pots = results['pots']
+    extent = [pots[0], pots[-1], pots[0], pots[-1]]
+    total = BURST_SAMPLES + TAIL_SAMPLES
+    maps = [
+        ('Clipped samples [%]', 100 * results['clips'] / total),
+        ('Overflowed samples [%]', 100 * results['overflows'] / total),
+        ('Peak output, tail [dBFS]', 20*np.log10(np.maximum(get_peak_tail(results), 1) / 2**15)),
+    ]
+    fig, axs = plt.subplots(1, len(maps), figsize=(5*len(maps), 4))
+    for ax, (title, values) in zip(axs, maps):
+        im = ax.imshow(values, origin='lower', extent=extent, aspect='auto')
+        ax.set_xlabel('pot_quality')
+        ax.set_ylabel('pot_cutoff')
+        ax.set_title(title)
+        fig.colorbar(im, ax=ax)
+    fig.tight_layout()
+    plt.show()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sweep audio_filter_x4 over the cutoff/quality knob space')
+    parser.add_argument('--step', type=int, default=8, help='Pot step between grid points (1 for the full 1024x1024)')
+    parser.add_argument('--soft-clip', type=int, default=audio_filter_model.SOFT_CLIP, choices=[0, 1])
+    parser.add_argument('--save', help='Save the maps to this .npz file')
+    parser.add_argument('--no-plot', action='store_true')
+    args = parser.parse_args()
+
+    results = sweep(args.step, args.soft_clip)
+    check(results, args.soft_clip)
+
+    swing = results['tail_max'] - results['tail_min']
+    oscillating = (swing > RING_THRESHOLD) & (get_peak_tail(results) >= results['peak_tail_early'])
+    dc_offset = (swing == 0) & (results['tail_max'] != 0)
+    overflowing = results['overflows'] > 0
+    clipping = results['clips'] > 0
+    print(f'Clipping: {np.count_nonzero(clipping)}/{clipping.size} configurations')
+    print(f'Overflowing: {np.count_nonzero(overflowing)}/{overflowing.size}')
+    print(f'Self-oscillating: {np.count_nonzero(oscillating)}/{oscillating.size}')
+    if np.any(oscillating):
+        print(f'Lowest self-oscillating pot_quality: {results["pots"][np.nonzero(np.any(oscillating, axis=0))[0][0]]}')
+    print(f'DC offset after {TAIL_SAMPLES} silent samples: {np.count_nonzero(dc_offset)}/{dc_offset.size}, '
+          f'up to {np.max(np.abs(results["tail_max"][dc_offset]), initial=0)}')
+
+    if args.save is not None:
+        np.savez_compressed(args.save, **results)
+    if not args.no_plot:
+        plot(results)
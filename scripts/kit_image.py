@@ -0,0 +1,160 @@
+import argparse
+import json
+import mmap
+import os
+import select
+import struct
+import time
+
+import send_wav
+
+
+# Kit image layout (little endian):
+#   Header:    magic, instrument count, flags, header size, stream size
+#   Table:     per instrument: name, sample count, DRAM start/end address
+#              (128-bit words), offset/size of its segment in the stream
+#   Stream:    the exact bytes sample_loader expects (3-byte sample count +
+#              samples, for every instrument in kit order)
+# The stream starts at a page boundary so it can be sent straight from an
+# mmap of the file.
+
+KIT_IMAGE_MAGIC = b'DDKT'
+KIT_IMAGE_VERSION = 1
+FLAG_COMPRESSED = 1 << 0
+STREAM_ALIGN = mmap.PAGESIZE
+
+HEADER_FORMAT = '<4sHHHHII'  # magic, version, count, flags, reserved, header size, stream size
+ENTRY_FORMAT = '<16sIIIII'   # name, num samples, addr start, addr end, stream offset, stream size
+
+
+def build_kit_image(filename, sample_names=None, compress=False):
+    if sample_names is None:
+        sample_names = send_wav.samples
+
+    entries = []
+    segments = []
+    stream_size = 0
+    addr_end = 0
+    for sample_name in sample_names:
+        padded_wav_samples = send_wav.load_sample(sample_name)
+        segment = send_wav.get_payload(padded_wav_samples, compress)
+        num_samples = len(padded_wav_samples)
+        addr_start = addr_end
+        addr_end += num_samples // send_wav.PAD_SAMPLES
+        entries.append(struct.pack(
+            ENTRY_FORMAT,
+            sample_name.encode(),
+            num_samples,
+            addr_start,
+            addr_end,
+            stream_size,
+            len(segment)
+        ))
+        segments.append(segment)
+        stream_size += len(segment)
+
+    header_size = struct.calcsize(HEADER_FORMAT) + struct.calcsize(ENTRY_FORMAT) * len(entries)
+    header_size = -(-header_size // STREAM_ALIGN) * STREAM_ALIGN
+    header = struct.pack(
+        HEADER_FORMAT,
+        KIT_IMAGE_MAGIC,
+        KIT_IMAGE_VERSION,
+        len(entries),
+        FLAG_COMPRESSED if compress else 0,
+        0,
+        header_size,
+        stream_size
+    ) + b''.join(entries)
+
+    with open(filename, 'wb') as image_file:
+        image_file.write(header.ljust(header_size, b'\0'))
+        for segment in segments:
+            image_file.write(segment)
+    print(f'Wrote {filename}: {len(entries)} instruments, {stream_size} stream bytes')
+
+
+def read_kit_image_header(image):
+    # image: bytes-like (e.g. an mmap)
+    magic, version, count, flags, _, header_size, stream_size = \
+        struct.unpack_from(HEADER_FORMAT, image, 0)
+    assert magic == KIT_IMAGE_MAGIC, 'Not a kit image'
+    assert version == KIT_IMAGE_VERSION, f'Unsupported kit image version: {version}'
+    assert len(image) >= header_size + stream_size, 'Truncated kit image'
+
+    entries = []
+    entry_offset = struct.calcsize(HEADER_FORMAT)
+    for i in range(count):
+        name, num_samples, addr_start, addr_end, stream_offset, size = \
+            struct.unpack_from(ENTRY_FORMAT, image, entry_offset)
+        entries.append({
+            'name': name.rstrip(b'\0').decode(),
+            'num_samples': num_samples,
+            'addr_start': addr_start,
+            'addr_end': addr_end,
+            'stream_offset': stream_offset,
+            'stream_size': size,
+        })
+        entry_offset += struct.calcsize(ENTRY_FORMAT)
+
+    return {
+        'compressed': bool(flags & FLAG_COMPRESSED),
+        'header_size': header_size,
+        'stream_size': stream_size,
+        'entries': entries,
+    }
+
+
+def write_zero_copy(ser, view):
+    # pyserial copies memoryviews into bytes before writing, so write
+    # straight from the mapped pages to the tty where possible
+    try:
+        fd = ser.fileno()
+    except (AttributeError, OSError):
+        ser.write(view)
+        ser.flush()
+        return
+    # The port is opened non-blocking; wait for room in the tty buffer
+    pos = 0
+    while pos < len(view):
+        try:
+            pos += os.write(fd, view[pos:])
+        except BlockingIOError:
+            select.select([], [fd], [])
+    ser.flush()
+
+
+def send_kit_image(ser, filename):
+    with open(filename, 'rb') as image_file:
+        with mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ) as image:
+            header = read_kit_image_header(image)
+            for entry in header['entries']:
+                print(f'{entry["name"]} num samples: {entry["num_samples"]}, '
+                      f'DRAM: [{entry["addr_start"]}, {entry["addr_end"]}), {entry["stream_size"]} bytes')
+
+            # DRAM layout is fixed until the next full load; needed for updates
+            with open(send_wav.KIT_LAYOUT_FILENAME, 'w') as layout_file:
+                json.dump({
+                    'samples': [entry['name'] for entry in header['entries']],
+                    'slot_ends': [entry['addr_end'] for entry in header['entries']]
+                }, layout_file, indent=4)
+
+            stream_start = header['header_size']
+            with memoryview(image) as view:
+                stream = view[stream_start:stream_start+header['stream_size']]
+                if ser is not None:
+                    print(f'Sending kit image {filename} over serial port...')
+                    start = time.perf_counter()
+                    write_zero_copy(ser, stream)
+                    transmit_time = time.perf_counter() - start
+                    # 8N1 -> 10 bits on the wire per byte
+                    wire_time = len(stream) * 10 / send_wav.BAUD
+                    print(f'Transmit: {transmit_time:.3f} s (wire time at {send_wav.BAUD} baud: {wire_time:.3f} s)')
+                stream.release()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compile the kit into a binary image for send_wav.py --image')
+    parser.add_argument('filename')
+    parser.add_argument('--compress', action='store_true', help='Rice-code samples')
+    args = parser.parse_args()
+    build_kit_image(args.filename, compress=args.compress)
@@ -0,0 +1,110 @@
+import argparse
+import csv
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+import render_pattern
+import send_wav
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'sim' / 'model'))
+import audio_filter_model
+import upsampler_model
+from audio_reverb_model import ReverbStereo
+from range_tracker import RangeTracker
+
+
+# Headroom report for the audio_filter_x4.sv and audio_reverb.sv datapaths
+# Every kit sample (media/resampled, run send_wav.py first) is run through
+# the bit-exact models at a grid of pot settings in a process pool. Each
+# node's range is recorded against its register width instead of stopping
+# at the first overflow, as IIR_design.py and audio_reverb_design_fixed.py
+# do. Positive headroom is how many bits a register could lose on this
+# corpus; negative headroom means it clipped or wrapped.
+
+SAMPLE_MAX = 2**15-1
+
+
+def load_corpus(normalize, seconds):
+    corpus = {}
+    for sample_name, x in zip(send_wav.samples, render_pattern.load_kit()):
+        if seconds is not None:
+            x = x[:int(seconds * render_pattern.BASE_SAMPLE_RATE)]
+        if normalize:
+            x = x * SAMPLE_MAX // max(int(np.max(np.abs(x))), 1)
+        corpus[sample_name] = x
+    return corpus
+
+
+def track_filter(x, pot_values):
+    # All cutoff/quality pairs at once, at the x4 rate (audio_filter_oversampled.sv)
+    tracker = RangeTracker()
+    grid = audio_filter_model.FilterGrid(pot_values[:, None], pot_values[None, :], tracker=tracker)
+    grid.process(upsampler_model.upsample(x, 4))
+    return tracker
+
+
+def track_reverb(x, pot_values):
+    tracker = RangeTracker()
+    for pot_wet in pot_values:
+        for pot_size in pot_values:
+            for pot_feedback in pot_values:
+                ReverbStereo(pot_wet, pot_size, pot_feedback, is_stereo=True, tracker=tracker).process(x)
+    return tracker
+
+
+def print_report(module, tracker):
+    print(f'\n{module}')
+    print(f'{"node":<22}{"bits":>6}{"min":>16}{"max":>16}{"needed":>8}{"headroom":>10}{"clips":>12}')
+    for row in tracker.report():
+        clip_rate = row['clips'] / row['count']
+        print(
+            f'{row["node"]:<22}{row["bits"]:>6}{row["min"]:>16}{row["max"]:>16}'
+            f'{row["needed"]:>8}{row["headroom"]:>10}{row["clips"]:>12}'
+            + (f' ({clip_rate:.2e})' if row['clips'] else '')
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Record datapath ranges of the filter and reverb models over the kit')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: one per core)')
+    parser.add_argument('--seconds', type=float, default=0.5, help='Seconds of each sample to use (0 for all of it)')
+    parser.add_argument('--normalize', action='store_true', help='Scale every sample to full scale first')
+    parser.add_argument('--filter-step', type=int, default=128, help='Cutoff and quality pot spacing')
+    parser.add_argument('--reverb-pots', default='0,512,1023', help='Values tried for each reverb pot')
+    parser.add_argument('--csv', help='Also write the report to this CSV file')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.normalize, args.seconds or None)
+    filter_pots = np.arange(0, 1024, args.filter_step)
+    reverb_pots = [int(value) for value in args.reverb_pots.split(',')]
+
+    start = time.perf_counter()
+    trackers = {'audio_filter_x4': RangeTracker(), 'audio_reverb': RangeTracker()}
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = []
+        for x in corpus.values():
+            futures.append(('audio_filter_x4', pool.submit(track_filter, x, filter_pots)))
+            futures.append(('audio_reverb', pool.submit(track_reverb, x, reverb_pots)))
+        for module, future in futures:
+            trackers[module].merge(future.result())
+    elapsed = time.perf_counter() - start
+
+    print(
+        f'{len(corpus)} samples, {len(filter_pots)**2} filter and {len(reverb_pots)**3} reverb pot settings'
+        f' in {elapsed:.1f} s'
+    )
+    for module, tracker in trackers.items():
+        print_report(module, tracker)
+
+    if args.csv is not None:
+        with open(args.csv, 'w', newline='') as csv_file:
+            fields = ['module', 'node', 'bits', 'min', 'max', 'needed', 'headroom', 'count', 'clips']
+            writer = csv.DictWriter(csv_file, fieldnames=fields)
+            writer.writeheader()
+            for module, tracker in trackers.items():
+                for row in tracker.report():
+                    writer.writerow({'module': module, **row})
@@ -0,0 +1,151 @@
+import argparse
+import math
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import mido
+import numpy as np
+
+import render_pattern
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'sim' / 'model'))
+import audio_processor_model
+import resampler_model
+import sample_mixer_model
+
+
+# Renders standard MIDI files through the bit-exact audio_processor model,
+# as the board plays them from its MIDI input (kit and chain as in
+# render_pattern.py). Only Note On on channel 10 reaches midi_processor.sv,
+# and a Note On with velocity 0 still retriggers the instrument (silently).
+#
+# Files are rendered in a process pool, one job per file by default, so the
+# output is bit-exact. --segment splits files into shorter jobs for more
+# parallelism. This is approximate. Each segment is rendered from --lead-in
+# seconds early, starting on a cycle where every resampler and
+# sample-and-hold in the chain is in its reset phase, so the dry path, crush
+# and distortion are still bit-exact across the joins. The filter, delay and
+# reverb lose their state from before the lead-in, and their joins differ by
+# up to ~115 LSB.
+
+MIDI_CHANNEL = 9  # Channel 10, NOTE_ON_CH10 in midi_processor.sv
+BASE_SAMPLE_PERIOD = 2272
+
+kit = None
+
+
+def read_notes(filename):
+    # (time_s, instrument, velocity) for every note the board would play
+    notes = []
+    time_s = 0
+    midi_file = mido.MidiFile(filename)
+    for msg in midi_file:
+        time_s += msg.time
+        if msg.type == 'note_on' and msg.channel == MIDI_CHANNEL:
+            instrument = sample_mixer_model.get_midi_instrument(msg.note)
+            if instrument is not None:
+                notes.append((time_s, instrument, msg.velocity))
+    return notes, midi_file.length
+
+
+def get_alignment(sample_period, pots, chain):
+    # Mixer samples between segment starts that look like reset to the chain
+    cycles = math.lcm(sample_period, BASE_SAMPLE_PERIOD)
+    if 'crush' in chain:
+        hold = (pots['crush_pressure'] >> 5) + 1
+        cycles = math.lcm(cycles, BASE_SAMPLE_PERIOD * hold)
+    if 'delay' in chain:
+        delay_period = int(resampler_model.pitch_to_sample_period(pots['delay_rate']))
+        cycles = math.lcm(cycles, delay_period, delay_period >> 2)
+    return cycles // sample_period
+
+
+def get_jobs(notes, length_s, pitch, pots, chain, segment_s, lead_in_s):
+    sample_period = int(resampler_model.pitch_to_sample_period(pitch))
+    n_mixer = int(np.ceil(length_s * render_pattern.CLK_FREQ / sample_period))
+    align = get_alignment(sample_period, pots, chain)
+
+    def to_aligned(seconds):
+        n = int(np.ceil(seconds * render_pattern.CLK_FREQ / sample_period))
+        return -(-n // align) * align
+
+    segment = to_aligned(segment_s)
+    lead_in = to_aligned(lead_in_s)
+    if segment <= 0 or segment >= n_mixer:
+        segment = n_mixer
+
+    jobs = []
+    note_indices = sample_mixer_model.get_note_index([note[0] for note in notes], sample_period)
+    for first in range(0, n_mixer, segment):
+        n = min(segment, n_mixer - first)
+        segment_notes = [note for note, index in zip(notes, note_indices) if index < first + n]
+        jobs.append((segment_notes, first, min(lead_in, first), n, pitch, pots, chain))
+    return jobs
+
+
+def init_worker():
+    global kit
+    kit = render_pattern.load_kit()
+
+
+def render_segment(job):
+    # Runs in a worker process
+    notes, first, lead_in, n, pitch, pots, chain = job
+    sample_period = int(resampler_model.pitch_to_sample_period(pitch))
+    din, velocity = sample_mixer_model.play_notes(kit, notes, lead_in + n, sample_period, start=first - lead_in)
+    mixed = sample_mixer_model.mix(din, velocity, sample_period, start=first - lead_in)
+    x_base = audio_processor_model.base(mixed, sample_period)
+    processor = audio_processor_model.AudioProcessor(pots, audio_processor_model.chain_to_srcs(chain))
+    y_l, y_r = processor.process(x_base)
+
+    # Base outputs from the segment start (the reset zero for the first one)
+    start = lead_in * sample_period // BASE_SAMPLE_PERIOD
+    stop = (lead_in + n) * sample_period // BASE_SAMPLE_PERIOD
+    return y_l[start:stop], y_r[start:stop]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render MIDI drum files through the audio_processor model')
+    parser.add_argument('midi_files', nargs='+', help='Standard MIDI files, drums on channel 10')
+    parser.add_argument('--output-dir', default='.', help='WAV files are written here, named after the MIDI files')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: one per core)')
+    parser.add_argument('--segment', type=float, default=0, help='Seconds per job (approximate: filter, delay and reverb are not bit-exact across joins), 0 for one job per file')
+    parser.add_argument('--lead-in', type=float, default=2.0, help='Seconds rendered and dropped before each segment')
+    parser.add_argument('--tail', type=float, default=1.0, help='Seconds of silence after the last event')
+    parser.add_argument('--pitch', type=int, default=resampler_model.DEFAULT_PITCH, help='Pitch pot (512 plays the kit at 44.1 kHz)')
+    parser.add_argument('--chain', default='', help='Effects from the dry output, e.g. crush,filter,reverb')
+    parser.add_argument('--pot', type=render_pattern.parse_pot, action='append', default=[], help='Pot setting, e.g. filter_cutoff=300')
+    parser.add_argument('--dac', action='store_true', help='Write the x16 upsampled stream (with volume) instead')
+    args = parser.parse_args()
+
+    chain = [module for module in args.chain.split(',') if module]
+    for module in chain:
+        assert module in audio_processor_model.MODULES, f'Unknown module {module}'
+    pots = {**audio_processor_model.DEFAULT_POTS, **dict(args.pot)}
+
+    start = time.perf_counter()
+    total_s = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker) as pool:
+        files = []
+        for midi_filename in args.midi_files:
+            notes, length_s = read_notes(midi_filename)
+            length_s += args.tail
+            total_s += length_s
+            jobs = get_jobs(notes, length_s, args.pitch, pots, chain, args.segment, args.lead_in)
+            files.append((midi_filename, length_s, [pool.submit(render_segment, job) for job in jobs]))
+
+        for midi_filename, length_s, futures in files:
+            y_l, y_r = (np.concatenate(channel) for channel in zip(*(future.result() for future in futures)))
+            sample_rate = render_pattern.BASE_SAMPLE_RATE
+            if args.dac:
+                processor = audio_processor_model.AudioProcessor(pots)
+                y_l, y_r = processor.dac_input(y_l), processor.dac_input(y_r)
+                sample_rate *= 16
+            output = Path(args.output_dir) / (Path(midi_filename).stem + '.wav')
+            render_pattern.write_wav(str(output), y_l, y_r, sample_rate)
+            print(f'{midi_filename}: {length_s:.2f} s in {len(futures)} segments to {output}')
+
+    elapsed = time.perf_counter() - start
+    print(f'Rendered {total_s:.2f} s in {elapsed:.2f} s ({total_s/elapsed:.1f}x real time)')
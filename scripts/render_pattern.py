@@ -0,0 +1,127 @@
+import argparse
+import json
+import sys
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+import send_wav
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'sim' / 'model'))
+import audio_processor_model
+import resampler_model
+import sample_mixer_model
+
+
+# Renders a drum pattern through the bit-exact audio_processor model
+# (sample_mixer, base resampler, the patched effects chain) to a WAV file.
+# The kit is read from media/resampled (run send_wav.py first).
+#
+# A pattern is JSON: {"bpm": 100, "steps_per_beat": 4,
+#   "tracks": {"bd": "x...x...", "sd": "..o...x."}}
+# with one character per step: x (velocity 127), o (velocity 64), . (rest)
+
+CLK_FREQ = 100e6
+BASE_SAMPLE_RATE = CLK_FREQ / 2272
+STEP_VELOCITIES = {'x': 127, 'o': 64}
+
+DEFAULT_PATTERN = {
+    'bpm': 100,
+    'steps_per_beat': 4,
+    'tracks': {
+        'bd': 'x.....x...x.....',
+        'sd': '....x.......x..o',
+        'hh_closed': 'x.o.x.o.x.o.x...',
+        'hh_opened': '..............x.',
+    },
+}
+
+
+def load_kit(sample_names=send_wav.samples):
+    kit = []
+    for sample_name in sample_names:
+        with wave.open(f'{send_wav.RESAMPLED_DIR}{sample_name}.wav') as wav_file:
+            assert wav_file.getsampwidth() == 2 and wav_file.getnchannels() == 1
+            wav_samples = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype='<i2')
+        padding = -len(wav_samples) % send_wav.PAD_SAMPLES
+        kit.append(np.concatenate((wav_samples, np.zeros(padding, dtype='<i2'))).astype(np.int64))
+    return kit
+
+
+def get_notes(pattern, bars, sample_names=send_wav.samples):
+    # (time_s, instrument, velocity) for every step of every bar
+    step_s = 60 / pattern['bpm'] / pattern['steps_per_beat']
+    notes = []
+    for track, steps in pattern['tracks'].items():
+        instrument = sample_names.index(track)
+        for bar in range(bars):
+            for i, step in enumerate(steps):
+                if step in STEP_VELOCITIES:
+                    notes.append(((bar*len(steps) + i) * step_s, instrument, STEP_VELOCITIES[step]))
+    length_s = bars * max(len(steps) for steps in pattern['tracks'].values()) * step_s
+    return notes, length_s
+
+
+def render(kit, notes, length_s, pitch, pots, chain):
+    sample_period = int(resampler_model.pitch_to_sample_period(pitch))
+    n_mixer = int(np.ceil(length_s * CLK_FREQ / sample_period))
+    din, velocity = sample_mixer_model.play_notes(kit, notes, n_mixer, sample_period)
+    mixed = sample_mixer_model.mix(din, velocity, sample_period)
+
+    x_base = audio_processor_model.base(mixed, sample_period)
+    processor = audio_processor_model.AudioProcessor(pots, audio_processor_model.chain_to_srcs(chain))
+    return processor, processor.process(x_base)
+
+
+def write_wav(filename, y_l, y_r, sample_rate):
+    frames = np.stack((y_l, y_r), axis=1).astype('<i2')
+    with wave.open(filename, 'wb') as wav_file:
+        wav_file.setnchannels(2)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(round(sample_rate))
+        wav_file.writeframes(frames.tobytes())
+
+
+def parse_pot(arg):
+    name, value = arg.split('=')
+    if name not in audio_processor_model.DEFAULT_POTS:
+        raise argparse.ArgumentTypeError(f'Unknown pot {name}, one of {list(audio_processor_model.DEFAULT_POTS)}')
+    return name, int(value)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Render a drum pattern through the audio_processor model')
+    parser.add_argument('output', help='WAV file to write')
+    parser.add_argument('--pattern', help='Pattern JSON file (default: a built-in groove)')
+    parser.add_argument('--bars', type=int, default=4)
+    parser.add_argument('--tail', type=float, default=1.0, help='Seconds of silence after the pattern')
+    parser.add_argument('--pitch', type=int, default=resampler_model.DEFAULT_PITCH, help='Pitch pot (512 plays the kit at 44.1 kHz)')
+    parser.add_argument('--chain', default='', help='Effects from the dry output, e.g. crush,filter,reverb')
+    parser.add_argument('--pot', type=parse_pot, action='append', default=[], help='Pot setting, e.g. filter_cutoff=300')
+    parser.add_argument('--dac', action='store_true', help='Write the x16 upsampled stream (with volume) instead')
+    args = parser.parse_args()
+
+    pattern = DEFAULT_PATTERN
+    if args.pattern is not None:
+        with open(args.pattern) as pattern_file:
+            pattern = json.load(pattern_file)
+    chain = [module for module in args.chain.split(',') if module]
+    for module in chain:
+        assert module in audio_processor_model.MODULES, f'Unknown module {module}'
+
+    kit = load_kit()
+    notes, length_s = get_notes(pattern, args.bars)
+    length_s += args.tail
+
+    start = time.perf_counter()
+    processor, (y_l, y_r) = render(kit, notes, length_s, args.pitch, dict(args.pot), chain)
+    sample_rate = BASE_SAMPLE_RATE
+    if args.dac:
+        y_l, y_r = processor.dac_input(y_l), processor.dac_input(y_r)
+        sample_rate *= 16
+    elapsed = time.perf_counter() - start
+
+    write_wav(args.output, y_l, y_r, sample_rate)
+    print(f'Rendered {length_s:.2f} s in {elapsed:.2f} s ({length_s/elapsed:.1f}x real time) to {args.output}')
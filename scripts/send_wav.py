@@ -1,6 +1,11 @@
 import wave
 import serial
 import os
+import hashlib
+import json
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 import samplerate
@@ -24,76 +29,312 @@ SAMPLE_RATE_IN = 48000
 SAMPLE_RATE_OUT = 44100
 SAMPLE_DIR = './media/'
 RESAMPLED_DIR = SAMPLE_DIR+'resampled/'
+CACHE_DIR = RESAMPLED_DIR+'cache/'
+CONVERTER_TYPE = 'sinc_best'
+PAD_SAMPLES = 8  # Each DRAM read/write is 16*8=128 bits
+KIT_LAYOUT_FILENAME = RESAMPLED_DIR+'kit_layout.json'
 
-def send_wav(ser=None):
+# Must match sample_loader.sv
+UPDATE_OPCODE = 0xC0
+COMPRESSED_FLAG = 1 << 23  # Set in the 3-byte sample count
+
+# Must match rice_decoder.sv
+RICE_BLOCK_SIZE = 32
+RICE_ESCAPE = 16
+
+
+def find_sample_file(sample_name):
+    # Find wav file corresponding to sample name
+    media_files = os.listdir(SAMPLE_DIR)
+    sample_filename = None
+    for media_file in media_files:
+        if f'[{sample_name}]' in media_file:
+            sample_filename = media_file
+            break
+    assert sample_filename is not None, f'No matching file for sample name: {sample_name}'
+    return SAMPLE_DIR + sample_filename
+
+
+def get_cache_key(filename):
+    # Anything that changes the samples sent to the FPGA must be part of the key
+    h = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        h.update(f.read())
+    h.update(f'{CONVERTER_TYPE}:{SAMPLE_RATE_IN}:{SAMPLE_RATE_OUT}:{PAD_SAMPLES}'.encode())
+    return h.hexdigest()
+
+
+def resample_wav(filename):
+    with wave.open(filename,"rb") as wav_file:
+        # assert wav_file.getnchannels() == 2, 'Incorrect number of channels; re-format your WAV file!'
+        nchannels = wav_file.getnchannels()
+        assert wav_file.getsampwidth() == 2, 'Incorrect sample byte-width; re-format your WAV file!'
+        assert wav_file.getframerate() == SAMPLE_RATE_IN, 'Incorrect sample rate; re-format your WAV file!'
+
+        nframes = wav_file.getnframes()
+        frames = wav_file.readframes(nframes)
+
+    # Each frame consists of four bytes [LSB C1] [MSB C1] [LSB C2] [MSB C2]
+    wav_samples = np.frombuffer(frames, dtype='<i2')  # 16-bit little endian byte order
+    if nchannels == 2:
+        wav_samples = wav_samples[0::2]  # Discard one channel
+    wav_samples = samplerate.resample(
+        wav_samples,
+        SAMPLE_RATE_OUT/SAMPLE_RATE_IN,
+        CONVERTER_TYPE
+    )
+    wav_samples = wav_samples.astype('<i2')
+
+    # Pad samples with zeros
+    wav_samples_remainder = len(wav_samples) % PAD_SAMPLES
+    if wav_samples_remainder != 0:
+        padding_samples = PAD_SAMPLES - wav_samples_remainder
+        padded_wav_samples = np.concatenate((
+            wav_samples,
+            np.zeros(padding_samples, dtype='<i2')
+        ))
+    else:
+        padded_wav_samples = wav_samples
+    return padded_wav_samples
+
+
+def rice_encode(wav_samples):
+    # Delta + zigzag + Rice coding, one 4-bit k per block (see rice_decoder.sv)
+    # Bits are packed LSB first; the last byte is zero-padded
+    x = wav_samples.astype(np.uint16)
+    d = (x - np.concatenate(([0], x[:-1])).astype(np.uint16)).view(np.int16).astype(np.int32)
+    u = ((d << 1) ^ (d >> 15)) & 0xFFFF
+
+    num_blocks = -(-len(u) // RICE_BLOCK_SIZE)
+    u_blocks = np.zeros(num_blocks*RICE_BLOCK_SIZE, dtype=np.int64)
+    u_blocks[:len(u)] = u
+    u_blocks = u_blocks.reshape(num_blocks, RICE_BLOCK_SIZE)
+    valid = (np.arange(num_blocks*RICE_BLOCK_SIZE) < len(u)).reshape(num_blocks, RICE_BLOCK_SIZE)
+
+    # Pick the cheapest k for each block
+    costs = []
+    for k in range(16):
+        q = u_blocks >> k
+        code_len = np.where(q < RICE_ESCAPE, q + 1 + k, RICE_ESCAPE + 16)
+        costs.append(np.sum(code_len * valid, axis=1))
+    block_k = np.argmin(np.array(costs), axis=0)
+
+    # One code per sample, plus one 4-bit k before each block
+    k = np.repeat(block_k, RICE_BLOCK_SIZE)[:len(u)]
+    q = u >> k
+    escape = q >= RICE_ESCAPE
+    q = np.where(escape, 0, q)
+    sample_vals = np.where(
+        escape,
+        ((1 << RICE_ESCAPE) - 1) | (u.astype(np.int64) << RICE_ESCAPE),
+        ((1 << q) - 1) | ((u & ((1 << k) - 1)).astype(np.int64) << (q + 1))
+    )
+    sample_lens = np.where(escape, RICE_ESCAPE + 16, q + 1 + k)
+
+    code_vals = np.zeros(len(u) + num_blocks, dtype=np.int64)
+    code_lens = np.zeros(len(u) + num_blocks, dtype=np.int64)
+    header_index = np.arange(num_blocks) * (RICE_BLOCK_SIZE+1)
+    is_header = np.zeros(len(code_vals), dtype=bool)
+    is_header[header_index] = True
+    code_vals[is_header] = block_k
+    code_lens[is_header] = 4
+    code_vals[~is_header] = sample_vals
+    code_lens[~is_header] = sample_lens
+
+    code_pos = np.concatenate(([0], np.cumsum(code_lens)[:-1]))
+    bits = np.zeros(int(np.sum(code_lens)), dtype=np.uint8)
+    for j in range(int(np.max(code_lens))):
+        mask = code_lens > j
+        bits[code_pos[mask] + j] = (code_vals[mask] >> j) & 1
+    return np.packbits(bits, bitorder='little').tobytes()
+
+
+def rice_decode(data, num_samples):
+    # Reference decoder, mirrors rice_decoder.sv
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder='little')
+    out = np.zeros(num_samples, dtype=np.uint16)
+    pos = 0
+    prev = 0
+    k = 0
+    for i in range(num_samples):
+        if i % RICE_BLOCK_SIZE == 0:
+            k = int(bits[pos]) | int(bits[pos+1])<<1 | int(bits[pos+2])<<2 | int(bits[pos+3])<<3
+            pos += 4
+        q = 0
+        while q < RICE_ESCAPE and bits[pos]:
+            q += 1
+            pos += 1
+        if q == RICE_ESCAPE:
+            nbits = 16
+            q = 0
+        else:
+            pos += 1  # Terminating zero
+            nbits = k
+        r = 0
+        for j in range(nbits):
+            r |= int(bits[pos+j]) << j
+        pos += nbits
+        u = (q << nbits) | r
+        delta = (u >> 1) ^ -(u & 1)
+        prev = (prev + delta) & 0xFFFF
+        out[i] = prev
+    return out.view('<i2')
+
+
+def load_sample(sample_name, filename=None):
+    # Returns the padded 44.1 ksps samples for one instrument
+    # Resampling is skipped if an identical source was already processed
+    # filename replaces the kit sample (send_update); its wav is kept next to
+    # its cache entry so media/resampled/<sample_name>.wav stays the kit's
+    replacement = filename is not None
+    if not replacement:
+        filename = find_sample_file(sample_name)
+    cache_filename = CACHE_DIR + get_cache_key(filename)
+
+    if os.path.exists(cache_filename):
+        with open(cache_filename, 'rb') as cache_file:
+            padded_wav_samples = np.frombuffer(cache_file.read(), dtype='<i2')
+        print(f'{sample_name}: loaded from cache')
+        return padded_wav_samples
+
+    padded_wav_samples = resample_wav(filename)
+
+    # Save the resulting data to a new wav file
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    wav_filename = f'{cache_filename}.wav' if replacement else f'{RESAMPLED_DIR+sample_name}.wav'
+    with wave.open(wav_filename, 'wb') as wav_write_file:
+        wav_write_file.setnchannels(1)
+        wav_write_file.setsampwidth(2)
+        wav_write_file.setframerate(SAMPLE_RATE_OUT)
+        wav_write_file.writeframes(padded_wav_samples.tobytes())
+
+    # Write to a temporary file first so an interrupted run can't leave a
+    # truncated cache entry behind
+    tmp_filename = f'{cache_filename}.{os.getpid()}.tmp'
+    with open(tmp_filename, 'wb') as cache_file:
+        cache_file.write(padded_wav_samples.tobytes())
+    os.replace(tmp_filename, cache_filename)
+    return padded_wav_samples
+
+
+def get_payload(padded_wav_samples, compress):
+    # 3-byte sample count followed by the (optionally compressed) samples
+    num_samples = len(padded_wav_samples)
+    if compress:
+        return (num_samples | COMPRESSED_FLAG).to_bytes(3, 'little') + rice_encode(padded_wav_samples)
+    return num_samples.to_bytes(3, 'little') + padded_wav_samples.tobytes()
+
+
+def prepare_sample(sample_name, compress=False):
+    # Runs in a worker process
+    start = time.perf_counter()
+    padded_wav_samples = load_sample(sample_name)
+    data_to_transmit = get_payload(padded_wav_samples, compress)
+    return padded_wav_samples, data_to_transmit, time.perf_counter() - start
+
+
+def send_wav(ser=None, workers=None, compress=False):
+    # Upcoming instruments are decoded/resampled in a process pool while the
+    # current one is streamed over the serial port
     total_num_samples = 0
-    for sample_name in samples:
-        # Find wav file corresponding to sample name
-        media_files = os.listdir(SAMPLE_DIR)
-        sample_filename = None
-        for media_file in media_files:
-            if f'[{sample_name}]' in media_file:
-                sample_filename = media_file
-                break
-        assert sample_filename is not None, f'No matching file for sample name: {sample_name}'
-
-        filename = SAMPLE_DIR + sample_filename
-        with wave.open(filename,"rb") as wav_file:
-            # assert wav_file.getnchannels() == 2, 'Incorrect number of channels; re-format your WAV file!'
-            nchannels = wav_file.getnchannels()
-            assert wav_file.getsampwidth() == 2, 'Incorrect sample byte-width; re-format your WAV file!'
-            assert wav_file.getframerate() == SAMPLE_RATE_IN, 'Incorrect sample rate; re-format your WAV file!'
-
-            nframes = wav_file.getnframes()
-            frames = wav_file.readframes(nframes)
-
-            # Each frame consists of four bytes [LSB C1] [MSB C1] [LSB C2] [MSB C2]
-            wav_samples = np.frombuffer(frames, dtype='<i2')  # 16-bit little endian byte order
-            if nchannels == 2:
-                wav_samples = wav_samples[0::2]  # Discard one channel
-            wav_samples = samplerate.resample(wav_samples, SAMPLE_RATE_OUT/SAMPLE_RATE_IN)
-            wav_samples = wav_samples.astype('<i2')
-
-            # Pad samples with zeros (each DRAM read/write is 16*8=128 bits)
-            wav_samples_remainder = len(wav_samples) % 8
-            if wav_samples_remainder != 0:
-                padding_samples = 8 - wav_samples_remainder
-                padded_wav_samples = np.concatenate((
-                    wav_samples,
-                    np.zeros(padding_samples, dtype='<i2')
-                ))
-            else:
-                padded_wav_samples = wav_samples
-
-            # Save the resulting data to a new wav file
-            with wave.open(f'{RESAMPLED_DIR+sample_name}.wav', 'wb') as wav_write_file:
-                wav_write_file.setnchannels(1)
-                wav_write_file.setsampwidth(2)
-                wav_write_file.setframerate(SAMPLE_RATE_OUT)
-                wav_write_file.writeframes(padded_wav_samples.tobytes())
+    total_num_bytes = 0
+    slot_ends = []
+    prepare_time = 0
+    wait_time = 0
+    transmit_time = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(prepare_sample, sample_name, compress) for sample_name in samples]
+        for sample_name, future in zip(samples, futures):
+            # Time spent here means the transmitter is starved
+            wait_start = time.perf_counter()
+            padded_wav_samples, data_to_transmit, sample_prepare_time = future.result()
+            sample_wait_time = time.perf_counter() - wait_start
+            prepare_time += sample_prepare_time
+            wait_time += sample_wait_time
 
             # num_samples <= 331161 -> store in 3 bytes
             num_samples = len(padded_wav_samples)
             total_num_samples += num_samples
-            num_samples_bytes = num_samples.to_bytes(3, 'little')
-            print(f'{sample_name} num samples: {num_samples} = hex:{num_samples_bytes.hex()}')
-
-            # Prepend each set of sample data with the number of samples
-            data_to_transmit = num_samples_bytes + padded_wav_samples.tobytes()
+            slot_ends.append(total_num_samples // PAD_SAMPLES)
+            total_num_bytes += len(data_to_transmit)
+            print(f'{sample_name} num samples: {num_samples} = hex:{data_to_transmit[0:3].hex()}')
+            if compress:
+                print(f'Compressed to {len(data_to_transmit)-3} bytes ({2*num_samples/(len(data_to_transmit)-3):.2f}x)')
 
             print(padded_wav_samples[0:2])
             print(data_to_transmit[0:7].hex())
 
+            sample_transmit_time = 0
             if ser is not None:
                 print(f'Sending sample {sample_name} over serial port...')
+                transmit_start = time.perf_counter()
                 ser.write(data_to_transmit)
+                ser.flush()
+                sample_transmit_time = time.perf_counter() - transmit_start
+                transmit_time += sample_transmit_time
 
+            print(f'prepare={sample_prepare_time*1e3:.1f} ms, wait={sample_wait_time*1e3:.1f} ms, transmit={sample_transmit_time*1e3:.1f} ms')
             print()
+    total_time = time.perf_counter() - start
+
+    # DRAM layout is fixed until the next full load; needed for updates
+    with open(KIT_LAYOUT_FILENAME, 'w') as layout_file:
+        json.dump({'samples': samples, 'slot_ends': slot_ends}, layout_file, indent=4)
+
+    # 8N1 -> 10 bits on the wire per byte
+    wire_time = total_num_bytes * 10 / BAUD
     print(f'Total bits of sample data sent: {total_num_samples*16}')
+    print(f'Prepare (summed over workers): {prepare_time:.3f} s')
+    print(f'Transmitter waiting on prepare: {wait_time:.3f} s')
+    print(f'Transmit: {transmit_time:.3f} s (wire time at {BAUD} baud: {wire_time:.3f} s)')
+    print(f'Total: {total_time:.3f} s')
+
+def send_update(ser, sample_name, filename=None, compress=False):
+    # Replace a single instrument in place without reloading the kit
+    # The replacement must fit in the DRAM space of the originally loaded
+    # sample; sample_loader zero-fills whatever is left of the slot
+    with open(KIT_LAYOUT_FILENAME) as layout_file:
+        layout = json.load(layout_file)
+    assert sample_name in layout['samples'], f'{sample_name} is not in the loaded kit'
+    slot = layout['samples'].index(sample_name)
+    slot_start = 0 if slot == 0 else layout['slot_ends'][slot-1]
+    slot_end = layout['slot_ends'][slot]
+
+    padded_wav_samples = load_sample(sample_name, filename)
+    num_samples = len(padded_wav_samples)
+    assert slot_start + num_samples // PAD_SAMPLES <= slot_end, \
+        f'{sample_name} replacement is {num_samples} samples, slot holds {(slot_end-slot_start)*PAD_SAMPLES}'
+
+    header = bytes([UPDATE_OPCODE, slot]) + slot_start.to_bytes(3, 'little')
+    data_to_transmit = header + get_payload(padded_wav_samples, compress)
+    print(f'{sample_name} (slot {slot}) num samples: {num_samples}, DRAM offset: {slot_start}')
+    print(data_to_transmit[0:8].hex())
+
+    if ser is not None:
+        print(f'Sending update for {sample_name} over serial port...')
+        start = time.perf_counter()
+        ser.write(data_to_transmit)
+        ser.flush()
+        print(f'Transmit: {time.perf_counter() - start:.3f} s')
+
 
 if __name__ == '__main__':
-    ser = None
-    print(f'Opening serial port {SERIAL_PORTNAME}\n')
-    ser = serial.Serial(SERIAL_PORTNAME, BAUD)
-    send_wav(ser)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('update_sample', nargs='?', help='Replace only this instrument (e.g. sd)')
+    parser.add_argument('update_file', nargs='?', help='WAV file to load into the instrument slot')
+    parser.add_argument('--compress', action='store_true', help='Rice-code samples over UART')
+    parser.add_argument('--image', help='Stream a kit image built with kit_image.py')
+    parser.add_argument('--port', default=SERIAL_PORTNAME, help='Serial port (e.g. a virtual_fpga.py pty)')
+    args = parser.parse_args()
 
+    ser = None
+    print(f'Opening serial port {args.port}\n')
+    ser = serial.Serial(args.port, BAUD)
+    if args.update_sample is not None:
+        send_update(ser, args.update_sample, args.update_file, compress=args.compress)
+    elif args.image is not None:
+        import kit_image
+        kit_image.send_kit_image(ser, args.image)
+    else:
+        send_wav(ser, compress=args.compress)
@@ -1,3 +1,11 @@
+import argparse
+import csv
+import json
+import threading
+import time
+
+import numpy as np
+
 import rtmidi
 import rtmidi.midiutil
 import serial
@@ -9,52 +17,347 @@ import serial
 
 CONTROLLER_COUNT = 13
 MIDI_CONTROLLER_MIN = 14
+NOTE_ON_CH10 = 0x99
+NOTE_KEY_LOW = 13  # Instruments 0-7
+NOTE_KEY_HIGH = 14  # Instruments 8-15
+# Must match MIDI_KEYS in top_level.sv (instrument order)
+MIDI_KEYS = [36, 38, 48, 45, 43, 46, 42, 44, 49, 51]
+CONTROL_RATE = 1000  # Hz; 13 frames take ~0.17 ms on the wire
+REPORT_INTERVAL = 1  # s
+LATENCY_BINS = np.logspace(-6, 0, 25)  # 1 us to 1 s, 4 bins per decade
+
+
+class LatencyStats:
+    # Per-stage latency samples (seconds), from the time.perf_counter()
+    # timestamps taken by MidiParamBridge and the writers:
+    #   delivery: how much later than rtmidi's own timestamps a message
+    #             reached the callback, relative to the previous message
+    #   pairing:  CC MSB to LSB
+    #   queue:    LSB to the start of the write (scheduler wait)
+    #   write:    serial write until the output buffer has drained
+    #   total:    LSB to write completion (MIDI in to UART out)
+    #   note:     note on to write completion
+    STAGES = ['delivery', 'pairing', 'queue', 'write', 'total', 'note']
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {stage: [] for stage in self.STAGES}
 
+    def record(self, stage, seconds):
+        with self.lock:
+            self.samples[stage].append(seconds)
 
-ser = None
-ser = serial.Serial('/dev/ttyUSB1', 1500000)
+    def summary(self):
+        with self.lock:
+            samples = {stage: np.array(values) for stage, values in self.samples.items()}
+        stats = {}
+        for stage, values in samples.items():
+            if len(values) == 0:
+                continue
+            counts, _ = np.histogram(values, np.concatenate(([0], LATENCY_BINS, [np.inf])))
+            stats[stage] = {
+                'count': len(values),
+                'p50_ms': np.percentile(values, 50) * 1e3,
+                'p99_ms': np.percentile(values, 99) * 1e3,
+                'max_ms': np.max(values) * 1e3,
+                'histogram': counts.tolist(),
+            }
+        return stats
 
+    def report(self):
+        print('latency ' + ', '.join(
+            f'{stage}: p50={stat["p50_ms"]:.3f} p99={stat["p99_ms"]:.3f} max={stat["max_ms"]:.3f} ms'
+            for stage, stat in self.summary().items()
+        ))
 
-def uart_write(ser, param_key, param_value):
+    def save(self, filename):
+        # Histogram bin i counts samples in [edges[i], edges[i+1]) seconds
+        stats = self.summary()
+        edges = [0] + LATENCY_BINS.tolist() + [float('inf')]
+        if filename.endswith('.csv'):
+            with open(filename, 'w', newline='') as csv_file:
+                writer = csv.writer(csv_file)
+                writer.writerow(['stage', 'count', 'p50_ms', 'p99_ms', 'max_ms'] +
+                                [f'<{edge*1e3:g}ms' for edge in edges[1:]])
+                for stage, stat in stats.items():
+                    writer.writerow([stage, stat['count'], stat['p50_ms'], stat['p99_ms'], stat['max_ms']] +
+                                    stat['histogram'])
+        else:
+            with open(filename, 'w') as json_file:
+                json.dump({'bin_edges_s': edges[:-1], 'stages': stats}, json_file, indent=4)
+
+
+def uart_frame(param_key, param_value):
     # param_key:    4-bit [0,   12]
     # param_value: 10-bit [0, 1023]
-    byte1 = bytes([int((param_key << 2) + (param_value >> 8))])
-    byte2 = bytes([int(param_value & 0b1111_1111)])
+    return bytes([
+        int((param_key << 2) + (param_value >> 8)),
+        int(param_value & 0b1111_1111)
+    ])
+
+
+def uart_note_frame(instrument, velocity):
+    # Note on, sent as a parameter frame (see uart_param_controller.sv)
+    # instrument: 4-bit [0, 15]
+    # velocity:   7-bit [0, 127]
+    param_key = NOTE_KEY_HIGH if instrument >= 8 else NOTE_KEY_LOW
+    return uart_frame(param_key, ((instrument & 0b111) << 7) + velocity)
+
+
+def uart_note_write(ser, instrument, velocity, t_in=None, latency=None):
+    if ser is not None:
+        ser.write(uart_note_frame(instrument, velocity))
+        ser.flush()
+    if latency is not None and t_in is not None:
+        latency.record('note', time.perf_counter() - t_in)
+    # Printed after the timestamps, so the console is not in the latency
+    print(f'uart_note_write instrument={instrument}, velocity={velocity}')
+
+
+def uart_write(ser, param_key, param_value, t_in=None, latency=None):
+    # Both bytes in one write, so the frame goes out in a single USB transfer
+    frame = uart_frame(param_key, param_value)
+    t_write = time.perf_counter()
     if ser is not None:
-        ser.write(byte1)
-        ser.write(byte2)
-    print(f'uart_write byte1={byte1.hex()}, byte2={byte2.hex()}')
-    print(f'uart_write param_key={param_key}, param_value={param_value}')
+        ser.write(frame)
+        # write() returns once the bytes are queued, flush() once they are sent
+        ser.flush()
+    t_done = time.perf_counter()
+    if latency is not None and t_in is not None:
+        latency.record('queue', t_write - t_in)
+        latency.record('write', t_done - t_write)
+        latency.record('total', t_done - t_in)
+    # Printed after the timestamps, so the console is not in the latency
+    print(f'uart_write byte1={frame[0:1].hex()}, byte2={frame[1:2].hex()}, '
+          f'param_key={param_key}, param_value={param_value}')
+
+
+class ParamScheduler:
+    # Last-value-wins parameter state, flushed at most control_rate times
+    # per second with one write per flush
+    # A change after an idle period is sent right away; during automation
+    # sweeps, values that are overwritten before the next flush are
+    # coalesced and values equal to what the FPGA already has are dropped
+
+    def __init__(self, ser, control_rate=CONTROL_RATE, report_interval=REPORT_INTERVAL, latency=None):
+        self.ser = ser
+        self.latency = latency
+        self.period = 1 / control_rate
+        self.report_interval = report_interval
+        self.cond = threading.Condition()
+        self.write_lock = threading.Lock()  # Notes are written from the rtmidi thread
+        self.pending = {}
+        self.last_sent = {}
+        self.stopped = False
+        self.last_flush = 0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+        self.received = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.sent = 0
+        self.flushes = 0
+        self.notes = 0
 
+    def __call__(self, param_key, param_value, t_in=None):
+        with self.cond:
+            self.received += 1
+            if param_key in self.pending:
+                self.coalesced += 1
+            self.pending[param_key] = (param_value, t_in)
+            self.cond.notify()
 
-rtmidi.midiutil.list_input_ports()
-midi_in, midi_port_name = rtmidi.midiutil.open_midiinput()
-print(f'Opened: {midi_port_name}')
-print(f'API: {rtmidi.get_api_display_name(midi_in.get_current_api())}')
+    def note(self, instrument, velocity, t_in=None):
+        # Notes are never coalesced or delayed
+        with self.write_lock:
+            if self.ser is not None:
+                self.ser.write(uart_note_frame(instrument, velocity))
+                self.ser.flush()
+        if self.latency is not None and t_in is not None:
+            self.latency.record('note', time.perf_counter() - t_in)
+        self.notes += 1
 
+    def start(self):
+        self.thread.start()
 
-cc_msb_controller = None
-cc_msb_value = None
-while True:
-    event = midi_in.get_message()
-    if event is not None:
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+        self.thread.join()
+        self.flush()
+        self.report()
+
+    def run(self):
+        last_report = time.perf_counter()
+        last_report_received = 0
+        while True:
+            with self.cond:
+                while not self.pending and not self.stopped:
+                    self.cond.wait(self.report_interval)
+                    if time.perf_counter() - last_report >= self.report_interval:
+                        break
+                if self.stopped:
+                    return
+
+            delay = self.last_flush + self.period - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self.flush()
+
+            if time.perf_counter() - last_report >= self.report_interval:
+                last_report = time.perf_counter()
+                if self.received != last_report_received:
+                    last_report_received = self.received
+                    self.report()
+
+    def flush(self):
+        with self.cond:
+            batch = self.pending
+            self.pending = {}
+
+        frames = b''
+        sent_times = []
+        for param_key, (param_value, t_in) in sorted(batch.items()):
+            if self.last_sent.get(param_key) == param_value:
+                self.dropped += 1
+                continue
+            frames += uart_frame(param_key, param_value)
+            self.last_sent[param_key] = param_value
+            sent_times.append(t_in)
+        if not frames:
+            return
+
+        with self.write_lock:
+            t_write = time.perf_counter()
+            if self.ser is not None:
+                self.ser.write(frames)
+                self.ser.flush()
+            self.last_flush = time.perf_counter()
+        if self.latency is not None:
+            self.latency.record('write', self.last_flush - t_write)
+            for t_in in sent_times:
+                if t_in is not None:
+                    self.latency.record('queue', t_write - t_in)
+                    self.latency.record('total', self.last_flush - t_in)
+        self.sent += len(frames) // 2
+        self.flushes += 1
+
+    def report(self):
+        print(f'received={self.received}, sent={self.sent} in {self.flushes} writes, '
+              f'coalesced={self.coalesced}, dropped={self.dropped}, notes={self.notes}, '
+              f'params={dict(sorted(self.last_sent.items()))}')
+        if self.latency is not None:
+            self.latency.report()
+
+
+class MidiParamBridge:
+    # rtmidi input callback (runs on rtmidi's thread as soon as a message
+    # arrives, instead of busy-polling get_message)
+    # output(param_key, param_value, t_in) is called for every complete CC
+    # pair, with t_in the time.perf_counter() at which the LSB arrived
+    # note_output(instrument, velocity, t_in) is called for channel 10 note
+    # ons of kit instruments, if given
+
+    def __init__(self, output, latency=None, note_output=None):
+        self.output = output
+        self.note_output = note_output
+        self.latency = latency
+        self.cc_msb_controller = None
+        self.cc_msb_value = None
+        self.cc_msb_time = None
+        self.last_message_time = None
+
+    def __call__(self, event, data=None):
+        t_in = time.perf_counter()
         msg, dt = event
-        if msg[0] == 176:
-            # CC message on channel 1
-            if msg[1] >= MIDI_CONTROLLER_MIN and msg[1] < MIDI_CONTROLLER_MIN + CONTROLLER_COUNT:
-                # MSB
-                cc_msb_controller = msg[1]
-                cc_msb_value = msg[2]
-            elif cc_msb_controller is not None:
-                if msg[1] == cc_msb_controller + 32:
-                    # LSB
-                    cc_lsb_value = msg[2]
+        if self.latency is not None and self.last_message_time is not None:
+            # dt is rtmidi's time since the previous message
+            self.latency.record('delivery', max(0, t_in - self.last_message_time - dt))
+        self.last_message_time = t_in
+
+        if msg[0] == NOTE_ON_CH10 and self.note_output is not None:
+            if msg[1] in MIDI_KEYS:
+                self.note_output(MIDI_KEYS.index(msg[1]), msg[2], t_in)
+            return
+
+        param = self.pair_cc(msg, t_in)
+        if param is not None:
+            self.output(*param, t_in)
+
+    def pair_cc(self, msg, t_in=None):
+        # Returns (param_key, param_value) once both halves of a 14-bit CC
+        # have arrived
+        if msg[0] != 176:
+            # Not a CC message on channel 1
+            return None
+        if msg[1] >= MIDI_CONTROLLER_MIN and msg[1] < MIDI_CONTROLLER_MIN + CONTROLLER_COUNT:
+            # MSB
+            self.cc_msb_controller = msg[1]
+            self.cc_msb_value = msg[2]
+            self.cc_msb_time = t_in
+        elif self.cc_msb_controller is not None:
+            if msg[1] == self.cc_msb_controller + 32:
+                # LSB
+                cc_lsb_value = msg[2]
+
+                # MSB and LSB are 7-bit
+                # Use together to form a 10-bit value
+                param_value = (self.cc_msb_value << 3) + (cc_lsb_value >> 4)
+
+                param_key = self.cc_msb_controller - MIDI_CONTROLLER_MIN
+
+                if self.latency is not None and t_in is not None:
+                    self.latency.record('pairing', t_in - self.cc_msb_time)
+                return param_key, param_value
+        return None
+
 
-                    # MSB and LSB are 7-bit
-                    # Use together to form a 10-bit value
-                    param_value = (cc_msb_value << 3) + (cc_lsb_value >> 4)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', default='/dev/ttyUSB1', help='Serial port (e.g. a virtual_fpga.py pty)')
+    parser.add_argument('--rate', type=float, default=CONTROL_RATE,
+                        help='Max parameter flushes per second (0: write and print every frame)')
+    parser.add_argument('--notes', action='store_true',
+                        help='Forward channel 10 note ons over UART (instead of the MIDI input)')
+    parser.add_argument('--latency', help='Record latencies and save the histograms to this .json or .csv file')
+    args = parser.parse_args()
 
-                    param_key = cc_msb_controller - MIDI_CONTROLLER_MIN
+    ser = None
+    ser = serial.Serial(args.port, 1500000)
 
-                    uart_write(ser, param_key, param_value)
+    rtmidi.midiutil.list_input_ports()
+    midi_in, midi_port_name = rtmidi.midiutil.open_midiinput()
+    print(f'Opened: {midi_port_name}')
+    print(f'API: {rtmidi.get_api_display_name(midi_in.get_current_api())}')
 
+    latency = LatencyStats() if args.latency is not None else None
+    scheduler = None
+    if args.rate > 0:
+        scheduler = ParamScheduler(ser, args.rate, latency=latency)
+        scheduler.start()
+        midi_in.set_callback(MidiParamBridge(
+            scheduler,
+            latency,
+            scheduler.note if args.notes else None
+        ))
+    else:
+        midi_in.set_callback(MidiParamBridge(
+            lambda param_key, param_value, t_in: uart_write(ser, param_key, param_value, t_in, latency),
+            latency,
+            (lambda instrument, velocity, t_in: uart_note_write(ser, instrument, velocity, t_in, latency))
+                if args.notes else None
+        ))
+    try:
+        # Sleep until Ctrl-C; all the work happens in the callback
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        midi_in.cancel_callback()
+        midi_in.close_port()
+        if scheduler is not None:
+            scheduler.stop()
+        if latency is not None:
+            latency.report()
+            latency.save(args.latency)
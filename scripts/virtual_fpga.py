@@ -0,0 +1,314 @@
+import argparse
+import json
+import os
+import select
+import time
+import tty
+
+import numpy as np
+
+import send_wav
+
+
+# pty-backed stand-in for the board, for running send_wav.py and
+# uart_param_controller.py without /dev/ttyUSB1:
+#   python scripts/virtual_fpga.py --log rx.json
+#   python scripts/send_wav.py --port <printed pty name>
+# Bytes are consumed at the UART rate (8N1 at send_wav.BAUD), and decoded
+# with the same protocols as sample_loader.sv / uart_param_controller.sv.
+
+INSTRUMENT_COUNT = 10  # top_level.sv
+CONTROLLER_COUNT = 13  # uart_param_controller.sv
+NOTE_KEY_LOW = 13
+NOTE_KEY_HIGH = 14
+BYTE_TIME = 10 / send_wav.BAUD
+READ_SIZE = 256  # ~1.7 ms of wire time per read at 1.5 Mbaud
+
+
+class RiceStreamDecoder:
+    # Incremental version of send_wav.rice_decode for data arriving in chunks
+
+    def __init__(self, num_samples):
+        self.num_samples = num_samples
+        self.samples = np.zeros(num_samples, dtype=np.uint16)
+        self.count = 0
+        self.bits = ''
+        self.pos = 0
+        self.bits_consumed = 0
+        self.bytes_fed = 0
+        self.prev = 0
+        self.k = 0
+
+    def done(self):
+        return self.count == self.num_samples
+
+    def feed(self, data):
+        # Returns the number of bytes of data that belong to this frame
+        self.bytes_fed += len(data)
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder='little') + ord('0')
+        self.bits = self.bits[self.pos:] + bits.tobytes().decode()
+        self.pos = 0
+
+        while not self.done():
+            pos = self.pos
+            k = self.k
+            if self.count % send_wav.RICE_BLOCK_SIZE == 0:
+                if len(self.bits) - pos < 4:
+                    break
+                k = int(self.bits[pos:pos+4][::-1], 2)
+                pos += 4
+            q = self.bits.find('0', pos, pos + send_wav.RICE_ESCAPE)
+            if q < 0:
+                if len(self.bits) - pos < send_wav.RICE_ESCAPE:
+                    break
+                pos += send_wav.RICE_ESCAPE
+                q = 0
+                nbits = 16
+            else:
+                q, pos = q - pos, q + 1
+                nbits = k
+            if len(self.bits) - pos < nbits:
+                break
+            r = int(self.bits[pos:pos+nbits][::-1], 2) if nbits > 0 else 0
+            pos += nbits
+
+            u = (q << nbits) | r
+            delta = (u >> 1) ^ -(u & 1)
+            self.prev = (self.prev + delta) & 0xFFFF
+            self.samples[self.count] = self.prev
+            self.count += 1
+            self.k = k
+            self.bits_consumed += pos - self.pos
+            self.pos = pos
+
+        if not self.done():
+            return len(data)
+        # The last byte of a frame is zero-padded
+        frame_bytes = -(-self.bits_consumed // 8)
+        return len(data) - (self.bytes_fed - frame_bytes)
+
+
+class VirtualFPGA:
+
+    def __init__(self, instrument_count=INSTRUMENT_COUNT, slot_ends=None):
+        self.instrument_count = instrument_count
+        self.events = []
+        self.rx_chunks = []
+        self.params = {}
+        self.instruments = []
+
+        # Kit load (sample_loader)
+        self.slot_ends = [] if slot_ends is None else list(slot_ends)
+        self.total_samples = self.slot_ends[-1] * send_wav.PAD_SAMPLES if self.slot_ends else 0
+        self.size_bytes = []
+        self.frame = None
+        self.frame_start_time = None
+
+        # Parameters and updates
+        self.pair = []
+        self.update_header = None
+
+    def loading(self):
+        return len(self.slot_ends) < self.instrument_count
+
+    def log(self, t, event_type, **kwargs):
+        self.events.append({'time': t, 'type': event_type, **kwargs})
+
+    def receive(self, data, t_first):
+        # t_first: time at which the first byte of data is completely received
+        self.rx_chunks.append({'time': t_first, 'bytes': len(data)})
+        i = 0
+        while i < len(data):
+            t = t_first + i*BYTE_TIME
+            if self.frame is not None:
+                i += self.receive_frame(data[i:], t)
+            elif self.loading() or self.update_header is not None:
+                self.receive_frame_start(data[i], t)
+                i += 1
+            else:
+                self.receive_pair(data[i], t)
+                i += 1
+
+    def receive_frame_start(self, byte, t):
+        # 3-byte sample count (preceded by the update header for updates)
+        if self.update_header is not None:
+            self.update_header.append(byte)
+            if len(self.update_header) < 5:
+                return
+            size_bytes = self.update_header[5:]
+        else:
+            if len(self.size_bytes) == 0:
+                self.frame_start_time = t
+            self.size_bytes.append(byte)
+            size_bytes = self.size_bytes
+        if len(size_bytes) < 3:
+            return
+
+        size = int.from_bytes(bytes(size_bytes), 'little')
+        compressed = bool(size & send_wav.COMPRESSED_FLAG)
+        num_samples = size & (send_wav.COMPRESSED_FLAG - 1)
+        self.frame = {
+            'num_samples': num_samples,
+            'compressed': compressed,
+            'bytes': 3,
+            'start': self.frame_start_time,
+            'decoder': RiceStreamDecoder(num_samples) if compressed else None,
+            'raw': bytearray(),
+        }
+        self.size_bytes = []
+        if num_samples == 0:
+            self.frame_done(t)
+
+    def receive_frame(self, data, t):
+        frame = self.frame
+        if frame['compressed']:
+            n = frame['decoder'].feed(data)
+            done = frame['decoder'].done()
+        else:
+            n = min(len(data), 2*frame['num_samples'] - len(frame['raw']))
+            frame['raw'] += data[:n]
+            done = len(frame['raw']) == 2*frame['num_samples']
+        frame['bytes'] += n
+        if done:
+            self.frame_done(t + (n-1)*BYTE_TIME)
+        return n
+
+    def frame_done(self, t):
+        frame = self.frame
+        self.frame = None
+        if frame['compressed']:
+            wav_samples = frame['decoder'].samples.view('<i2')
+        else:
+            wav_samples = np.frombuffer(bytes(frame['raw']), dtype='<i2')
+        info = {
+            'num_samples': frame['num_samples'],
+            'compressed': frame['compressed'],
+            'bytes': frame['bytes'],
+            'start': frame['start'],
+        }
+
+        if self.update_header is not None:
+            header = self.update_header
+            self.update_header = None
+            slot = header[1]
+            offset = int.from_bytes(bytes(header[2:5]), 'little')
+            fits = (
+                slot < len(self.slot_ends) and
+                frame['num_samples'] % send_wav.PAD_SAMPLES == 0 and
+                offset >= (0 if slot == 0 else self.slot_ends[slot-1]) and
+                offset + frame['num_samples'] // send_wav.PAD_SAMPLES <= self.slot_ends[slot]
+            )
+            if fits:
+                self.instruments[slot] = wav_samples
+            self.log(t, 'update', slot=slot, offset=offset, fits=fits, **info)
+            return
+
+        self.total_samples += frame['num_samples']
+        self.slot_ends.append(self.total_samples // send_wav.PAD_SAMPLES)
+        self.instruments.append(wav_samples)
+        self.log(t, 'instrument', index=len(self.slot_ends)-1, addr_offset=self.slot_ends[-1], **info)
+        if not self.loading():
+            self.log(t, 'load_complete')
+
+    def receive_pair(self, byte, t):
+        if len(self.pair) == 0 and byte == send_wav.UPDATE_OPCODE:
+            self.update_header = [byte]
+            self.frame_start_time = t
+            return
+        self.pair.append(byte)
+        if len(self.pair) < 2:
+            return
+        param_key = self.pair[0] >> 2 & 0xF
+        param_value = (self.pair[0] & 0b11) << 8 | self.pair[1]
+        self.pair = []
+        if param_key in (NOTE_KEY_LOW, NOTE_KEY_HIGH):
+            instrument = (param_key == NOTE_KEY_HIGH) << 3 | param_value >> 7
+            self.log(t, 'note', instrument=instrument, velocity=param_value & 0x7F,
+                     valid=instrument < self.instrument_count)
+            return
+        valid = param_key < CONTROLLER_COUNT
+        if valid:
+            self.params[param_key] = param_value
+        self.log(t, 'param', key=param_key, value=param_value, valid=valid)
+
+    def summary(self):
+        for event in self.events:
+            if event['type'] in ('instrument', 'update'):
+                duration = event['time'] - event['start']
+                print(f'{event["type"]} {event.get("index", event.get("slot"))}: '
+                      f'{event["num_samples"]} samples, {event["bytes"]} bytes in {duration:.3f} s')
+        params = [event for event in self.events if event['type'] == 'param']
+        if params:
+            print(f'{len(params)} parameter frames, last values: {dict(sorted(self.params.items()))}')
+        notes = [event for event in self.events if event['type'] == 'note']
+        if notes:
+            print(f'{len(notes)} notes')
+        total_bytes = sum(chunk['bytes'] for chunk in self.rx_chunks)
+        print(f'Received {total_bytes} bytes')
+
+    def save(self, filename):
+        with open(filename, 'w') as log_file:
+            json.dump({
+                'baud': send_wav.BAUD,
+                'slot_ends': self.slot_ends,
+                'params': self.params,
+                'events': self.events,
+                'rx_chunks': self.rx_chunks,
+            }, log_file, indent=4)
+
+
+def open_pty():
+    master_fd, slave_fd = os.openpty()
+    tty.setraw(slave_fd)
+    return master_fd, slave_fd, os.ttyname(slave_fd)
+
+
+def run(device, master_fd, idle_timeout=None):
+    # Reads at most READ_SIZE bytes at a time, and only once the previous
+    # bytes would have left the wire, so the host sees UART backpressure
+    # through the pty buffer
+    wire_free = time.perf_counter()
+    last_rx = time.perf_counter()
+    while True:
+        ready, _, _ = select.select([master_fd], [], [], 0.1)
+        now = time.perf_counter()
+        if not ready:
+            if idle_timeout is not None and device.rx_chunks and now - last_rx > idle_timeout:
+                return
+            continue
+        data = os.read(master_fd, READ_SIZE)
+        start = max(now, wire_free)
+        device.receive(data, start + BYTE_TIME)
+        wire_free = start + len(data)*BYTE_TIME
+        last_rx = wire_free
+        delay = wire_free - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Virtual FPGA on a pty for testing host tools')
+    parser.add_argument('--loaded', action='store_true',
+                        help=f'Start with the kit in {send_wav.KIT_LAYOUT_FILENAME} already loaded')
+    parser.add_argument('--log', help='Save received frames and timestamps to this JSON file')
+    parser.add_argument('--idle-timeout', type=float, help='Exit after this many seconds without data')
+    args = parser.parse_args()
+
+    slot_ends = None
+    if args.loaded:
+        with open(send_wav.KIT_LAYOUT_FILENAME) as layout_file:
+            slot_ends = json.load(layout_file)['slot_ends']
+    device = VirtualFPGA(slot_ends=slot_ends)
+    if args.loaded:
+        device.instruments = [None] * len(device.slot_ends)
+
+    master_fd, slave_fd, port_name = open_pty()
+    print(f'Virtual FPGA on {port_name}', flush=True)
+    try:
+        run(device, master_fd, args.idle_timeout)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        device.summary()
+        if args.log is not None:
+            device.save(args.log)
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+import cocotb
+from cocotb import runner as cocotb_runner
+
+import waves as waves_module
+
+
+# Drop-in get_runner() whose build step is skipped when nothing changed
+# The build is keyed on the contents of the listed sources, the build
+# arguments (toplevel, parameters, defines, build_args, timescale, waves)
+# and the simulator and cocotb versions. Each key gets its own image under
+# build_dir/cache, so several toplevels or parameter sets sharing a
+# sim_build all stay built. On a hit build() does nothing and test() runs
+# the cached image through test(build_dir=...), which cocotb supports
+# without a build() in the same process. Tests still run in build_dir
+# itself, which is where the testbenches' relative paths (../data,
+# ../media) expect to be. always=True rebuilds regardless of the key.
+# waves left unset follows the WAVES settings (waves.py), so by default
+# nothing is dumped.
+
+CACHE_DIR = 'cache'
+KEY_FILE = 'build_key'
+KEY_LENGTH = 12  # Hex digits in the image directory name
+VERSION_COMMANDS = {
+    'icarus': ['iverilog', '-V'],
+    'verilator': ['verilator', '--version'],
+    'questa': ['vsim', '-version'],
+    'xcelium': ['xrun', '-version'],
+    'ghdl': ['ghdl', '--version'],
+    'riviera': ['vsimsa', '-version'],
+}
+# build() arguments that do not change the compiled image
+IGNORED_ARGS = ['always', 'build_dir', 'clean', 'verbose', 'log_file']
+
+simulator_versions = {}
+
+
+def get_simulator_version(sim):
+    if sim not in simulator_versions:
+        version = ''
+        cmd = VERSION_COMMANDS.get(sim)
+        if cmd is not None and shutil.which(cmd[0]) is not None:
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            version = (result.stdout + result.stderr).strip().splitlines()[0:1]
+            version = version[0] if version else ''
+        simulator_versions[sim] = version
+    return simulator_versions[sim]
+
+
+def hash_file(path):
+    with open(path, 'rb') as source_file:
+        return hashlib.sha256(source_file.read()).hexdigest()
+
+
+def get_build_key(sim, kwargs):
+    sources = [*kwargs.get('sources', []), *kwargs.get('verilog_sources', []), *kwargs.get('vhdl_sources', [])]
+    settings = {name: value for name, value in kwargs.items() if name not in IGNORED_ARGS}
+    key = {
+        'sim': sim,
+        'sim_version': get_simulator_version(sim),
+        'cocotb': cocotb.__version__,
+        'settings': settings,
+        'sources': [(str(Path(source).resolve()), hash_file(source)) for source in sources],
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class CachedRunner:
+    # Wraps a cocotb runner; everything but build() and test() passes through
+
+    def __init__(self, runner, sim):
+        self.runner = runner
+        self.sim = sim
+        self.test_dir = None
+        self.image_dir = None
+        self.waves = False
+        self.dump_module = False
+
+    def __getattr__(self, name):
+        return getattr(self.runner, name)
+
+    def build(self, build_dir='sim_build', always=False, waves=None, **kwargs):
+        build_dir = Path(build_dir).resolve()
+        build_dir.mkdir(parents=True, exist_ok=True)
+        self.waves = waves_module.is_enabled() if waves is None else bool(waves)
+        kwargs['waves'] = self.waves
+        self.dump_module = self.waves and self.sim == 'icarus'
+        if self.dump_module:
+            # Scoped dump module instead of cocotb's; its source is part of the key
+            hdl_toplevel = kwargs.get('hdl_toplevel')
+            dump_source = build_dir / f'{waves_module.DUMP_MODULE}_{hdl_toplevel}.v'
+            dump_source.write_text(waves_module.get_dump_module(hdl_toplevel, build_dir / f'{hdl_toplevel}.fst'))
+            kwargs['waves'] = False
+            kwargs['sources'] = [*kwargs.get('sources', []), dump_source]
+            kwargs['build_args'] = [*kwargs.get('build_args', []), '-s', waves_module.DUMP_MODULE]
+        elif self.waves and any(waves_module.get_window()):
+            print(f'WAVES_START/WAVES_STOP are only supported with icarus, dumping all of {self.sim}')
+        key = get_build_key(self.sim, kwargs)
+        self.image_dir = build_dir / CACHE_DIR / f'{kwargs.get("hdl_toplevel")}-{key[:KEY_LENGTH]}'
+        self.test_dir = build_dir
+        key_file = self.image_dir / KEY_FILE
+
+        if not always and key_file.exists() and key_file.read_text() == key:
+            print(f'Reusing build {self.image_dir}')
+            return
+
+        key_file.unlink(missing_ok=True)
+        self.runner.build(build_dir=self.image_dir, always=True, **kwargs)
+        key_file.write_text(key)
+
+    def test(self, build_dir=None, test_dir=None, plusargs=(), waves=None, **kwargs):
+        if build_dir is None:
+            build_dir = self.image_dir
+        if test_dir is None:
+            test_dir = self.test_dir
+        plusargs = list(plusargs)
+        if waves is None:
+            waves = self.waves
+        if waves and self.dump_module:
+            waves = False
+            plusargs += ['-fst', *waves_module.get_window_plusargs()]
+        # cocotb guesses the language from the sources build() was given,
+        # which a cache hit never passes on
+        kwargs.setdefault('hdl_toplevel_lang', 'verilog')
+        return self.runner.test(build_dir=build_dir, test_dir=test_dir, plusargs=plusargs, waves=waves, **kwargs)
+
+
+def get_runner(sim):
+    return CachedRunner(cocotb_runner.get_runner(sim), sim)
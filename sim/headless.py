@@ -0,0 +1,67 @@
+import os
+import sys
+from pathlib import Path
+
+
+# Batch mode for the plotting and interactive testbenches
+# HEADLESS=1 in the environment (or --headless on a testbench's command
+# line, which sets it for the simulator process too) makes show_figures()
+# and show_image() save into ARTIFACT_DIR instead of opening windows, and
+# ask() take its answer from an environment variable instead of input().
+# matplotlib gets the Agg backend, so no GUI toolkit is imported. Import
+# this before matplotlib.
+
+if '--headless' in sys.argv:
+    os.environ['HEADLESS'] = '1'
+HEADLESS = os.getenv('HEADLESS', '0') not in ('', '0')
+
+# Absolute, so the runner and the simulator (which runs in sim_build) agree
+os.environ.setdefault('ARTIFACT_DIR', str(Path('artifacts').resolve()))
+ARTIFACT_DIR = Path(os.environ['ARTIFACT_DIR'])
+
+if HEADLESS:
+    os.environ['MPLBACKEND'] = 'Agg'
+    if 'matplotlib' in sys.modules:
+        sys.modules['matplotlib'].use('Agg')
+
+
+def get_artifact_path(filename):
+    ARTIFACT_DIR.mkdir(parents=True, exist_ok=True)
+    return ARTIFACT_DIR / filename
+
+
+def show_figures(name):
+    # plt.show(), or every open figure saved as name.png (name_1.png, ...)
+    import matplotlib.pyplot as plt
+    if not HEADLESS:
+        plt.show()
+        return
+    for i, number in enumerate(plt.get_fignums()):
+        filename = f'{name}.png' if i == 0 else f'{name}_{i}.png'
+        plt.figure(number).savefig(get_artifact_path(filename))
+        print(f'Saved {ARTIFACT_DIR / filename}')
+    plt.close('all')
+
+
+def show_image(image, name):
+    # PIL Image.show(), or the image saved as name.png
+    if not HEADLESS:
+        image.show()
+        return
+    image.save(get_artifact_path(f'{name}.png'))
+    print(f'Saved {ARTIFACT_DIR / name}.png')
+
+
+def ask(prompt, env_name, default, is_valid):
+    # input() until is_valid(answer); headless, $env_name or default
+    if HEADLESS:
+        answer = os.getenv(env_name, default)
+        assert is_valid(answer), f'{env_name}={answer!r} is not valid for: {prompt}'
+        print(f'{prompt}: {answer} ({env_name})')
+        return answer
+    answer = None
+    while answer is None or not is_valid(answer):
+        print(f"\n---------- {prompt} ----------")
+        print(">", end="")
+        answer = input()
+    return answer
@@ -0,0 +1,26 @@
+import numpy as np
+
+from fixed_point import saturate
+
+# Bit-exact model of audio_crush.sv
+# Sample and hold every pot_crush[9:5]+1 inputs, then gain of
+# 2**pot_crush[9:7] (clipped) and truncation of 2*pot_crush[9:7] LSBs
+
+
+def crush(x, pot_crush):
+    # One output per input, starting from reset (held output 0)
+    x = np.asarray(x, dtype=np.int64)
+    hold = (pot_crush >> 5) + 1
+    shift = pot_crush >> 7
+    lsbs = (1 << (2*shift)) - 1
+
+    clipped = saturate(x << shift, 16)
+    crushed = np.where(x < 0, clipped | lsbs, clipped & ~lsbs)
+
+    # sample_counter reaches pot_crush[9:5] on inputs hold-1, 2*hold-1, ...
+    n = np.arange(len(x))
+    y = np.zeros(len(x), dtype=np.int64)
+    has_sample = n >= hold - 1
+    last = ((n + 1) // hold) * hold - 1
+    y[has_sample] = crushed[last[has_sample]]
+    return y
@@ -0,0 +1,86 @@
+import numpy as np
+
+import resampler_model
+from fixed_point import saturate, wrap
+from resampler_model import pitch_to_sample_period
+
+
+# Bit-exact model of audio_delay.sv
+# The input is resampled to 100 MHz/sample_period, runs through a feedback
+# delay line of DELAY_FAST or DELAY_SLOW samples at that rate, and is
+# resampled back to the base rate. The resamplers run from reset, so their
+# outputs depend on the cycle each input arrives at.
+
+BASE_SAMPLE_PERIOD = 2272
+DELAY_DEPTH = 8 * 1024
+DELAY_FAST = 513         # bram_rd_addr = bram_wr_addr - 512
+DELAY_SLOW = DELAY_DEPTH  # bram_rd_addr = bram_wr_addr + 1
+DELAY_LINE_LATENCY = 3   # resampled_in_valid to delay_line_out_valid
+
+# First sample from the base resampler (after its reset zero)
+BASE_FIRST_CYCLE = (
+    resampler_model.SAMPLE_PERIOD_OUT * resampler_model.DOWNSAMPLE - 1
+    + resampler_model.FARROW_LATENCY + resampler_model.DOWNSAMPLER_LATENCY
+)
+
+
+def get_base_cycles(n, latency=0):
+    # Arrival cycles of a base-rate stream that starts with the reset zero of
+    # a resampler/downsampler, as audio_processor.sv sees them from reset
+    # latency: extra cycles added by the modules in between
+    cycles = BASE_FIRST_CYCLE + BASE_SAMPLE_PERIOD * np.arange(n - 1)
+    return latency + np.concatenate(([resampler_model.DOWNSAMPLER_RESET_CYCLE], cycles))
+
+
+def delay_line(r, pot_wet, pot_feedback, delay):
+    # r: resampled input stream; returns delay_line_out
+    # Feedback only reaches back delay samples, so the line is processed in
+    # blocks of that length
+    r = np.asarray(r, dtype=np.int64)
+    d = np.zeros(delay + len(r), dtype=np.int64)  # d[delay+n]: written on step n
+    for start in range(0, len(r), delay):
+        stop = min(start + delay, len(r))
+        d_out = d[start:stop]
+        out_fb = (d_out * pot_feedback) >> 10
+        d[delay+start:delay+stop] = saturate(r[start:stop] + out_fb, 16)
+    d_out = d[:len(r)]
+    out_dry = wrap(r - ((r * pot_wet) >> 10))
+    out_wet = (d_out * pot_wet) >> 10
+    return wrap(out_dry + out_wet)
+
+
+def audio_delay(x, pot_wet, pot_rate, pot_feedback, fast, in_cycles=None, coeffs=None):
+    # x: input stream, arriving at in_cycles (default get_base_cycles)
+    # Returns one output per input: the module's reset zero, then the
+    # resampled delay output
+    x = np.asarray(x, dtype=np.int64)
+    if in_cycles is None:
+        in_cycles = get_base_cycles(len(x))
+    in_cycles = np.asarray(in_cycles, dtype=np.int64)
+    if coeffs is None:
+        coeffs = resampler_model.load_coeffs()
+    sample_period = int(pitch_to_sample_period(pot_rate))
+    end_cycle = int(in_cycles[-1]) + BASE_SAMPLE_PERIOD
+
+    # resampler_delay_in
+    period_in = sample_period >> 2
+    farrow_in, _, triggers_in = resampler_model.farrow_upsample(
+        x, BASE_SAMPLE_PERIOD, period_in, n_out=end_cycle // period_in + 1, in_cycles=in_cycles
+    )
+    r = np.concatenate(([0], resampler_model.downsample(farrow_in, coeffs)))
+    r_cycles = np.concatenate((
+        [resampler_model.DOWNSAMPLER_RESET_CYCLE], resampler_model.get_output_cycles(triggers_in)
+    ))
+    keep = r_cycles < end_cycle
+    delay_out = delay_line(r[keep], pot_wet, pot_feedback, DELAY_FAST if fast else DELAY_SLOW)
+
+    # resampler_delay_out (sample_period_buf holds the new period from the
+    # first input on)
+    period_out = resampler_model.SAMPLE_PERIOD_OUT
+    farrow_out, _, triggers_out = resampler_model.farrow_upsample(
+        delay_out, sample_period, period_out, n_out=end_cycle // period_out + 1,
+        in_cycles=r_cycles[keep] + DELAY_LINE_LATENCY
+    )
+    y = np.concatenate(([0], resampler_model.downsample(farrow_out, coeffs)))
+    y = y[:len(x)]
+    return np.concatenate((y, np.zeros(len(x) - len(y), dtype=np.int64)))
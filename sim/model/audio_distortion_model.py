@@ -0,0 +1,14 @@
+import numpy as np
+
+from fixed_point import saturate
+from tanh_approx_model import tanh_approx
+
+
+# Bit-exact model of audio_distortion.sv (runs at the x4 rate inside
+# audio_distortion_oversampled.sv)
+
+
+def distort(x, pot_drive):
+    # clipper (>> 7, 16 bits) then tanh_approx
+    x = np.asarray(x, dtype=np.int64)
+    return tanh_approx(saturate((x * pot_drive) >> 7, 16))
@@ -0,0 +1,174 @@
+import numpy as np
+
+from fixed_point import saturate, wrap
+from tanh_approx_model import tanh_approx
+
+
+# Bit-exact model of audio_filter_x4.sv (4-pole transistor ladder)
+# See "The Art of VA Filter Design" by Vadim Zavalishin
+
+SOFT_CLIP = 1  # audio_filter_oversampled.sv
+
+
+def get_G(pot_cutoff):
+    # G_div in audio_filter_x4.sv
+    g = np.asarray(pot_cutoff, dtype=np.int64)
+    return (g<<12) // (4096 + g)
+
+
+def filter_step(x, s, pot_cutoff, pot_quality, soft_clip=SOFT_CLIP):
+    # Scalar reference (one sample per call), as in test_audio_filter_x4.py
+    # but clipping/wrapping like the HDL instead of raising
+    k = int(pot_quality)
+    g = int(pot_cutoff)
+    s = [int(s_j) for s_j in s]
+
+    S = (s[3]<<24) + (s[2]<<12)*g + s[1]*g**2 + (s[0]>>12)*g**3
+    S_shift = wrap(S>>25)  # S[40:25]
+
+    kS = k * S_shift
+    u = min(max(int(x) - (kS>>8), -2**15), 2**15-1)
+    if soft_clip:
+        u = int(tanh_approx(u))
+    G = int(get_G(g))
+
+    for j in range(4):
+        v = G * (u - s[j])
+        u_lsh12 = v + (s[j]<<12)
+        s[j] = wrap((u_lsh12 + v) >> 12)
+        u = wrap(u_lsh12 >> 12)
+
+    return u, s
+
+
+def filter_stream(x, pot_cutoff, pot_quality, soft_clip=SOFT_CLIP, s=(0, 0, 0, 0)):
+    # filter_step over a whole stream for one configuration, unrolled on
+    # Python ints (several times faster than FilterGrid for a single pair)
+    # Returns (outputs, final state)
+    g = int(pot_cutoff)
+    k = int(pot_quality)
+    g2 = g*g
+    g3 = g2*g
+    G = int(get_G(g))
+    s0, s1, s2, s3 = (int(s_j) for s_j in s)
+
+    y = []
+    for x_i in np.asarray(x, dtype=np.int64).tolist():
+        S = ((s3<<24) + (s2<<12)*g + s1*g2 + (s0>>12)*g3) >> 25
+        S = ((S + 0x8000) & 0xFFFF) - 0x8000
+        u = min(max(x_i - ((k*S) >> 8), -0x8000), 0x7FFF)
+        if soft_clip:
+            # tanh_approx; the quotient truncates towards zero
+            if u < 0:
+                u = -((-(u<<30) - (u<<31) - u*u*u) // ((1<<30) + 3*u*u))
+            else:
+                u = ((u<<30) + (u<<31) + u*u*u) // ((1<<30) + 3*u*u)
+
+        v = G*(u - s0)
+        u_lsh12 = v + (s0<<12)
+        s0 = (((u_lsh12 + v) >> 12) + 0x8000 & 0xFFFF) - 0x8000
+        u = ((u_lsh12 >> 12) + 0x8000 & 0xFFFF) - 0x8000
+        v = G*(u - s1)
+        u_lsh12 = v + (s1<<12)
+        s1 = (((u_lsh12 + v) >> 12) + 0x8000 & 0xFFFF) - 0x8000
+        u = ((u_lsh12 >> 12) + 0x8000 & 0xFFFF) - 0x8000
+        v = G*(u - s2)
+        u_lsh12 = v + (s2<<12)
+        s2 = (((u_lsh12 + v) >> 12) + 0x8000 & 0xFFFF) - 0x8000
+        u = ((u_lsh12 >> 12) + 0x8000 & 0xFFFF) - 0x8000
+        v = G*(u - s3)
+        u_lsh12 = v + (s3<<12)
+        s3 = (((u_lsh12 + v) >> 12) + 0x8000 & 0xFFFF) - 0x8000
+        u = ((u_lsh12 >> 12) + 0x8000 & 0xFFFF) - 0x8000
+        y.append(u)
+
+    return np.array(y, dtype=np.int64), (s0, s1, s2, s3)
+
+
+class FilterGrid:
+    # filter_step for many (pot_cutoff, pot_quality) pairs at once
+    # The recursion runs one sample at a time, but each step is an array
+    # operation over every configuration. pot_cutoff and pot_quality are
+    # broadcast together, so a full knob sweep is
+    #   FilterGrid(np.arange(1024)[:, None], np.arange(1024)[None, :])
+    # State is kept between calls, so a stream can be processed in pieces.
+    # A RangeTracker records every node against its audio_filter_x4.sv
+    # register width.
+
+    def __init__(self, pot_cutoff, pot_quality, soft_clip=SOFT_CLIP, tracker=None):
+        g, k = np.broadcast_arrays(
+            np.asarray(pot_cutoff, dtype=np.int64),
+            np.asarray(pot_quality, dtype=np.int64)
+        )
+        self.shape = g.shape
+        self.soft_clip = soft_clip
+        self.tracker = tracker
+        self.g = g.ravel().copy()
+        self.k = k.ravel().copy()
+        self.g2 = self.g**2
+        self.g3 = self.g**3
+        self.G = get_G(self.g)
+
+        self.s = np.zeros((4, self.g.size), dtype=np.int64)
+
+        # Per-configuration event counts (samples in which each happened)
+        self.clips = np.zeros(self.g.size, dtype=np.int64)         # u clipper
+        self.overflows = np.zeros(self.g.size, dtype=np.int64)     # S, s[j] or u wrapped
+        self.first_overflow = np.full(self.g.size, -1, dtype=np.int64)
+        self.n = 0
+
+    def step(self, x):
+        # x: one input sample, either a scalar or one per configuration
+        s = self.s
+        tracker = self.tracker
+        S = (s[3]<<24) + (s[2]<<12)*self.g + s[1]*self.g2 + (s[0]>>12)*self.g3
+        S_full = S >> 25
+        S_shift = wrap(S_full)
+        overflow = S_shift != S_full
+
+        kS = self.k*S_shift
+        u_sub = np.asarray(x, dtype=np.int64).ravel() - (kS >> 8)
+        u = saturate(u_sub, 16)
+        self.clips += u != u_sub
+        if tracker is not None:
+            tracker.record('S', S, 41)
+            tracker.record('S[40:25]', S_full, 16)
+            tracker.record('kS', kS, 26)
+            tracker.record('u_sub', u_sub, 20)
+            tracker.record('u_clip', u_sub, 16)
+        if self.soft_clip:
+            u = tanh_approx(u)
+
+        for j in range(4):
+            v = self.G * (u - s[j])
+            u_lsh12 = v + (s[j]<<12)
+            s_full = (u_lsh12 + v) >> 12
+            s[j] = wrap(s_full)
+            u_full = u_lsh12 >> 12
+            if tracker is not None:
+                tracker.record('v_lsh12', v, 27)
+                tracker.record('u_lsh12', u_lsh12, 29)
+                tracker.record('uv_sum', u_lsh12 + v, 30)
+                tracker.record(f's[{j}]', s_full, 16)
+                tracker.record(f'u[{j}]', u_full, 16)
+            u = wrap(u_full)
+            overflow |= (s[j] != s_full) | (u != u_full)
+
+        self.overflows += overflow
+        self.first_overflow[overflow & (self.first_overflow < 0)] = self.n
+        self.n += 1
+        return u
+
+    def process(self, x):
+        # Returns an int16 array of shape (len(x),) + grid shape
+        y = np.empty((len(x), self.g.size), dtype=np.int16)
+        for i, sample in enumerate(x):
+            y[i] = self.step(sample)
+        return y.reshape((len(x),) + self.shape)
+
+    def stats(self):
+        return {
+            'clips': self.clips.reshape(self.shape),
+            'overflows': self.overflows.reshape(self.shape),
+            'first_overflow': self.first_overflow.reshape(self.shape),
+        }
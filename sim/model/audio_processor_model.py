@@ -0,0 +1,176 @@
+import numpy as np
+
+import audio_crush_model
+import audio_delay_model
+import audio_distortion_model
+import audio_filter_model
+import resampler_model
+import upsampler_model
+from audio_reverb_model import ReverbStereo
+
+
+# Bit-exact model of audio_processor.sv, one base-rate stream at a time
+# The mixer output is resampled to the base rate, routed through the effects
+# by audio_multi_mux.sv, and upsampled x16 for the DAC.
+#
+# Streams carry every valid pulse a module sees, in order: each resampler or
+# downsampler emits one zero shortly after reset, ahead of its real output.
+# Arrival cycles only matter for audio_delay.sv, whose resamplers run from
+# reset; they are tracked through the chain for a patch set at reset.
+
+SRC_BASE = 0
+SRC_DELAY = 1
+SRC_REVERB = 2
+SRC_FILTER = 3
+SRC_DISTORTION = 4
+SRC_CRUSH = 5
+SRC_NONE = 7
+
+SRC_CODES = {
+    'delay': SRC_DELAY,
+    'reverb': SRC_REVERB,
+    'filter': SRC_FILTER,
+    'distortion': SRC_DISTORTION,
+    'crush': SRC_CRUSH,
+}
+MODULES = list(SRC_CODES)
+
+# Cycles from a module's input to its output reaching the next module
+CRUSH_LATENCY = 1
+DISTORTION_LATENCY = 2030
+FILTER_LATENCY = 2059
+REVERB_LATENCY = 103
+
+# audio_processor.sv ports, without _on_clk
+DEFAULT_POTS = {
+    'volume': 0,
+    'delay_wet': 512,
+    'delay_rate': 512,
+    'delay_feedback': 512,
+    'delay_rate_fast': 0,
+    'reverb_wet': 512,
+    'reverb_size': 512,
+    'reverb_feedback': 512,
+    'filter_quality': 512,
+    'filter_cutoff': 512,
+    'distortion_drive': 128,
+    'crush_pressure': 0,
+}
+
+
+def chain_to_srcs(chain):
+    # ['crush', 'filter'] -> {'crush_src': 0, 'filter_src': 5, 'output_src': 3, ...}
+    # (what patch_reconstructor.sv decodes from a daisy chain of cables)
+    srcs = {f'{module}_src': SRC_NONE for module in MODULES}
+    src = SRC_BASE
+    for module in chain:
+        srcs[f'{module}_src'] = src
+        src = SRC_CODES[module]
+    srcs['output_src'] = src
+    return srcs
+
+
+def get_chain(srcs):
+    # Modules from the base to the output, or None when the output does not
+    # lead back to the base (no valid pulses, silence)
+    names = {code: module for module, code in SRC_CODES.items()}
+    chain = []
+    src = srcs['output_src']
+    while src != SRC_BASE:
+        if src not in names or names[src] in chain:
+            return None
+        chain.append(names[src])
+        src = srcs[f'{names[src]}_src']
+    return chain[::-1]
+
+
+def base(x, sample_period, start_cycle=None, coeffs=None):
+    # resampler_i: mixer output (one sample per sample_period cycles) to the
+    # base rate. The mixer's phase from reset is arbitrary in hardware.
+    if start_cycle is None:
+        start_cycle = sample_period
+    x = np.asarray(x, dtype=np.int64)
+    end_cycle = start_cycle + sample_period * len(x)
+    n_out = end_cycle // resampler_model.SAMPLE_PERIOD_OUT
+    n_out -= n_out % resampler_model.DOWNSAMPLE
+    y = resampler_model.resample(x, sample_period, n_out=n_out, start_cycle=start_cycle, coeffs=coeffs)
+    return np.concatenate(([0], y))
+
+
+def oversampled(x, process, phase=0):
+    # audio_*_oversampled.sv: x4 upsampler, process, downsampler
+    # phase: upsampler outputs emitted before the first input (0 from reset;
+    # arbitrary after re-patching a running module)
+    x4 = upsampler_model.upsample(x, 4)
+    x4 = np.concatenate((np.zeros(phase, dtype=np.int64), x4))
+    y = resampler_model.downsample(process(x4))
+    return np.concatenate(([0], y))[:len(x)]
+
+
+class AudioProcessor:
+    # Every process() call starts the effects from reset, so a pattern is
+    # rendered in one call
+
+    def __init__(self, pots=None, srcs=None, phases=None, sim_reverb=False):
+        self.pots = {**DEFAULT_POTS, **(pots or {})}
+        self.srcs = srcs if srcs is not None else chain_to_srcs([])
+        self.chain = get_chain(self.srcs)
+        self.phases = {'distortion': 0, 'filter': 0, **(phases or {})}
+        self.sim_reverb = sim_reverb
+
+    def process_module(self, module, x, cycles, is_last):
+        pots = self.pots
+        if module == 'crush':
+            return audio_crush_model.crush(x, pots['crush_pressure']), cycles + CRUSH_LATENCY
+        if module == 'distortion':
+            latency = DISTORTION_LATENCY
+            y = oversampled(
+                x, lambda x4: audio_distortion_model.distort(x4, pots['distortion_drive']),
+                self.phases['distortion']
+            )
+        elif module == 'filter':
+            latency = FILTER_LATENCY
+            y = oversampled(
+                x, lambda x4: audio_filter_model.filter_stream(
+                    x4, pots['filter_cutoff'], pots['filter_quality'], audio_filter_model.SOFT_CLIP
+                )[0],
+                self.phases['filter']
+            )
+        elif module == 'delay':
+            y = audio_delay_model.audio_delay(
+                x, pots['delay_wet'], pots['delay_rate'], pots['delay_feedback'],
+                pots['delay_rate_fast'], in_cycles=cycles
+            )
+            return y, audio_delay_model.get_base_cycles(len(y))
+        elif module == 'reverb':
+            # Stereo only when the reverb drives the output
+            reverb = ReverbStereo(
+                pots['reverb_wet'], pots['reverb_size'], pots['reverb_feedback'],
+                is_stereo=is_last, sim=self.sim_reverb
+            )
+            y_l, y_r = reverb.process(x)
+            y_l = np.asarray(y_l, dtype=np.int64)
+            if is_last:
+                return (y_l, np.asarray(y_r, dtype=np.int64)), cycles + REVERB_LATENCY
+            return y_l, cycles + REVERB_LATENCY
+        # Downsampler reset zero, then one output per input
+        out_cycles = np.concatenate(([resampler_model.DOWNSAMPLER_RESET_CYCLE], cycles[:-1] + latency))
+        return y, out_cycles
+
+    def process(self, x_base):
+        # x_base: base-rate stream from base(); returns (left, right) as fed
+        # to the output upsamplers
+        x = np.asarray(x_base, dtype=np.int64)
+        if self.chain is None:
+            silence = np.zeros(len(x), dtype=np.int64)
+            return silence, silence
+        cycles = audio_delay_model.get_base_cycles(len(x))
+        for i, module in enumerate(self.chain):
+            x, cycles = self.process_module(module, x, cycles, i == len(self.chain)-1)
+        if isinstance(x, tuple):
+            return x
+        return x, x
+
+    def dac_input(self, y):
+        # upsampler_l/r: x16 with volume, the stream dlt_sig_dac sees
+        return upsampler_model.upsample(y, 16, self.pots['volume'])
@@ -0,0 +1,289 @@
+import numpy as np
+
+from fixed_point import saturate, wrap
+
+# Bit-exact model of audio_reverb.sv / audio_reverb_stereo.sv
+# Adapted from Freeverb
+# https://github.com/sinshu/freeverb
+
+SPREAD = 23
+FB_AP = 1
+LPF_BIAS = 1 << 23     # lpf_out is 24-bit
+LPF_FIELD_BYTES = 5    # Biased lpf*damp + a stays below 2**34
+
+# audio_reverb.sv (SYNTHESIS); the right channel adds SPREAD to each delay
+LBCF_DELAYS = [1116, 1188, 1277, 1356, 1422, 1491, 1557, 1617]
+AP_DELAYS = [556, 441, 341, 225]
+
+# audio_reverb.sv (simulation), same for both channels
+LBCF_DELAYS_SIM = [5, 6, 7, 8, 9, 10, 11, 12]
+AP_DELAYS_SIM = [3, 4, 5, 6]
+
+
+def get_damp(pot_feedback):
+    # LPF multiplier in the LBCF feedback path
+    if pot_feedback == 1023:
+        return 1
+    return 1023-pot_feedback
+
+
+def lpf_lanes(a, lpf_out, damp):
+    # lpf[j, n] = (a[j, n] + lpf[j, n-1]*damp) >> 10 for every LBCF lane j,
+    # starting from lpf_out[j]
+    # The recursion is sample by sample, so all lanes are packed into one
+    # Python int per sample, LPF_FIELD_BYTES per lane, and stepped together.
+    # Offsetting each lane by LPF_BIAS keeps the fields non-negative:
+    #   (a + LPF_BIAS*(1024-damp) + (lpf+LPF_BIAS)*damp) >> 10 = next + LPF_BIAS
+    # and masking the low 10 bits of every field before the shift stops them
+    # spilling into the lane below.
+    lanes, n = a.shape
+    row_bytes = lanes * LPF_FIELD_BYTES
+
+    def to_bytes(values):
+        # (n, lanes) non-negative int64 -> LPF_FIELD_BYTES per value
+        values = np.ascontiguousarray(values, dtype='<u8').reshape(-1, lanes, 1)
+        return np.ascontiguousarray(values.view(np.uint8)[:, :, :LPF_FIELD_BYTES]).tobytes()
+
+    a_bytes = to_bytes((a + LPF_BIAS*(1024-damp)).T)
+    field_mask = (1 << (8*LPF_FIELD_BYTES)) - 1024
+    mask = int.from_bytes(field_mask.to_bytes(LPF_FIELD_BYTES, 'little') * lanes, 'little')
+    lpf = int.from_bytes(to_bytes(np.asarray(lpf_out) + LPF_BIAS), 'little')
+
+    out = []
+    for i in range(0, n*row_bytes, row_bytes):
+        lpf = ((int.from_bytes(a_bytes[i:i+row_bytes], 'little') + damp*lpf) & mask) >> 10
+        out.append(lpf.to_bytes(row_bytes, 'little'))
+
+    fields = np.zeros((n, lanes, 8), dtype=np.uint8)
+    fields[:, :, :LPF_FIELD_BYTES] = np.frombuffer(b''.join(out), dtype=np.uint8).reshape(n, lanes, LPF_FIELD_BYTES)
+    return fields.view('<u8').reshape(n, lanes).T.astype(np.int64) - LPF_BIAS
+
+
+class AP:
+    # Scalar reference (one sample per call)
+
+    def __init__(self, delay_samples, fb):
+        self.delay_samples = delay_samples
+        self.buf = np.zeros(delay_samples, dtype=np.int32)  # 18-bit
+        self.buf_index = 0
+        self.fb = fb
+
+    def process(self, sample):
+        # Max gain of 5/3 w/o clipping
+        # sample: 17-bit
+
+        buf_out = self.buf[self.buf_index]
+        out = np.int32(0)
+
+        out_full = -np.int32(sample) + buf_out
+        if out_full > 2**16-1:
+            print('CLIP: AP out')
+            out = 2**16-1
+        elif out_full < -2**16:
+            print('CLIP: AP out')
+            out = -2**16
+        else:
+            out = out_full
+
+        buf_next = np.int32(sample) + (buf_out >> self.fb)
+        if buf_next > 2**17-1 or buf_next < -2**17:
+            raise Exception('AP buf_next overflow')
+        self.buf[self.buf_index] = buf_next
+
+        self.buf_index += 1
+        if self.buf_index >= self.delay_samples:
+            self.buf_index = 0
+        return out
+
+
+class LBCF:
+    # Scalar reference (one sample per call)
+
+    def __init__(self, delay_samples, fb, damp):
+        self.delay_samples = delay_samples
+        self.buf = np.zeros(delay_samples, dtype=np.int32)  # 18-bit
+        self.buf_index = 0
+        self.fb = fb
+        self.damp = damp
+        self.lpf_out = np.int32(0)  # 24-bit
+
+    def process(self, sample):
+        # Max gain of 1 / (1-fb/1024) w/o clipping
+        # sample: 16-bit
+
+        out = self.buf[self.buf_index]
+
+        lpf_next = (
+            (out<<10) +
+            (self.lpf_out-out) * self.damp  # 25x10 bit mult
+        ) >> 10
+        self.lpf_out = lpf_next
+
+        buf_next = (
+            (np.int64(sample)<<13) +
+            (np.int64(self.lpf_out) * (self.fb + (895<<3)))  # 24x14 bit mult
+        ) >> 13
+        if buf_next > 2**17-1:
+            print('CLIP: LBCF buf')
+            self.buf[self.buf_index] = 2**17-1
+        elif buf_next < -2**17:
+            print('CLIP: LBCF buf')
+            self.buf[self.buf_index] = -2**17
+        else:
+            self.buf[self.buf_index] = buf_next
+
+        self.buf_index += 1
+        if self.buf_index >= self.delay_samples:
+            self.buf_index = 0
+        return out
+
+
+class ReverbChannelScalar:
+    # One audio_reverb.sv channel built from the scalar AP/LBCF classes
+
+    def __init__(self, pot_wet, pot_size, pot_feedback, lbcf_delays=LBCF_DELAYS, ap_delays=AP_DELAYS):
+        self.pot_wet = pot_wet
+        self.lbcfs = [LBCF(delay, pot_size, get_damp(pot_feedback)) for delay in lbcf_delays]
+        self.aps = [AP(delay, FB_AP) for delay in ap_delays]
+
+    def process_sample(self, sample):
+        lbcf_out_accum = np.int32(0)
+        for lbcf in self.lbcfs:
+            lbcf_out_accum += lbcf.process(sample)
+
+        apf_in = lbcf_out_accum >> 4
+        for ap in self.aps:
+            apf_in = ap.process(apf_in)
+
+        out_wet = apf_in >> 1
+
+        out_l = np.int32(out_wet)
+        xi = np.int32(sample)
+        return (self.pot_wet * (out_l-xi) + (xi<<10)) >> 10
+
+    def process(self, x):
+        return np.array([self.process_sample(sample) for sample in x], dtype=np.int64)
+
+
+class ReverbChannel:
+    # Block version of ReverbChannelScalar (bit-exact, including clipping)
+    # Feedback only reaches back delay_samples, so each delay line is
+    # processed in blocks of up to its delay as array operations. The LBCF
+    # damping LPF is the only sample-by-sample recursion.
+    # State is kept between calls, so a stream can be processed in pieces.
+    # A RangeTracker records every node against its audio_reverb.sv register
+    # width; AP buffer overflows are then recorded and wrapped like the BRAM
+    # word instead of raising.
+
+    def __init__(self, pot_wet, pot_size, pot_feedback, lbcf_delays=LBCF_DELAYS, ap_delays=AP_DELAYS, tracker=None):
+        self.pot_wet = pot_wet
+        self.tracker = tracker
+        self.fb = pot_size + (895<<3)
+        self.damp = get_damp(pot_feedback)
+        self.lbcf_delays = np.array(lbcf_delays)
+        self.ap_delays = list(ap_delays)
+
+        # Last max(delay) values written to each LBCF buffer (oldest first)
+        self.lbcf_hist = np.zeros((len(lbcf_delays), max(lbcf_delays)), dtype=np.int64)
+        self.lpf_out = np.zeros(len(lbcf_delays), dtype=np.int64)  # 24-bit
+        # Last delay values written to each AP buffer (oldest first)
+        self.ap_hist = [np.zeros(delay, dtype=np.int64) for delay in ap_delays]
+
+        self.clips = {'lbcf_buf': 0, 'ap_out': 0}
+
+    def process_lbcf(self, x):
+        # Sum of the LBCF outputs for each input sample
+        n = len(x)
+        hist_len = self.lbcf_hist.shape[1]
+        buf = np.concatenate((self.lbcf_hist, np.zeros((len(self.lbcf_delays), n), dtype=np.int64)), axis=1)
+        lanes = np.arange(len(self.lbcf_delays))[:, None]
+        block_size = int(np.min(self.lbcf_delays))
+        lpf_out = self.lpf_out
+        damp = self.damp
+        accum = np.zeros(n, dtype=np.int64)
+        for start in range(0, n, block_size):
+            stop = min(start + block_size, n)
+            # Read everything this block needs before writing any of it
+            out = buf[lanes, hist_len + np.arange(start, stop)[None, :] - self.lbcf_delays[:, None]]
+            accum[start:stop] = np.sum(out, axis=0)
+
+            # ((out<<10) + (lpf_out-out)*damp) >> 10
+            lpf = lpf_lanes(out * (1024 - damp), lpf_out, damp)
+            lpf_out = lpf[:, -1]
+
+            buf_next = ((x[start:stop].astype(np.int64)<<13) + lpf * self.fb) >> 13
+            buf_next_clip = saturate(buf_next, 18)
+            if self.tracker is not None:
+                self.tracker.record('lbcf_lpf_out', lpf, 24)
+                self.tracker.record('lbcf_buf_next_x8192', (x[start:stop].astype(np.int64)<<13) + lpf * self.fb, 39)
+                self.tracker.record('lbcf_buf_next', buf_next, 18)
+                self.tracker.record('lbcf_out_accum', accum[start:stop], 21)
+            self.clips['lbcf_buf'] += int(np.count_nonzero(buf_next != buf_next_clip))
+            buf[:, hist_len+start:hist_len+stop] = buf_next_clip
+        self.lpf_out = lpf_out
+        self.lbcf_hist = buf[:, buf.shape[1]-hist_len:]
+        return accum
+
+    def process_ap(self, index, x):
+        delay = self.ap_delays[index]
+        n = len(x)
+        buf = np.concatenate((self.ap_hist[index], np.zeros(n, dtype=np.int64)))
+        out = np.empty(n, dtype=np.int64)
+        for start in range(0, n, delay):
+            stop = min(start + delay, n)
+            buf_out = buf[start:stop]
+            out_full = buf_out - x[start:stop]
+            out[start:stop] = saturate(out_full, 17)
+            self.clips['ap_out'] += int(np.count_nonzero(out[start:stop] != out_full))
+
+            buf_next = x[start:stop] + (buf_out >> FB_AP)
+            if self.tracker is not None:
+                self.tracker.record('apf_out_full', out_full, 19)
+                self.tracker.record('apf_out_clip', out_full, 17)
+                self.tracker.record('apf_buf_next', buf_next, 18)
+                buf_next = wrap(buf_next, 18)
+            elif np.any(buf_next > 2**17-1) or np.any(buf_next < -2**17):
+                raise Exception('AP buf_next overflow')
+            buf[delay+start:delay+stop] = buf_next
+        self.ap_hist[index] = buf[n:]
+        return out
+
+    def process(self, x):
+        x = np.asarray(x, dtype=np.int64)
+        apf_in = self.process_lbcf(x) >> 4
+        for i in range(len(self.ap_delays)):
+            apf_in = self.process_ap(i, apf_in)
+        out_wet = apf_in >> 1
+        sample_out_x1024 = self.pot_wet * (out_wet-x) + (x<<10)
+        if self.tracker is not None:
+            self.tracker.record('sample_out_x1024', sample_out_x1024, 26)
+            self.tracker.record('sample_out', sample_out_x1024 >> 10, 16)
+        return sample_out_x1024 >> 10
+
+
+class ReverbStereo:
+    # audio_reverb_stereo.sv
+
+    def __init__(self, pot_wet, pot_size, pot_feedback, is_stereo, sim=False, tracker=None):
+        lbcf_delays = LBCF_DELAYS_SIM if sim else LBCF_DELAYS
+        ap_delays = AP_DELAYS_SIM if sim else AP_DELAYS
+        spread = 0 if sim else SPREAD
+        self.is_stereo = is_stereo
+        self.channels = [
+            ReverbChannel(pot_wet, pot_size, pot_feedback, lbcf_delays, ap_delays, tracker),
+            ReverbChannel(
+                pot_wet, pot_size, pot_feedback,
+                [delay+spread for delay in lbcf_delays],
+                [delay+spread for delay in ap_delays],
+                tracker
+            ),
+        ]
+
+    def process(self, x):
+        # Returns (left, right)
+        y_l = self.channels[0].process(x)
+        y_r = self.channels[1].process(x)
+        if self.is_stereo:
+            return y_l, y_r
+        mono = (y_l + y_r) >> 1
+        return mono, mono
@@ -0,0 +1,128 @@
+import numpy as np
+
+
+# Bit-exact model of dlt_sig_dac.sv (1st and 2nd order delta-sigma DACs)
+# One output bit per clock, starting with the first cycle after reset.
+# The noise LFSR and the 2nd order dither do not depend on the output, so
+# they are generated as arrays; only the loop itself runs clock by clock.
+
+HOLD_CYCLES = 2272 // 16  # upsampler.sv OUTPUT_PERIOD, x16 ratio in audio_processor.sv
+LFSR_SEED = 0xFFFFFF
+LFSR_TAPS = 0xC20001  # noise_source bits XORed with noise_source[23] on every shift
+LFSR_BITS = 24
+NOISE_BITS = [19, 16, 22, 18, 15, 0, 8, 11, 4, 9, 12, 7, 2, 13, 5, 14, 3, 1, 6, 10]  # noise[19:0]
+LFSR_SERIAL = 64  # States stepped one by one before jumping ahead
+
+
+def lfsr_step(state):
+    return ((state << 1) & 0xFFFFFF) ^ (LFSR_TAPS if state >> 23 else 0)
+
+
+def lfsr_jump(columns, states):
+    # Applies the linear map with columns[i] = image of bit i to every state
+    out = np.zeros_like(states)
+    for i, column in enumerate(columns):
+        out ^= np.where((states >> i) & 1, column, 0)
+    return out
+
+
+def get_noise_source(n, seed=LFSR_SEED):
+    # noise_source on each of n cycles
+    # The LFSR is linear over GF(2), so once the first block is known the
+    # next block of the same length is one jump away; each jump doubles
+    # the block.
+    states = np.empty(n, dtype=np.int64)
+    state = seed
+    block = min(n, LFSR_SERIAL)
+    for i in range(block):
+        states[i] = state
+        state = lfsr_step(state)
+
+    columns = []
+    for i in range(LFSR_BITS):
+        column = 1 << i
+        for _ in range(block):
+            column = lfsr_step(column)
+        columns.append(column)
+    columns = np.array(columns, dtype=np.int64)
+
+    while block < n:
+        count = min(block, n - block)
+        states[block:block+count] = lfsr_jump(columns, states[:count])
+        columns = lfsr_jump(columns, columns)
+        block *= 2
+    return states
+
+
+def get_dither(noise_source):
+    # dither = noise - last_noise, with noise the scrambled 20-bit signed value
+    noise = np.zeros(len(noise_source), dtype=np.int64)
+    for bit, source_bit in enumerate(NOISE_BITS[::-1]):
+        noise |= ((noise_source >> source_bit) & 1) << bit
+    noise -= (noise >> 19) << 20
+    return noise - np.concatenate(([0], noise[:-1]))
+
+
+def get_cycle_inputs(x, hold):
+    # current_sample on every cycle, each sample held for hold cycles
+    return np.repeat(np.asarray(x, dtype=np.int64), hold)
+
+
+def dac_1st_order(x, hold=HOLD_CYCLES):
+    # x: current_sample values (16-bit signed), each held for hold cycles
+    # Returns audio_out on every cycle (uint8)
+    x = get_cycle_inputs(x, hold)
+    n = len(x)
+    # current_error without the 3'b0 - audio_out term: {1'b0, ~cs[15], cs[14:0]} + 20'h02000
+    error_in = (((x & 0xFFFF) ^ 0x8000) + 0x2000).tolist()
+    threshold = (0x20000 + (get_noise_source(n) >> 8)).tolist()
+
+    out = bytearray(n)
+    error_sum = 0
+    for i in range(n):
+        if error_sum < 0x80000 and error_sum >= threshold[i]:
+            out[i] = 1
+            error_sum = (error_sum + error_in[i] + 0xE0000) & 0xFFFFF
+        else:
+            error_sum = (error_sum + error_in[i]) & 0xFFFFF
+    return np.frombuffer(bytes(out), dtype=np.uint8)
+
+
+def dac_2nd_order(x, hold=HOLD_CYCLES):
+    # x: current_sample values (16-bit signed), each held for hold cycles
+    # Returns audio_out on every cycle (uint8)
+    x = get_cycle_inputs(x, hold)
+    n = len(x)
+    # {~scaled_input[17], scaled_input[16:0]}, scaled_input = 3*current_sample
+    a_in = (3*x + (1<<17)).tolist()
+    dither = get_dither(get_noise_source(n)).tolist()
+
+    out = bytearray(n)
+    a_sum = 0
+    b_sum = 0
+    last_out = 0
+    for i in range(n):
+        # Sums are kept signed; only next_b_sum can leave 24 bits
+        audio_out = not last_out and b_sum >= 0
+        a_error = a_in[i] - (audio_out << 19)
+        b_error = a_sum + a_error - (audio_out << 19) + dither[i]
+
+        a_sum += a_error
+        if a_sum < -0x400000:
+            a_sum = -0x400000
+        elif a_sum > 0x400000:
+            a_sum = 0x400000
+
+        b_sum += b_error
+        if b_sum >= 0x800000:
+            b_sum -= 0x1000000
+        elif b_sum < -0x800000:
+            b_sum += 0x1000000
+        if b_sum < -0x400000:
+            b_sum = -0x400000
+        elif b_sum > 0x400000:
+            b_sum = 0x400000
+
+        out[i] = audio_out
+        last_out = audio_out
+    return np.frombuffer(bytes(out), dtype=np.uint8)
@@ -0,0 +1,24 @@
+import numpy as np
+
+
+# Signed fixed-point helpers shared by the bit-exact models
+# Values are int64 arrays of raw two's complement integers. wrap() is what
+# assigning to a narrower register does, saturate() is clipper.sv, and >> on
+# a signed value is Verilog's >>> (rounds towards -inf).
+
+
+def wrap(x, bits=16):
+    # Keep the low bits of a signed value
+    return ((np.asarray(x) + (1<<(bits-1))) & ((1<<bits)-1)) - (1<<(bits-1))
+
+
+def saturate(x, bits=16):
+    return np.clip(x, -(1<<(bits-1)), (1<<(bits-1))-1)
+
+
+def get_signed_bits(lo, hi):
+    # Smallest two's complement width holding every value in lo..hi
+    bits = 1
+    while lo < -(1 << (bits-1)) or hi > (1 << (bits-1)) - 1:
+        bits += 1
+    return bits
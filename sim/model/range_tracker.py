@@ -0,0 +1,61 @@
+import numpy as np
+
+from fixed_point import get_signed_bits
+
+
+# Value ranges of the fixed-point model nodes, for sizing HDL datapaths
+# Each node is recorded before it is stored, with the width of the register
+# it lands in. Values outside that width are counted as clips (whether the
+# HDL saturates or wraps them). Trackers merge, so a corpus can be split
+# across processes.
+
+
+class RangeTracker:
+
+    def __init__(self):
+        self.nodes = {}
+
+    def record(self, node, values, bits):
+        values = np.asarray(values)
+        if values.size == 0:
+            return
+        lo = int(values.min())
+        hi = int(values.max())
+        clips = 0
+        if lo < -(1 << (bits-1)) or hi > (1 << (bits-1)) - 1:
+            clips = int(np.count_nonzero((values < -(1 << (bits-1))) | (values > (1 << (bits-1)) - 1)))
+
+        entry = self.nodes.get(node)
+        if entry is None:
+            self.nodes[node] = {'bits': bits, 'min': lo, 'max': hi, 'count': values.size, 'clips': clips}
+            return
+        entry['min'] = min(entry['min'], lo)
+        entry['max'] = max(entry['max'], hi)
+        entry['count'] += values.size
+        entry['clips'] += clips
+
+    def merge(self, other):
+        for node, other_entry in other.nodes.items():
+            entry = self.nodes.get(node)
+            if entry is None:
+                self.nodes[node] = dict(other_entry)
+                continue
+            entry['min'] = min(entry['min'], other_entry['min'])
+            entry['max'] = max(entry['max'], other_entry['max'])
+            entry['count'] += other_entry['count']
+            entry['clips'] += other_entry['clips']
+        return self
+
+    def report(self):
+        # One row per node in recording order; headroom is the register width
+        # minus the width the recorded range needs (negative when it clips)
+        rows = []
+        for node, entry in self.nodes.items():
+            needed = get_signed_bits(entry['min'], entry['max'])
+            rows.append({
+                'node': node,
+                **entry,
+                'needed': needed,
+                'headroom': entry['bits'] - needed,
+            })
+        return rows
@@ -0,0 +1,153 @@
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from fixed_point import saturate
+
+
+# Bit-exact whole-stream model of resampler.sv
+# (farrow_upsampler.sv followed by the 4:1 polyphase downsampler.sv)
+
+DELAY_SCALE = 4
+M = 2**DELAY_SCALE
+FARROW_DIVISOR = 6 * M**3
+SAMPLE_PERIOD_OUT = 568  # resampler_and_upsampler.sv, 2272/4
+DEFAULT_PITCH = 512  # uart_param_controller.sv reset value, 2272 cycles (44.1 kHz)
+DOWNSAMPLE = 4
+# Cycles from a Farrow trigger to its output reaching the downsampler, and
+# from the 4th downsampler input to the output reaching the next module
+FARROW_LATENCY = 86
+DOWNSAMPLER_LATENCY = 133
+DOWNSAMPLER_RESET_CYCLE = 131  # Zero output shortly after reset
+FIR_CHUNK = 4096  # Outputs per matrix product in fir(), bounds memory
+COEFFS_FILENAME = Path(__file__).resolve().parent.parent.parent / 'data' / 'x4_filter_coeffs.mem'
+
+
+def pitch_to_sample_period(pitch):
+    # pitch_to_sample_period.sv, works on scalars and arrays
+    pitch = np.asarray(pitch, dtype=np.int64)
+    pitch_lerp_1 = (pitch % 256) * 4544
+    pitch_lerp_2 = np.abs(((pitch + 128) % 256) - 128) * 826
+    pitch_lerp_3 = np.abs(((pitch + 64) % 128) - 64) * 367
+    sample_period_numerator = 9088 - (pitch_lerp_1 + pitch_lerp_2 + pitch_lerp_3) // 256
+    return sample_period_numerator >> (pitch >> 8)
+
+
+def load_coeffs(filename=COEFFS_FILENAME):
+    # 18-bit two's complement hex, as written by x4_filter_design.py
+    with open(filename) as coeffs_file:
+        coeffs = np.array([int(line, 16) for line in coeffs_file if line.strip()], dtype=np.int64)
+    return coeffs - ((coeffs >> 17) << 18)
+
+
+def get_farrow(x, d):
+    # farrow_out before the division; x[0] is the newest sample
+    # Works on scalars and arrays (x of shape (4, n))
+    left_sum = x[3] - (6*x[0] - (3*x[1] + 2*x[0]))
+    top_sum_2 = d * (3*(x[1]-x[2]) + (x[3]-x[0]))
+    top_sum = d * (M*3*(x[0]+x[2]) - M*6*x[1] + top_sum_2)
+    return M**3 * 6*x[1] + d * (-M**2 * left_sum + top_sum)
+
+
+def farrow_divide(farrow_out):
+    # div_farrow on the magnitude, then the sign and clip logic
+    # A positive quotient of exactly 0x8000 wraps to -2**15, as in the HDL
+    q = np.abs(farrow_out) // FARROW_DIVISOR
+    positive = np.where(q > 0x8000, 2**15-1, np.where(q == 0x8000, -2**15, q))
+    negative = np.where(q > 0x8000, -2**15, -q)
+    return np.where(farrow_out < 0, negative, positive)
+
+
+def get_input_cycles(sample_period_in, start_cycle=0):
+    # Sample n arrives sample_period_in[n-1] cycles after sample n-1
+    sample_period_in = np.asarray(sample_period_in, dtype=np.int64)
+    return start_cycle + np.concatenate(([0], np.cumsum(sample_period_in[:-1])))
+
+
+def farrow_upsample(x, sample_period_in, sample_period_out=SAMPLE_PERIOD_OUT, n_out=None, start_cycle=0, in_cycles=None):
+    # farrow_upsampler.sv
+    # x: input samples; sample_period_in: value on the sample_period_in port
+    # when each sample arrives (scalar or one per sample); sample_period_out:
+    # scalar or one per output. Cycles count from the end of reset.
+    # in_cycles overrides the arrival cycles when they are not spaced by
+    # sample_period_in (audio_delay.sv holds a different period).
+    # Returns (output samples, delays, output trigger cycles)
+    x = np.asarray(x, dtype=np.int64)
+    sample_period_in = np.broadcast_to(np.asarray(sample_period_in, dtype=np.int64), x.shape)
+    if in_cycles is None:
+        in_cycles = get_input_cycles(sample_period_in, start_cycle)
+    in_cycles = np.asarray(in_cycles, dtype=np.int64)
+    if n_out is None:
+        # Enough outputs to cover the input, plus the last input period
+        n_out = int((in_cycles[-1] + sample_period_in[-1]) // np.min(sample_period_out))
+    out_periods = np.broadcast_to(np.asarray(sample_period_out, dtype=np.int64), (n_out,))
+    trigger_cycles = np.cumsum(out_periods) - 1
+
+    # Inputs strictly before each trigger, and whether one lands on it
+    before = np.searchsorted(in_cycles, trigger_cycles, side='left')
+    same_cycle = (before < len(in_cycles)) & (in_cycles[np.minimum(before, len(in_cycles)-1)] == trigger_cycles)
+
+    # sample_delay_counter / sample_period_hold -> delay
+    last = before - 1
+    has_last = last >= 0
+    last_clamped = np.maximum(last, 0)
+    counter = np.where(has_last, trigger_cycles - in_cycles[last_clamped] - 1, trigger_cycles) & 0xFFFF
+    hold = np.where(has_last, sample_period_in[last_clamped], 0)
+    quotient = np.where(hold > 0, (counter << DELAY_SCALE) // np.maximum(hold, 1), (1 << (16+DELAY_SCALE)) - 1)
+    delay = np.where(same_cycle, 0, quotient & ((1 << (DELAY_SCALE+2)) - 1))
+
+    # Newest sample in the Farrow buffer, including one arriving on the trigger
+    newest = np.where(same_cycle, before, last)
+    x_pad = np.concatenate((np.zeros(4, dtype=np.int64), x))
+    taps = np.stack([x_pad[newest + 4 - i] for i in range(4)])
+
+    return farrow_divide(get_farrow(taps, delay)), delay, trigger_cycles
+
+
+def fir(x, taps, step=1, start=0):
+    # y[m] = sum_k taps[k] * x[start + step*m - k], with zeros before x
+    # taps of shape (K, P) give P filters at once, y of shape (M, P)
+    # Computed as float64 matrix products: every partial sum is an integer
+    # well below 2**53 (18-bit taps, 16-bit samples, <= 1024 taps), so the
+    # result is exact in any summation order.
+    taps = np.asarray(taps, dtype=np.float64)[::-1]
+    x_pad = np.concatenate((np.zeros(len(taps)-1), np.asarray(x, dtype=np.float64)))
+    windows = sliding_window_view(x_pad, len(taps))[start::step]
+    y = np.empty((len(windows),) + taps.shape[1:], dtype=np.int64)
+    for chunk_start in range(0, len(windows), FIR_CHUNK):
+        chunk = slice(chunk_start, chunk_start + FIR_CHUNK)
+        y[chunk] = windows[chunk] @ taps
+    return y
+
+
+def get_downsampler_taps(coeffs):
+    # Effective taps of downsampler.sv by lag from the newest sample of each
+    # group of 4. The phases of the two odd lags are swapped relative to a
+    # plain decimating FIR, and the first sample of every phase is
+    # accumulated twice (the BRAM read pipeline presents bank 0 twice).
+    lag = np.arange(len(coeffs))
+    taps = coeffs[(-lag) % DOWNSAMPLE + DOWNSAMPLE*(lag // DOWNSAMPLE)]
+    taps[:DOWNSAMPLE] *= 2
+    return taps
+
+
+def downsample(x, coeffs=None):
+    # downsampler.sv; one output per 4 inputs, after the 4th
+    # (the HDL also emits a single zero shortly after reset, not included)
+    if coeffs is None:
+        coeffs = load_coeffs()
+    x = np.asarray(x, dtype=np.int64)
+    accum = fir(x, get_downsampler_taps(coeffs), DOWNSAMPLE, DOWNSAMPLE-1)
+    return saturate(accum >> 19, 16)
+
+
+def get_output_cycles(trigger_cycles):
+    # Cycle at which each downsampler output reaches the next module
+    return np.asarray(trigger_cycles)[DOWNSAMPLE-1::DOWNSAMPLE] + FARROW_LATENCY + DOWNSAMPLER_LATENCY
+
+
+def resample(x, sample_period_in, sample_period_out=SAMPLE_PERIOD_OUT, n_out=None, start_cycle=0, coeffs=None, in_cycles=None):
+    # resampler.sv: returns the downsampled output stream
+    farrow_out, _, _ = farrow_upsample(x, sample_period_in, sample_period_out, n_out, start_cycle, in_cycles)
+    return downsample(farrow_out, coeffs)
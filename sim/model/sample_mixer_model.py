@@ -0,0 +1,97 @@
+import numpy as np
+
+from fixed_point import saturate
+
+# Bit-exact model of sample_mixer.sv fed by instrument.sv
+# Notes (and retriggers) start on the next 8-sample DRAM chunk boundary and
+# play the padded sample to its end. dram_read_requester.sv updates an
+# instrument's velocity as soon as its note arrives, so the new velocity
+# also scales the end of the previous note up to that boundary. The mixer
+# adds one instrument per cycle as instr_counter rotates, starting from
+# wherever it is when sample_counter wraps, and saturates every partial sum,
+# so the order is modelled too (get_mix_order()).
+
+INSTRUMENT_COUNT = 10
+MIDI_KEYS = [36, 38, 48, 45, 43, 46, 42, 44, 49, 51]  # top_level.sv
+CHUNK_SAMPLES = 8  # dram_read_requester.sv, 128-bit DRAM words
+
+
+def scale(din, velocity):
+    # din * velocity >>> 7
+    return (np.asarray(din, dtype=np.int64) * np.asarray(velocity, dtype=np.int64)) >> 7
+
+
+def get_mix_order(n, sample_period, instrument_count=INSTRUMENT_COUNT, start=0):
+    # Instrument added first to each of mixer samples start to start+n.
+    # instr_counter is INSTRUMENT_COUNT-1 on the first cycle after reset and
+    # steps every cycle; sample k starts on cycle k*sample_period. Sample 0
+    # misses that first instrument (din_ready is still low) and adds it last.
+    k = np.arange(start, start + n, dtype=np.int64)
+    first = (k * sample_period - 1) % instrument_count
+    return np.where(k == 0, 0, first)
+
+
+def mix(din, velocity, sample_period, start=0):
+    # din: (INSTRUMENT_COUNT, n) samples presented to the mixer
+    # velocity: velocity of each instrument, (INSTRUMENT_COUNT,) or like din
+    # start: index of the first sample since reset, for the order
+    din = np.asarray(din, dtype=np.int64)
+    velocity = np.broadcast_to(np.asarray(velocity, dtype=np.int64).reshape(len(din), -1), din.shape)
+    scaled = scale(din, velocity)
+    columns = np.arange(din.shape[1])
+    first = get_mix_order(din.shape[1], sample_period, len(din), start)
+    dout = np.zeros(din.shape[1], dtype=np.int64)
+    for offset in range(len(din)):
+        # mix_clipper saturates every partial sum
+        dout = saturate(dout + scaled[(first + offset) % len(din), columns], 16)
+    return dout
+
+
+def get_note_index(time_s, sample_period, clk_freq=100e6):
+    # First mixer sample after a note arriving at time_s
+    return np.ceil(np.asarray(time_s) * clk_freq / sample_period).astype(np.int64)
+
+
+def get_start_index(time_s, sample_period, clk_freq=100e6):
+    # First mixer sample of a note triggered at time_s
+    index = get_note_index(time_s, sample_period, clk_freq)
+    return -(-index // CHUNK_SAMPLES) * CHUNK_SAMPLES
+
+
+def play_notes(kit, notes, n_samples, sample_period, start=0):
+    # kit: one sample array per instrument (padded to CHUNK_SAMPLES)
+    # notes: iterable of (time_s, instrument, velocity)
+    # Returns (din, velocity), each (len(kit), n_samples), for mix(), of
+    # mixer samples start to start+n_samples
+    din = np.zeros((len(kit), n_samples), dtype=np.int64)
+    velocity = np.zeros((len(kit), n_samples), dtype=np.int64)
+    notes = sorted(notes)
+    indices = np.arange(start, start + n_samples)
+    for instrument, sample in enumerate(kit):
+        instrument_notes = [note for note in notes if note[1] == instrument]
+        if not instrument_notes:
+            continue
+        times, _, velocities = zip(*instrument_notes)
+        note_indices = get_note_index(times, sample_period)
+        starts = get_start_index(times, sample_period)
+
+        # Velocity of the latest note at each sample
+        latest = np.searchsorted(note_indices, indices, side='right') - 1
+        velocity[instrument] = np.where(latest >= 0, np.array(velocities)[np.maximum(latest, 0)], 0)
+
+        sample = np.asarray(sample, dtype=np.int64)
+        for i, note_start in enumerate(starts):
+            # A retrigger cuts the previous note off
+            stop = starts[i+1] if i+1 < len(starts) else note_start + len(sample)
+            stop = min(stop, note_start + len(sample), start + n_samples)
+            first = max(note_start, start)
+            if first < stop:
+                din[instrument, first-start:stop-start] = sample[first-note_start:stop-note_start]
+    return din, velocity
+
+
+def get_midi_instrument(midi_key):
+    # instrument.sv only responds to its MIDI_KEY
+    if midi_key in MIDI_KEYS:
+        return MIDI_KEYS.index(midi_key)
+    return None
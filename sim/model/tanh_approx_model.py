@@ -0,0 +1,19 @@
+import numpy as np
+
+
+# Bit-exact model of tanh_approx.sv
+# 2**15 * tanh(3*x/2**15) as x*(27+y**2)/(27+9*y**2), y = 3*x/2**15
+
+def tanh_approx_float(x):
+    n = x*2**30 + x*2**31 + x**3
+    d = 2**30 + x**2 + 2*x**2
+    return n/d
+
+
+def tanh_approx(x):
+    # Works on scalars and arrays
+    x = np.asarray(x, dtype=np.int64)
+    n = (x<<30) + (x<<31) + x**3
+    d = (1<<30) + x**2 + ((x**2)<<1)
+    out = np.abs(n) // d
+    return np.where(n < 0, -out, out)
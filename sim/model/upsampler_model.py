@@ -0,0 +1,53 @@
+from pathlib import Path
+
+import numpy as np
+
+from fixed_point import saturate, wrap
+from resampler_model import fir, load_coeffs
+
+
+# Bit-exact whole-stream model of upsampler.sv
+# Every input is followed by RATIO outputs, output u after input n being
+#   sum_t h[RATIO*t + u] * x[n-t]
+# (the polyphase bank of the stored filter), then volume and clipping.
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / 'data'
+ACCUM_WIDTH = 48
+
+# (FILTER_FILE, FILTER_TAPS, FILTER_SCALE) by RATIO, as instantiated in
+# audio_*_oversampled.sv and audio_processor.sv
+FILTERS = {
+    4: (DATA_DIR / 'x4_filter_coeffs.mem', 512, 19),
+    16: (DATA_DIR / 'DAC_filter_coeffs.mem', 1024, 21),
+}
+
+
+def get_output_shift(ratio, volume_en):
+    # OUTPUT_SHIFT
+    _, _, filter_scale = FILTERS[ratio]
+    return filter_scale - int(np.log2(ratio)) + volume_en*2
+
+
+def get_volume_mult(volume):
+    # volume_mult: 7-bit mantissa with an implicit leading one, 3-bit exponent
+    volume = int(volume)
+    exponent = volume >> 7
+    mantissa = volume & 0x7F
+    if exponent == 0:
+        return mantissa
+    return (128 + mantissa) << (exponent - 1)
+
+
+def upsample(x, ratio=4, volume=None, coeffs=None):
+    # volume=None for VOLUME_EN=0
+    # Returns ratio*len(x) outputs; the outputs the HDL emits before the
+    # first input (all zero) are not included
+    filter_file, filter_taps, _ = FILTERS[ratio]
+    if coeffs is None:
+        coeffs = load_coeffs(filter_file)
+    # Row t holds h[ratio*t + u] for every output u
+    accum = wrap(fir(x, coeffs[:filter_taps].reshape(-1, ratio)).ravel(), ACCUM_WIDTH)
+    if volume is not None:
+        # $signed(accum[34:10]) * volume_mult
+        accum = wrap(accum >> 10, 25) * get_volume_mult(volume)
+    return saturate(accum >> get_output_shift(ratio, volume is not None), 16)
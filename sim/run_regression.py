@@ -0,0 +1,307 @@
+import argparse
+import fnmatch
+import importlib
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+# Regression entry point for every sim/test_*.py
+# Each module's runner (is_runner() or test_*_runner()) runs in its own
+# process, in its own directory under --output-dir, with stdin closed and in
+# headless mode (headless.py) so it cannot wait on the user; figures and
+# images land in the directory's artifacts/. The directory
+# gets data/, media/ and sim/ links, because the testbenches and the HDL
+# open ../data, ../media and ../sim from the simulator's working directory
+# (sim_build under it, as when run from the repo root). Each toplevel a
+# runner tests writes its own cocotb results file; they are collected into
+# one JSON and one JUnit XML report.
+#
+# Waves are off (see waves.py; WAVES=1 in the environment turns them on for
+# every testbench). With --waves-on-failure, each failing testbench is run
+# again under waves/ in its directory with the same RANDOM_SEED, dumping only
+# the given window before the end of its first failing test.
+#
+# Speed is reported as simulated ns per wall second: the results files do not
+# say which clock a testbench ran, so cycles would be a guess.
+
+SIM_DIR = Path(__file__).resolve().parent
+PROJ_DIR = SIM_DIR.parent
+LINKS = ['data', 'media', 'sim']
+RESULTS_GLOB = 'results_*.xml'
+WAVES_GLOBS = ['*.fst', '*.vcd']
+SKIP_EXIT_CODE = 3  # Worker could not import the testbench
+RUNNER_PATTERN = re.compile(r'^def (\w*runner)\(\):', re.MULTILINE)
+
+
+def find_modules(patterns, exclude):
+    # (module, runner function) for every matching testbench with a runner
+    modules = []
+    for path in sorted(SIM_DIR.glob('test_*.py')):
+        module = path.stem
+        if patterns and not any(fnmatch.fnmatch(module, pattern) for pattern in patterns):
+            continue
+        if any(fnmatch.fnmatch(module, pattern) for pattern in exclude):
+            continue
+        match = RUNNER_PATTERN.search(path.read_text())
+        if match is not None:
+            modules.append((module, match.group(1)))
+    return modules
+
+
+class RegressionRunner:
+    # Wraps the cocotb runner a testbench gets from get_runner(): adds the
+    # extra build arguments and gives every test() call its own results file
+
+    def __init__(self, runner, build_args):
+        self.runner = runner
+        self.build_args = build_args
+        self.n_tests = 0
+
+    def build(self, build_args=(), **kwargs):
+        return self.runner.build(build_args=[*build_args, *self.build_args], **kwargs)
+
+    def test(self, hdl_toplevel, results_xml=None, **kwargs):
+        if results_xml is None:
+            results_xml = f'results_{self.n_tests}_{hdl_toplevel}.xml'
+        self.n_tests += 1
+        return self.runner.test(hdl_toplevel=hdl_toplevel, results_xml=results_xml, **kwargs)
+
+
+def run_worker(module, runner_name, build_args):
+    # Runs in the module's directory, in a fresh interpreter. The runners only
+    # extend sys.path once called, so their paths are added before the import
+    sys.path += [str(SIM_DIR), str(SIM_DIR / 'model')]
+    try:
+        test_module = importlib.import_module(module)
+    except ModuleNotFoundError as error:
+        # Missing toolchain or design package, e.g. vicoco
+        print(f'Skipped: {error}', flush=True)
+        sys.exit(SKIP_EXIT_CODE)
+    get_runner = test_module.get_runner
+    test_module.get_runner = lambda sim: RegressionRunner(get_runner(sim), build_args)
+    getattr(test_module, runner_name)()
+
+
+def read_results(results_file):
+    # One entry per cocotb test in a results file
+    toplevel = results_file.stem.split('_', 2)[2]
+    tests = []
+    end_ns = 0  # Tests run one after another in the same simulation
+    for testcase in ET.parse(results_file).iter('testcase'):
+        real_s = float(testcase.get('time', 0))
+        sim_time_ns = float(testcase.get('sim_time_ns', 0))
+        end_ns += sim_time_ns
+        failure = testcase.find('failure')
+        if failure is not None:
+            status = 'fail'
+        elif testcase.find('skipped') is not None:
+            status = 'skip'
+        else:
+            status = 'pass'
+        tests.append({
+            'name': testcase.get('name'),
+            'toplevel': toplevel,
+            'status': status,
+            'message': failure.get('message', '') if failure is not None else '',
+            'real_s': real_s,
+            'sim_time_ns': sim_time_ns,
+            'end_ns': end_ns,
+            'sim_ns_per_s': sim_time_ns / real_s if real_s > 0 else 0,
+        })
+    return tests
+
+
+def run_module(module, runner_name, module_dir, build_args, timeout, extra_env=None):
+    module_dir.mkdir(parents=True, exist_ok=True)
+    for link in LINKS:
+        if not (module_dir / link).exists():
+            (module_dir / link).symlink_to(PROJ_DIR / link)
+    build_dir = module_dir / 'sim_build'
+    for results_file in build_dir.glob(RESULTS_GLOB):
+        results_file.unlink()
+
+    cmd = [sys.executable, str(Path(__file__).resolve()), '--worker', module, runner_name]
+    cmd += [f'--build-arg={arg}' for arg in build_args]
+    env = {
+        **os.environ, 'HEADLESS': '1', 'MPLBACKEND': 'Agg', 'ARTIFACT_DIR': str(module_dir / 'artifacts'),
+        **(extra_env or {})
+    }
+    log_file = module_dir / 'log.txt'
+    start = time.perf_counter()
+    with open(log_file, 'w') as log:
+        # Own process group, so a timeout also stops the simulator
+        process = subprocess.Popen(
+            cmd, cwd=module_dir, env=env, stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+            start_new_session=True
+        )
+        try:
+            returncode = process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+            returncode = None
+    wall_s = time.perf_counter() - start
+
+    tests = []
+    for results_file in sorted(build_dir.glob(RESULTS_GLOB)):
+        tests += read_results(results_file)
+
+    message = ''
+    if returncode is None:
+        status = 'timeout'
+    elif returncode == SKIP_EXIT_CODE:
+        status = 'skip'
+        message = log_file.read_text().strip().splitlines()[-1]
+    elif any(test['status'] == 'fail' for test in tests):
+        status = 'fail'
+    elif returncode != 0 or not tests:
+        status = 'error'
+    else:
+        status = 'pass'
+    return {
+        'module': module,
+        'runner': runner_name,
+        'status': status,
+        'returncode': returncode,
+        'wall_s': wall_s,
+        'message': message,
+        'log': str(log_file),
+        'tests': tests,
+    }
+
+
+def rerun_with_waves(result, output_dir, build_args, timeout, window_ns, scope):
+    # Same testbench and seed, dumping window_ns up to the first failure
+    failure = next(test for test in result['tests'] if test['status'] == 'fail')
+    start_ns = max(failure['end_ns'] - window_ns, 0)
+    extra_env = {'WAVES': '1', 'WAVES_START': str(int(start_ns)), 'WAVES_STOP': str(int(failure['end_ns']) + 1)}
+    if scope is not None:
+        extra_env['WAVES_SCOPE'] = scope
+    waves_dir = output_dir / result['module'] / 'waves'
+    rerun = run_module(result['module'], result['runner'], waves_dir, build_args, timeout, extra_env)
+    files = [str(path) for pattern in WAVES_GLOBS for path in sorted((waves_dir / 'sim_build').glob(pattern))]
+    return {
+        'test': f'{failure["toplevel"]}.{failure["name"]}',
+        'start_ns': start_ns,
+        'stop_ns': failure['end_ns'],
+        'status': rerun['status'],
+        'log': rerun['log'],
+        'files': files,
+    }
+
+
+def write_junit(filename, results):
+    testsuites = ET.Element('testsuites', name='regression')
+    for result in results:
+        tests = result['tests']
+        failures = sum(test['status'] == 'fail' for test in tests)
+        errors = int(result['status'] in ('error', 'timeout'))
+        skipped = int(result['status'] == 'skip')
+        testsuite = ET.SubElement(
+            testsuites, 'testsuite', name=result['module'], tests=str(len(tests) + errors + skipped),
+            failures=str(failures), errors=str(errors), skipped=str(skipped), time=f'{result["wall_s"]:.3f}'
+        )
+        for test in tests:
+            testcase = ET.SubElement(
+                testsuite, 'testcase', classname=f'{result["module"]}.{test["toplevel"]}', name=test['name'],
+                time=f'{test["real_s"]:.3f}'
+            )
+            properties = ET.SubElement(testcase, 'properties')
+            ET.SubElement(properties, 'property', name='sim_ns_per_s', value=f'{test["sim_ns_per_s"]:.0f}')
+            if test['status'] == 'fail':
+                ET.SubElement(testcase, 'failure', message=test['message'])
+            elif test['status'] == 'skip':
+                ET.SubElement(testcase, 'skipped')
+        if errors:
+            # The runner itself failed (build error, exception, timeout)
+            testcase = ET.SubElement(
+                testsuite, 'testcase', classname=result['module'], name=result['runner'],
+                time=f'{result["wall_s"]:.3f}'
+            )
+            message = 'timeout' if result['status'] == 'timeout' else f'exit code {result["returncode"]}'
+            ET.SubElement(testcase, 'error', message=f'{message}, see {result["log"]}')
+        elif skipped:
+            # The testbench could not be imported
+            testcase = ET.SubElement(testsuite, 'testcase', classname=result['module'], name=result['runner'])
+            ET.SubElement(testcase, 'skipped', message=result['message'])
+    ET.indent(testsuites)
+    ET.ElementTree(testsuites).write(filename, encoding='utf-8', xml_declaration=True)
+
+
+def print_result(result):
+    sim_time_ns = sum(test['sim_time_ns'] for test in result['tests'])
+    real_s = sum(test['real_s'] for test in result['tests'])
+    rate = f'{sim_time_ns / real_s:>12.0f}' if real_s > 0 else f'{"":>12}'
+    print(f'{result["module"]:<40}{result["status"]:>8}{len(result["tests"]):>6}{result["wall_s"]:>10.1f}{rate}', flush=True)
+    if result['message']:
+        print(f'    {result["message"]}', flush=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the sim/test_*.py testbenches in parallel')
+    parser.add_argument('tests', nargs='*', help='Modules to run, e.g. test_upsampler or "test_audio_*" (default: all)')
+    parser.add_argument('--exclude', action='append', default=[], help='Modules to skip (same patterns)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Testbenches run at once (default: one per core)')
+    parser.add_argument('--output-dir', default=str(PROJ_DIR / 'regression'), help='Build directories, logs and reports')
+    parser.add_argument('--timeout', type=float, default=3600, help='Seconds before a testbench is stopped')
+    parser.add_argument('--sim', help='Simulator for every runner (sets SIM, default: the runners\' own)')
+    parser.add_argument('--build-arg', action='append', default=[], help='Extra simulator build argument')
+    parser.add_argument('--waves-on-failure', type=float, metavar='NS', help='Rerun failures dumping NS before the failure')
+    parser.add_argument('--waves-scope', help='Instances to dump on the rerun, e.g. upsampler_l,audio_reverb_1')
+    parser.add_argument('--worker', nargs=2, metavar=('MODULE', 'RUNNER'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        run_worker(*args.worker, args.build_arg)
+        sys.exit(0)
+
+    if args.sim is not None:
+        os.environ['SIM'] = args.sim
+    # Shared by every testbench and rerun, so failures reproduce
+    os.environ.setdefault('RANDOM_SEED', str(int(time.time())))
+    output_dir = Path(args.output_dir).resolve()
+    modules = find_modules(args.tests, args.exclude)
+
+    print(f'{len(modules)} testbenches, {args.workers} at a time, in {output_dir}, RANDOM_SEED={os.environ["RANDOM_SEED"]}')
+    print(f'{"module":<40}{"status":>8}{"tests":>6}{"wall s":>10}{"sim ns/s":>12}')
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(run_module, module, runner_name, output_dir / module, args.build_arg, args.timeout)
+            for module, runner_name in modules
+        ]
+        for future in futures:
+            print_result(future.result())
+        results = [future.result() for future in futures]
+
+        if args.waves_on_failure is not None:
+            failed = [result for result in results if result['status'] == 'fail']
+            waves_futures = [
+                pool.submit(
+                    rerun_with_waves, result, output_dir, args.build_arg, args.timeout, args.waves_on_failure,
+                    args.waves_scope
+                )
+                for result in failed
+            ]
+            for result, future in zip(failed, waves_futures):
+                result['waves'] = future.result()
+                print(f'{result["module"]}: waves of {result["waves"]["test"]} in {", ".join(result["waves"]["files"]) or "(none)"}')
+    elapsed = time.perf_counter() - start
+
+    counts = {status: sum(result['status'] == status for result in results) for status in ['pass', 'skip', 'fail', 'error', 'timeout']}
+    print(f'{len(results)} testbenches in {elapsed:.1f} s: ' + ', '.join(f'{n} {status}' for status, n in counts.items()))
+
+    with open(output_dir / 'report.json', 'w') as report_file:
+        report = {'wall_s': elapsed, 'random_seed': os.environ['RANDOM_SEED'], 'counts': counts, 'results': results}
+        json.dump(report, report_file, indent=2)
+    write_junit(output_dir / 'report.xml', results)
+    print(f'Reports: {output_dir / "report.json"}, {output_dir / "report.xml"}')
+    sys.exit(0 if counts['pass'] + counts['skip'] == len(results) else 1)
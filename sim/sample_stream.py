@@ -0,0 +1,90 @@
+import cocotb
+import numpy as np
+from cocotb.triggers import ClockCycles, RisingEdge, ReadOnly
+from cocotb.utils import get_sim_time as gst
+
+
+# Sample-rate stimulus and capture for the audio testbenches
+# drive_samples() sleeps between sample_in_valid pulses and SampleMonitor
+# wakes on sample_out_valid, so the Python side runs once per sample instead
+# of once per clock. Cycles are counted from when each was started; start the
+# driver and monitors together and their cycles line up.
+
+CLK_PERIOD_NS = 10
+
+
+def get_cycle():
+    return round(gst(units='ns') / CLK_PERIOD_NS)
+
+
+def get_sample_cycles(sample_periods):
+    # Cycles on which the old per-clock loops issued a sample: the first i
+    # with i - last >= sample_periods[i], starting from last = 0
+    sample_periods = np.asarray(sample_periods)
+    distance = np.arange(len(sample_periods)) - sample_periods
+    cycles = []
+    last = 0
+    while True:
+        ready = np.flatnonzero(distance[last+1:] >= last)
+        if len(ready) == 0:
+            return np.array(cycles, dtype=np.int64)
+        last += 1 + ready[0]
+        cycles.append(last)
+
+
+async def drive_samples(clk, data, valid, samples, cycles, end=None, extra=None):
+    # samples[k] on data with a one cycle valid pulse at cycles[k]; extra maps
+    # other inputs (sample_period_in, pitch, ...) to per-sample values set
+    # alongside. Returns at cycle end if given, else after the last sample.
+    extra = extra or {}
+    valid.value = 0
+    cycle = 0
+    for k, sample in enumerate(samples):
+        if cycles[k] > cycle:
+            await ClockCycles(clk, int(cycles[k]) - cycle)
+        data.value = int(sample)
+        valid.value = 1
+        for signal, values in extra.items():
+            signal.value = int(values[k])
+        await ClockCycles(clk, 1)
+        valid.value = 0
+        cycle = int(cycles[k]) + 1
+    if end is not None and end > cycle:
+        await ClockCycles(clk, end - cycle)
+
+
+class SampleMonitor:
+    # Records data (signed) on every cycle valid is high, or every period
+    # cycles for outputs without a valid
+
+    def __init__(self, clk, data, valid=None, period=None):
+        assert (valid is None) != (period is None)
+        self.clk = clk
+        self.data = data
+        self.valid = valid
+        self.period = period
+        self.cycles = []
+        self.samples = []
+        self.start = get_cycle()
+        self.task = cocotb.start_soon(self.run())
+
+    def record(self):
+        self.cycles.append(get_cycle() - self.start)
+        self.samples.append(self.data.value.signed_integer)
+
+    async def run(self):
+        if self.valid is None:
+            while True:
+                await ClockCycles(self.clk, self.period)
+                await ReadOnly()
+                self.record()
+        while True:
+            await RisingEdge(self.valid)
+            await ReadOnly()
+            while self.valid.value == 1:
+                self.record()
+                await RisingEdge(self.clk)
+                await ReadOnly()
+
+    def stop(self):
+        self.task.kill()
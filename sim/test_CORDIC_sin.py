@@ -22,7 +22,7 @@ from cocotb.triggers import (
     Join,
 )
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from build_cache import get_runner
 
 from random import getrandbits
 
@@ -95,18 +95,16 @@ def test_CORDIC_sin_runner():
     runner.build(
         sources=sources,
         hdl_toplevel="CORDIC_sin",
-        always=True,
+        always=False,
         build_args=build_test_args,
         parameters=parameters,
         timescale=("1ns", "1ps"),
-        waves=True,
     )
     run_test_args = []
     runner.test(
         hdl_toplevel="CORDIC_sin",
         test_module="test_CORDIC_sin",
         test_args=run_test_args,
-        waves=True,
     )
 
 
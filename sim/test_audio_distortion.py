@@ -7,7 +7,8 @@ from pathlib import Path
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from build_cache import get_runner
+import headless
 import matplotlib.pyplot as plt
 import wave
 import numpy as np
@@ -78,7 +79,7 @@ async def test_a(dut):
         ax.legend()
         fig.suptitle(f'Input Drive = {drive/256}')
         fig.tight_layout()
-        plt.show()
+        headless.show_figures(f'audio_distortion_drive_{drive}')
 
 
 def is_runner():
@@ -99,18 +100,16 @@ def is_runner():
     runner.build(
         sources=sources,
         hdl_toplevel=hdl_toplevel,
-        always=True,
+        always=False,
         build_args=build_test_args,
         parameters=parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
+        timescale = ('1ns','1ps')
     )
     run_test_args = []
     runner.test(
         hdl_toplevel=hdl_toplevel,
         test_module=test_file,
-        test_args=run_test_args,
-        waves=True
+        test_args=run_test_args
     )
 
 if __name__ == "__main__":
@@ -7,7 +7,8 @@ from pathlib import Path
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from build_cache import get_runner
+import headless
 import matplotlib.pyplot as plt
 import wave
 import numpy as np
@@ -239,7 +240,7 @@ async def test_variable_f(dut):
     ax.set_ylabel('Magnitude [dB]')
     ax.legend()
     fig.tight_layout()
-    plt.show()
+    headless.show_figures('audio_filter_x4')
 
 
 def is_runner():
@@ -260,18 +261,16 @@ def is_runner():
     runner.build(
         sources=sources,
         hdl_toplevel=hdl_toplevel,
-        always=True,
+        always=False,
         build_args=build_test_args,
         parameters=parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
+        timescale = ('1ns','1ps')
     )
     run_test_args = []
     runner.test(
         hdl_toplevel=hdl_toplevel,
         test_module=test_file,
-        test_args=run_test_args,
-        waves=True
+        test_args=run_test_args
     )
 
 if __name__ == "__main__":
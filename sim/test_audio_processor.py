@@ -0,0 +1,182 @@
+import cocotb
+import os
+import sys
+import math
+import logging
+from pathlib import Path
+from cocotb.clock import Clock
+from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
+from cocotb.utils import get_sim_time as gst
+from build_cache import get_runner
+import numpy as np
+#from vicoco.vivado_runner import get_runner
+test_file = os.path.basename(__file__).replace(".py","")
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+import audio_processor_model
+import resampler_model
+
+
+CHAIN = ['crush', 'distortion', 'filter', 'delay', 'reverb']
+POTS = {
+    'volume': 700,
+    'delay_wet': 600,
+    'delay_rate': 1023,  # Shortest delay, so the feedback shows up in the sim
+    'delay_feedback': 700,
+    'delay_rate_fast': 1,
+    'reverb_wet': 600,
+    'reverb_size': 700,
+    'reverb_feedback': 500,
+    'filter_quality': 700,
+    'filter_cutoff': 600,
+    'distortion_drive': 400,
+    'crush_pressure': 160,
+}
+PITCH = 300
+N_SAMPLES = 500  # Base rate
+HIT_PERIOD = 150  # Mixer samples between drum hits
+SAMPLE_MAX = 2**15-1
+
+
+def get_stimulus(n):
+    # Decaying noisy tone bursts at the mixer rate
+    rng = np.random.default_rng(0)
+    i = np.arange(n) % HIT_PERIOD
+    tone = np.sin(2 * np.pi * i / 23) + 0.3 * rng.standard_normal(n)
+    return np.clip(SAMPLE_MAX * 0.9 * tone * np.exp(-i / 40), -2**15, 2**15-1).astype(np.int64)
+
+
+async def monitor(dut, valid, samples, name, streams):
+    # (arrival cycle, sample(s)) for every valid pulse, cycles counted like
+    # resampler_model (the edge at which the next module samples it)
+    streams[name] = []
+    while True:
+        await RisingEdge(valid)
+        await ReadOnly()
+        cycle = int(gst(units="ns") // 10) - dut._reset_edge + 1
+        streams[name].append((cycle, *[sample.value.signed_integer for sample in samples]))
+
+
+@cocotb.test()
+async def test_chain(dut):
+    # Every stage against its model, fed with the HDL stream before it
+    sample_period = int(resampler_model.pitch_to_sample_period(PITCH))
+    n_mixer = N_SAMPLES * 2272 // sample_period
+    x = get_stimulus(n_mixer)
+
+    srcs = audio_processor_model.chain_to_srcs(CHAIN)
+    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
+    for name, value in POTS.items():
+        getattr(dut, f'{name}_on_clk').value = value
+    for name, value in srcs.items():
+        getattr(dut, f'{name}_on_clk').value = value
+    dut.sample_period_dram_out.value = sample_period
+    dut.sample_from_dram.value = 0
+    dut.valid_from_dram.value = 0
+    dut.rst.value = 1
+    await ClockCycles(dut.clk, 2)
+    await FallingEdge(dut.clk)
+    dut.rst.value = 0
+    dut._reset_edge = int(gst(units="ns") // 10) + 1  # Cycle 0
+
+    streams = {}
+    signals = {
+        'base': (dut.valid_from_base, [dut.sample_from_base]),
+        'crush': (dut.valid_from_crush, [dut.sample_from_crush]),
+        'distortion': (dut.valid_from_distortion, [dut.sample_from_distortion]),
+        'filter': (dut.valid_from_filter, [dut.sample_from_filter]),
+        'delay': (dut.valid_from_delay, [dut.sample_from_delay]),
+        'reverb': (dut.valid_from_reverb, [dut.sample_l_from_reverb, dut.sample_r_from_reverb]),
+    }
+    for name, (valid, samples) in signals.items():
+        cocotb.start_soon(monitor(dut, valid, samples, name, streams))
+
+    # Mixer output, one sample every sample_period cycles from cycle
+    # sample_period (as audio_processor_model.base assumes)
+    await ClockCycles(dut.clk, sample_period)
+    for sample in x:
+        await FallingEdge(dut.clk)
+        dut.sample_from_dram.value = int(sample)
+        dut.valid_from_dram.value = 1
+        await FallingEdge(dut.clk)
+        dut.valid_from_dram.value = 0
+        await ClockCycles(dut.clk, sample_period - 1)
+
+    processor = audio_processor_model.AudioProcessor(POTS, srcs, sim_reverb=True)
+    base = [sample for _, sample in streams['base']]
+    base_expected = audio_processor_model.base(x, sample_period)
+    n = min(len(base), len(base_expected))
+    assert base[:n] == base_expected[:n].tolist()
+
+    stage_in = streams['base']
+    for i, module in enumerate(CHAIN):
+        cycles, *y = zip(*streams[module])
+        cycles_in, x_in = zip(*stage_in)
+        y_expected, cycles_expected = processor.process_module(
+            module, np.array(x_in), np.array(cycles_in), i == len(CHAIN)-1
+        )
+        if not isinstance(y_expected, tuple):
+            y_expected = (y_expected,)
+        n = min(len(cycles), len(cycles_expected))
+        print(f'{module}: {n} outputs match')
+        for y_channel, y_channel_expected in zip(y, y_expected):
+            assert list(y_channel[:n]) == y_channel_expected[:n].tolist(), f'{module} mismatch'
+        assert list(cycles[:n]) == cycles_expected[:n].tolist(), f'{module} timing mismatch'
+        stage_in = streams[module]
+
+    # The whole chain from the base stream
+    y_l, y_r = processor.process(base_expected)
+    n = min(len(streams['reverb']), len(y_l))
+    assert [(l, r) for _, l, r in streams['reverb'][:n]] == list(zip(y_l[:n].tolist(), y_r[:n].tolist()))
+
+
+def is_runner():
+    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
+    sim = os.getenv("SIM", "icarus")
+    #sim = os.getenv("SIM","vivado")
+    proj_path = Path(__file__).resolve().parent.parent
+    sys.path.append(str(proj_path / "sim" / "model"))
+    sources = [proj_path / "hdl" / "audio_processor.sv"]
+    sources += [proj_path / "hdl" / "audio_multi_mux.sv"]
+    sources += [proj_path / "hdl" / "resampler.sv"]
+    sources += [proj_path / "hdl" / "farrow_upsampler.sv"]
+    sources += [proj_path / "hdl" / "downsampler.sv"]
+    sources += [proj_path / "hdl" / "upsampler.sv"]
+    sources += [proj_path / "hdl" / "divider.sv"]
+    sources += [proj_path / "hdl" / "clipper.sv"]
+    sources += [proj_path / "hdl" / "dist_ram.sv"]
+    sources += [proj_path / "hdl" / "audio_crush.sv"]
+    sources += [proj_path / "hdl" / "audio_distortion_oversampled.sv"]
+    sources += [proj_path / "hdl" / "audio_distortion.sv"]
+    sources += [proj_path / "hdl" / "tanh_approx.sv"]
+    sources += [proj_path / "hdl" / "audio_filter_oversampled.sv"]
+    sources += [proj_path / "hdl" / "audio_filter_x4.sv"]
+    sources += [proj_path / "hdl" / "audio_delay.sv"]
+    sources += [proj_path / "hdl" / "pitch_to_sample_period.sv"]
+    sources += [proj_path / "hdl" / "audio_reverb_stereo.sv"]
+    sources += [proj_path / "hdl" / "audio_reverb.sv"]
+    sources += [proj_path / "hdl" / "dlt_sig_dac.sv"]
+    sources += [proj_path / "hdl" / "xilinx_single_port_ram_read_first.v"]
+    sources += [proj_path / "hdl" / "xilinx_true_dual_port_read_first_2_clock_ram.v"]
+    build_test_args = ["-Wall"]
+    parameters = {}
+    hdl_toplevel = "audio_processor"
+    sys.path.append(str(proj_path / "sim"))
+    runner = get_runner(sim)
+    runner.build(
+        sources=sources,
+        hdl_toplevel=hdl_toplevel,
+        always=False,
+        build_args=build_test_args,
+        parameters=parameters,
+        timescale = ('1ns','1ps')
+    )
+    run_test_args = []
+    runner.test(
+        hdl_toplevel=hdl_toplevel,
+        test_module=test_file,
+        test_args=run_test_args
+    )
+
+if __name__ == "__main__":
+    is_runner()
@@ -6,9 +6,10 @@ from cocotb.triggers import Timer
 import os
 from pathlib import Path
 import sys
+import headless
 from PIL import Image, ImageFilter
 import math
-from cocotb.runner import get_runner
+from build_cache import get_runner
 
 from cocotb.clock import Clock
 from cocotb.triggers import (
@@ -102,7 +103,7 @@ async def test_delay_gen(dut):
     for i in range(64 * 128 + 2):
         await drive_pixel(dut, i, test_image)
 
-    test_image.show()
+    headless.show_image(test_image, 'delay_gen')
 
 
 def test_delay_gen_runner():
@@ -145,18 +146,16 @@ def test_delay_gen_runner():
     runner.build(
         sources=sources,
         hdl_toplevel=top_level,
-        always=True,
+        always=False,
         build_args=build_test_args,
         parameters=parameters,
         timescale=("1ns", "1ps"),
-        waves=True,
     )
     run_test_args = []
     runner.test(
         hdl_toplevel=top_level,
         test_module="test_delay_gen",
         test_args=run_test_args,
-        waves=True,
     )
 
 
@@ -4,6 +4,7 @@ from cocotb.triggers import Timer
 import os
 from pathlib import Path
 import sys
+import headless
 import matplotlib.pyplot as plt
 import matplotlib.mlab as pltlab
 import scipy.fftpack
@@ -23,7 +24,7 @@ from cocotb.triggers import (
     Join,
 )
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from build_cache import get_runner
 
 from random import getrandbits
 
@@ -38,6 +39,10 @@ async def reset(rst, clk):
     await ClockCycles(clk, 2)
 
 
+def is_one_to_five(answer):
+    return answer in ("1", "2", "3", "4", "5")
+
+
 @cocotb.test()
 async def test_delta_sigma(dut):
     cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
@@ -46,28 +51,17 @@ async def test_delta_sigma(dut):
     # use helper function to assert reset signal
     await reset(dut.rst, dut.clk)
 
-    limit_cycle = "-1"
-    while limit_cycle.lower() != "y" and limit_cycle.lower() != "n":
-        print("\n---------- DC limit cycle test? (y/n) ----------")
-        print(">", end="")
-        limit_cycle = input()
+    limit_cycle = headless.ask(
+        "DC limit cycle test? (y/n)", "DAC_LIMIT_CYCLE", "n", lambda answer: answer.lower() in ("y", "n")
+    )
 
     if limit_cycle == "y":
         sample_gen = lambda angle: 0x0005
     else:
         sample_gen = lambda angle: int(gain * 2**15 * math.sin(angle))
 
-    level = "-1"
-    while int(level) < 1 or int(level) > 5:
-        print("\n---------- enter detail level (1-5) ----------")
-        print(">", end="")
-        level = input()
-
-    vol = "-1"
-    while int(vol) < 1 or int(vol) > 5:
-        print("\n---------- enter volume (1-5) ----------")
-        print(">", end="")
-        vol = input()
+    level = headless.ask("enter detail level (1-5)", "DAC_LEVEL", "3", is_one_to_five)
+    vol = headless.ask("enter volume (1-5)", "DAC_VOLUME", "5", is_one_to_five)
 
     samples = []
     angle = 0
@@ -177,7 +171,7 @@ async def test_delta_sigma(dut):
     ax2.set_ybound(-180, 1)
     ax2.set_xbound(100, sample_rate // 2)
     ax2.set_title("Full Range)")
-    plt.show()
+    headless.show_figures('delta_sigma')
 
 
 def test_delta_sigma_runner():
@@ -193,45 +187,37 @@ def test_delta_sigma_runner():
     parameters = {}
     sys.path.append(str(proj_path / "sim"))
     runner = get_runner(sim)
-    order = "-1"
-    while int(order) < 1 or int(order) > 2:
-        print("\n---------- enter DAC order (1-2) ----------")
-        print(">", end="")
-        order = input()
+    order = headless.ask("enter DAC order (1-2)", "DAC_ORDER", "2", lambda answer: answer in ("1", "2"))
 
     if int(order) == 2:
         runner.build(
             sources=sources,
             hdl_toplevel="dlt_sig_dac_2nd_order",
-            always=True,
+            always=False,
             build_args=build_test_args,
             parameters=parameters,
             timescale=("1ns", "1ps"),
-            waves=True,
         )
         run_test_args = []
         runner.test(
             hdl_toplevel="dlt_sig_dac_2nd_order",
             test_module="test_delta_sigma",
             test_args=run_test_args,
-            waves=True,
         )
     else:
         runner.build(
             sources=sources,
             hdl_toplevel="dlt_sig_dac_1st_order",
-            always=True,
+            always=False,
             build_args=build_test_args,
             parameters=parameters,
             timescale=("1ns", "1ps"),
-            waves=True,
         )
         run_test_args = []
         runner.test(
             hdl_toplevel="dlt_sig_dac_1st_order",
             test_module="test_delta_sigma",
             test_args=run_test_args,
-            waves=True,
         )
 
 
@@ -8,7 +8,7 @@ from pathlib import Path
 import sys
 from PIL import Image, ImageFilter
 import math
-from cocotb.runner import get_runner
+from build_cache import get_runner
 
 from cocotb.clock import Clock
 from cocotb.triggers import (
@@ -125,18 +125,16 @@ def test_distortion_runner():
     runner.build(
         sources=sources,
         hdl_toplevel="video_distortion",
-        always=True,
+        always=False,
         build_args=build_test_args,
         parameters={},
         timescale=("1ns", "1ps"),
-        waves=True,
     )
     run_test_args = []
     runner.test(
         hdl_toplevel="video_distortion",
         test_module="test_distortion",
         test_args=run_test_args,
-        waves=True,
     )
 
 
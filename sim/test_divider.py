@@ -18,7 +18,7 @@ from cocotb.triggers import (
     Join,
 )
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from build_cache import get_runner
 
 from random import getrandbits
 
@@ -86,18 +86,16 @@ def test_divider_runner():
     runner.build(
         sources=sources,
         hdl_toplevel="divider",
-        always=True,
+        always=False,
         build_args=build_test_args,
         parameters=parameters,
         timescale=("1ns", "1ps"),
-        waves=True,
     )
     run_test_args = []
     runner.test(
         hdl_toplevel="divider",
         test_module="test_divider",
         test_args=run_test_args,
-        waves=True,
     )
 
 
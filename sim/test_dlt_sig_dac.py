@@ -0,0 +1,94 @@
+import cocotb
+import os
+import sys
+import math
+import logging
+from pathlib import Path
+from cocotb.clock import Clock
+from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
+from cocotb.utils import get_sim_time as gst
+from build_cache import get_runner
+import numpy as np
+#from vicoco.vivado_runner import get_runner
+test_file = os.path.basename(__file__).replace(".py","")
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+import dlt_sig_dac_model
+
+
+# Short equivalence check of dlt_sig_dac_model against both DAC orders.
+# Long runs (THD+N, noise floor) use the model: scripts/dac_thdn.py
+TOPLEVELS = ['dlt_sig_dac_1st_order', 'dlt_sig_dac_2nd_order']
+MODELS = {
+    'dlt_sig_dac_1st_order': dlt_sig_dac_model.dac_1st_order,
+    'dlt_sig_dac_2nd_order': dlt_sig_dac_model.dac_2nd_order,
+}
+HOLD = 16  # Shorter than HOLD_CYCLES so more input changes fit in the sim
+N_SAMPLES = 1500
+SAMPLE_MAX = 2**15-1
+
+
+def get_input():
+    # Full scale sine, then random samples, then both rails held
+    rng = np.random.default_rng(0)
+    sine = SAMPLE_MAX * np.sin(2 * math.pi * np.arange(N_SAMPLES // 2) / 100)
+    noise = rng.integers(-SAMPLE_MAX-1, SAMPLE_MAX+1, N_SAMPLES // 4)
+    rails = np.repeat([SAMPLE_MAX, -SAMPLE_MAX-1], N_SAMPLES // 8)
+    return np.concatenate((sine.astype(np.int64), noise, rails))
+
+
+@cocotb.test()
+async def test_a(dut):
+    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
+    x = get_input()
+    cycle_inputs = dlt_sig_dac_model.get_cycle_inputs(x, HOLD)
+    expected = MODELS[dut._name](x, HOLD)
+
+    dut.current_sample.value = int(cycle_inputs[0])
+    dut.rst.value = 1
+    await ClockCycles(dut.clk, 3)
+    await FallingEdge(dut.clk)
+    dut.rst.value = 0
+
+    # Inputs change on falling edges; audio_out is read once they settle
+    y = np.zeros(len(cycle_inputs), dtype=np.uint8)
+    for i, sample in enumerate(cycle_inputs):
+        dut.current_sample.value = int(sample)
+        await Timer(1, units="ns")
+        y[i] = dut.audio_out.value
+        await FallingEdge(dut.clk)
+
+    mismatches = np.flatnonzero(y != expected)
+    assert len(mismatches) == 0, f'{dut._name}: first mismatch on cycle {mismatches[0]} of {len(y)}'
+    print(f'{dut._name}: {len(y)} cycles match, {np.mean(y):.4f} ones density')
+
+
+def is_runner():
+    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
+    sim = os.getenv("SIM", "icarus")
+    #sim = os.getenv("SIM","vivado")
+    proj_path = Path(__file__).resolve().parent.parent
+    sys.path.append(str(proj_path / "sim" / "model"))
+    sources = [proj_path / "hdl" / "dlt_sig_dac.sv"]
+    build_test_args = ["-Wall"]
+    parameters = {}
+    sys.path.append(str(proj_path / "sim"))
+    runner = get_runner(sim)
+    for hdl_toplevel in TOPLEVELS:
+        runner.build(
+            sources=sources,
+            hdl_toplevel=hdl_toplevel,
+            always=False,
+            build_args=build_test_args,
+            parameters=parameters,
+            timescale = ('1ns','1ps')
+        )
+        run_test_args = []
+        runner.test(
+            hdl_toplevel=hdl_toplevel,
+            test_module=test_file,
+            test_args=run_test_args
+        )
+
+if __name__ == "__main__":
+    is_runner()
@@ -6,9 +6,10 @@ from cocotb.triggers import Timer
 import os
 from pathlib import Path
 import sys
+import headless
 from PIL import Image, ImageFilter
 import math
-from cocotb.runner import get_runner
+from build_cache import get_runner
 
 from cocotb.clock import Clock
 from cocotb.triggers import (
@@ -105,8 +106,9 @@ async def test_dry_gen(dut):
         image = await image_rend(dut, i)
         images.append(image)
 
+    gif_path = headless.get_artifact_path("dry_gen.gif") if headless.HEADLESS else "vid.gif"
     images[0].save(
-        "vid.gif",
+        gif_path,
         save_all=True,
         append_images=images[1:],
         optimize=False,
@@ -114,8 +116,11 @@ async def test_dry_gen(dut):
         loop=0,
     )
 
-    print(os.path.curdir)
-    subprocess.run(["pix", os.path.curdir + "/vid.gif"])
+    if headless.HEADLESS:
+        print(f"Saved {gif_path}")
+    else:
+        print(os.path.curdir)
+        subprocess.run(["pix", os.path.curdir + "/vid.gif"])
 
 
 def test_dry_gen_runner():
@@ -157,18 +162,16 @@ def test_dry_gen_runner():
     runner.build(
         sources=sources,
         hdl_toplevel=top_level,
-        always=True,
+        always=False,
         build_args=build_test_args,
         parameters=parameters,
         timescale=("1ns", "1ps"),
-        waves=True,
     )
     run_test_args = []
     runner.test(
         hdl_toplevel=top_level,
         test_module="test_dry_gen",
         test_args=run_test_args,
-        waves=True,
     )
 
 
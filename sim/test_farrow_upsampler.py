@@ -7,10 +7,12 @@ from pathlib import Path
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from build_cache import get_runner
+import headless
 import matplotlib.pyplot as plt
 import wave
 import numpy as np
+from sample_stream import drive_samples, get_sample_cycles, SampleMonitor
 #from vicoco.vivado_runner import get_runner
 test_file = os.path.basename(__file__).replace(".py","")
 
@@ -28,6 +30,15 @@ def get_farrow(x, d):
         return int(M**3 * 6*x[1] + int(d) * (-M**2 * left_sum + top_sum))
 
 
+def get_sweep(start, stop, clock_cycles, setup_cycles):
+    # Per-cycle value of the old per-clock sweeps: held for setup_cycles, then
+    # stepped to stop over clock_cycles and back (same running sum)
+    step = (stop-start) / clock_cycles
+    i = np.arange(2*clock_cycles+setup_cycles-1)
+    deltas = np.where(i < setup_cycles, 0, np.where(i < setup_cycles+clock_cycles, step, -step))
+    return np.cumsum(np.concatenate(([start], deltas)))
+
+
 def square(theta):
     if math.sin(theta) > 0:
         return 1
@@ -54,52 +65,34 @@ async def test_static_d(dut):
     dut.rst.value = 0
 
     fig, ax = plt.subplots()
-    x_buf = [0,0,0,0,0]
-    d_buf = [0,0]
+    x_all = []  # Every input so far, for the expected Farrow sums
 
     d_range = range(0, M, int(M/4))
     for d in d_range:
-        n_in = []
-        x = []
-        n_out = []
-        y = []
-
         dut.delay_debug.value = d
         dut.delay_debug_valid.value = 1
 
-        for i in range(int(CYCLES*SAMPLES_PER_CYCLE*SAMPLE_PERIOD_IN)):
-            d_buf = [d] + [d_buf[0]]
-
-            sample_write = False
-            if i % SAMPLE_PERIOD_IN == 0:
-                n = i / SAMPLE_PERIOD_IN
-                t = n * SECONDS_PER_SAMPLE
-                sample = int(SAMPLE_MAX * math.sin(2 * math.pi * F * t))
-                dut.sample_in.value = sample
-                dut.sample_in_valid.value = 1
-
-                x_buf = [sample] + x_buf[:-1]
-                n_in.append(i)
-                x.append(sample)
-
-                sample_write = True
-            else:
-                dut.sample_in_valid.value = 0
-
-            if dut.sample_out_valid.value == 1:
-                sample = dut.sample_out.value.signed_integer
-
-                n_out.append(i)
-                y.append(sample)
-
-            await ClockCycles(dut.clk, 1)
+        n_in = np.arange(0, int(CYCLES*SAMPLES_PER_CYCLE*SAMPLE_PERIOD_IN), SAMPLE_PERIOD_IN)
+        x = [int(SAMPLE_MAX * math.sin(2 * math.pi * F * n * SECONDS_PER_SAMPLE)) for n in range(len(n_in))]
+
+        monitor = SampleMonitor(dut.clk, dut.sample_out, dut.sample_out_valid)
+        farrow_monitor = SampleMonitor(dut.clk, dut.farrow_out, dut.farrow_out_valid)
+        await drive_samples(dut.clk, dut.sample_in, dut.sample_in_valid, x, n_in,
+                            end=int(CYCLES*SAMPLES_PER_CYCLE*SAMPLE_PERIOD_IN))
+        monitor.stop()
+        farrow_monitor.stop()
+        n_out = monitor.cycles
+        y = monitor.samples
+
+        # Each Farrow output uses the four inputs before the latest one
+        x_all += x
+        for i, farrow_dut in zip(farrow_monitor.cycles, farrow_monitor.samples):
+            latest = len(x_all) - len(x) + np.searchsorted(n_in, i, side='right') - 1
+            x_buf = [x_all[k] if k >= 0 else 0 for k in range(latest, latest-5, -1)]
+            farrow_expected = get_farrow(x_buf[1:], d)
+            print(f'farrow_out: received={farrow_dut}, expected={farrow_expected}')
+            assert farrow_dut == farrow_expected
 
-            farrow_valid = dut.farrow_out_valid.value
-            if farrow_valid == 1:
-                farrow_dut = dut.farrow_out.value.signed_integer
-                farrow_expected = get_farrow(x_buf[1:], d_buf[-1])
-                print(f'farrow_out: received={farrow_dut}, expected={farrow_expected}')
-                assert farrow_dut == farrow_expected
         if d == d_range[0]:
             ax.scatter(n_in, x, color='black', label='Input')
         ax.plot(n_out, y, marker='.', label=f'Delay = {d/M}')
@@ -109,7 +102,7 @@ async def test_static_d(dut):
     ax.legend()
     fig.suptitle('Variable Delay')
     fig.tight_layout()
-    plt.show()
+    headless.show_figures('farrow_static_d')
 
 
 @cocotb.test()
@@ -129,52 +122,26 @@ async def test_sample_period_out_sweep_static_f(dut):
 
     fig, ax = plt.subplots()
 
-    n_in = []
-    x = []
-    n_out = []
-    y = []
-
     sample_period_start = 2272/16
     sample_period_stop = 2272/16
     clock_cycles = 79123
     setup_cycles = int(clock_cycles/2)
-    sample_period_step = (sample_period_stop-sample_period_start) / clock_cycles
-    sample_period_float = sample_period_start
-    last_sample_cycle = 0
-    for i in range(2*clock_cycles+setup_cycles):
-        sample_period_out = int(sample_period_float)
-        dut.sample_period_out.value = sample_period_out
-        seconds_per_sample = sample_period_in * 10.0e-9
-        samples_per_cycle = 1/F / seconds_per_sample
-
-        if i - last_sample_cycle >= sample_period_in:
-            last_sample_cycle = i
-            n = i / sample_period_in
-            t = n * seconds_per_sample
-            sample = int(SAMPLE_MAX * math.sin(2 * math.pi * F * t))
-            dut.sample_in.value = sample
-            dut.sample_in_valid.value = 1
-
-            n_in.append(i)
-            x.append(sample)
-        else:
-            dut.sample_in_valid.value = 0
-
-        if dut.sample_out_valid.value == 1:
-            sample = dut.sample_out.value.signed_integer
-
-            n_out.append(i)
-            y.append(sample)
-
-            print(f'Received sample: {sample}, cycle={i}')
-
-        await ClockCycles(dut.clk, 1)
-
-        if i >= setup_cycles:
-            if i >= setup_cycles+clock_cycles:
-                sample_period_float -= sample_period_step
-            else:
-                sample_period_float += sample_period_step
+    sample_periods_out = get_sweep(sample_period_start, sample_period_stop, clock_cycles, setup_cycles).astype(int)
+    n_in = get_sample_cycles(np.full(len(sample_periods_out), sample_period_in))
+    seconds_per_sample = sample_period_in * 10.0e-9
+    x = [int(SAMPLE_MAX * math.sin(2 * math.pi * F * (i / sample_period_in) * seconds_per_sample)) for i in n_in]
+
+    # sample_period_out is read on every cycle but only changes per input
+    # sample here; the sweep is flat (start == stop) as configured
+    dut.sample_period_out.value = int(sample_periods_out[0])
+    monitor = SampleMonitor(dut.clk, dut.sample_out, dut.sample_out_valid)
+    await drive_samples(dut.clk, dut.sample_in, dut.sample_in_valid, x, n_in, end=len(sample_periods_out),
+                        extra={dut.sample_period_out: sample_periods_out[n_in]})
+    monitor.stop()
+    n_out = monitor.cycles
+    y = monitor.samples
+    for i, sample in zip(n_out, y):
+        print(f'Received sample: {sample}, cycle={i}')
 
     ax.scatter(n_in, x, color='black', label='Input')
     ax.plot(n_out, y, marker='.', label='Output')
@@ -184,7 +151,7 @@ async def test_sample_period_out_sweep_static_f(dut):
     ax.legend()
     fig.suptitle(f'Input Sample Rate Sweep ({F} Hz Signal)')
     fig.tight_layout()
-    plt.show()
+    headless.show_figures('farrow_sample_period_out_sweep')
 
 
 @cocotb.test()
@@ -203,52 +170,24 @@ async def test_sample_period_sweep_static_f(dut):
 
     fig, ax = plt.subplots()
 
-    n_in = []
-    x = []
-    n_out = []
-    y = []
-
     sample_period_start = 2272*4
     sample_period_stop = 2272/4
     clock_cycles = 79123
     setup_cycles = int(clock_cycles/2)
-    sample_period_step = (sample_period_stop-sample_period_start) / clock_cycles
-    sample_period_float = sample_period_start
-    last_sample_cycle = 0
-    for i in range(2*clock_cycles+setup_cycles):
-        sample_period_in = int(sample_period_float)
-        dut.sample_period_in.value = sample_period_in
-        seconds_per_sample = sample_period_in * 10.0e-9
-        samples_per_cycle = 1/F / seconds_per_sample
-
-        if i - last_sample_cycle >= sample_period_in:
-            last_sample_cycle = i
-            n = i / sample_period_in
-            t = n * seconds_per_sample
-            sample = int(SAMPLE_MAX * math.sin(2 * math.pi * F * t))
-            dut.sample_in.value = sample
-            dut.sample_in_valid.value = 1
-
-            n_in.append(i)
-            x.append(sample)
-        else:
-            dut.sample_in_valid.value = 0
-
-        if dut.sample_out_valid.value == 1:
-            sample = dut.sample_out.value.signed_integer
-
-            n_out.append(i)
-            y.append(sample)
-
-            print(f'Received sample: {sample}, cycle={i}')
-
-        await ClockCycles(dut.clk, 1)
-
-        if i >= setup_cycles:
-            if i >= setup_cycles+clock_cycles:
-                sample_period_float -= sample_period_step
-            else:
-                sample_period_float += sample_period_step
+    sample_periods = get_sweep(sample_period_start, sample_period_stop, clock_cycles, setup_cycles).astype(int)
+    n_in = get_sample_cycles(sample_periods)
+    x = [int(SAMPLE_MAX * math.sin(2 * math.pi * F * (i / p) * (p * 10.0e-9))) for i, p in zip(n_in, sample_periods[n_in])]
+
+    # sample_period_in is only read with sample_in_valid, so it is set per sample
+    dut.sample_period_in.value = int(sample_periods[0])
+    monitor = SampleMonitor(dut.clk, dut.sample_out, dut.sample_out_valid)
+    await drive_samples(dut.clk, dut.sample_in, dut.sample_in_valid, x, n_in, end=len(sample_periods),
+                        extra={dut.sample_period_in: sample_periods[n_in]})
+    monitor.stop()
+    n_out = monitor.cycles
+    y = monitor.samples
+    for i, sample in zip(n_out, y):
+        print(f'Received sample: {sample}, cycle={i}')
 
     ax.scatter(n_in, x, color='black', label='Input')
     ax.plot(n_out, y, marker='.', label='Output')
@@ -258,7 +197,7 @@ async def test_sample_period_sweep_static_f(dut):
     ax.legend()
     fig.suptitle(f'Input Sample Rate Sweep ({F} Hz Signal)')
     fig.tight_layout()
-    plt.show()
+    headless.show_figures('farrow_sample_period_sweep')
 
 
 @cocotb.test()
@@ -282,49 +221,34 @@ async def test_pitch_sweep_lut(dut):
     #     samples = np.frombuffer(frames, dtype='<h')
 
     fig, ax = plt.subplots()
-    n_in = []
-    x = []
-    n_out = []
-    y = []
+
+    pitch_start = 0
+    pitch_stop = 1023
+    clock_cycles = 350000
+    pitch_step = (pitch_stop-pitch_start) / clock_cycles
+    # Same running sum as stepping pitch once per clock
+    pitch_float = np.cumsum(np.concatenate(([pitch_start], np.full(clock_cycles-1, pitch_step))))
+    sample_periods = (9088 / 2**(pitch_float/256)).astype(int)
+    n_in = get_sample_cycles(sample_periods)
+    x = samples[:len(n_in)]
 
     cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
     dut.delay_debug_valid.value = 0
     dut.sample_period_out.value = SAMPLE_PERIOD_OUT
+    dut.sample_period_in.value = int(sample_periods[0])
     dut.rst.value = 1
     await ClockCycles(dut.clk, 2)
     dut.rst.value = 0
 
-    pitch_start = 0
-    pitch_stop = 1023
-    clock_cycles = 350000
-    pitch_step = (pitch_stop-pitch_start) / clock_cycles
-    pitch_float = pitch_start
-    last_sample_cycle = 0
-    sample_index = 0
-    for i in range(clock_cycles):
-        sample_period_in = int(9088 / 2**(pitch_float/256))
-        dut.sample_period_in.value = sample_period_in
-
-        if i - last_sample_cycle >= sample_period_in:
-            last_sample_cycle = i
-            sample = int(samples[sample_index])
-            dut.sample_in.value = sample
-            dut.sample_in_valid.value = 1
-            sample_index += 1
-            n_in.append(i)
-            x.append(sample)
-        else:
-            dut.sample_in_valid.value = 0
-
-        if dut.sample_out_valid.value == 1:
-            sample = dut.sample_out.value.signed_integer
-            n_out.append(i)
-            y.append(sample)
-            print(f'Sample value: {sample}')
-
-        await ClockCycles(dut.clk, 1)
-
-        pitch_float += pitch_step
+    # sample_period_in is only read with sample_in_valid, so it is set per sample
+    monitor = SampleMonitor(dut.clk, dut.sample_out, dut.sample_out_valid)
+    await drive_samples(dut.clk, dut.sample_in, dut.sample_in_valid, x, n_in, end=clock_cycles,
+                        extra={dut.sample_period_in: sample_periods[n_in]})
+    monitor.stop()
+    n_out = monitor.cycles
+    y = monitor.samples
+    for sample in y:
+        print(f'Sample value: {sample}')
 
     ax.scatter(n_in, x, color='black', label='Input')
     ax.plot(n_out, y, marker='.', label='Output')
@@ -333,7 +257,7 @@ async def test_pitch_sweep_lut(dut):
     ax.set_ylabel('Sample')
     ax.legend()
     fig.tight_layout()
-    plt.show()
+    headless.show_figures('farrow_pitch_sweep_lut')
 
 
 @cocotb.test()
@@ -360,34 +284,17 @@ async def test_variable_f(dut):
 
         samples_per_cycle = 1/f / SECONDS_PER_SAMPLE
 
-        n_in = []
-        x = []
-        n_out = []
-        y = []
-
         #for i in range(int(CYCLES*SAMPLES_PER_CYCLE*SAMPLE_PERIOD_IN)):
-        for i in range(int(400*SAMPLE_PERIOD_IN)):
-            if i % SAMPLE_PERIOD_IN == 0:
-                n = i / SAMPLE_PERIOD_IN
-                t = n * SECONDS_PER_SAMPLE
-                sample = int(SAMPLE_MAX * math.sin(2 * math.pi * f * t))
-                dut.sample_in.value = sample
-                dut.sample_in_valid.value = 1
-
-                n_in.append(i)
-                x.append(sample)
-            else:
-                dut.sample_in_valid.value = 0
-
-            if dut.sample_out_valid.value == 1:
-                sample = dut.sample_out.value.signed_integer
-
-                n_out.append(i)
-                y.append(sample)
-
-                print(f'Received sample: {sample}, cycle={i}')
-
-            await ClockCycles(dut.clk, 1)
+        n_in = np.arange(0, int(400*SAMPLE_PERIOD_IN), SAMPLE_PERIOD_IN)
+        x = [int(SAMPLE_MAX * math.sin(2 * math.pi * f * n * SECONDS_PER_SAMPLE)) for n in range(len(n_in))]
+
+        monitor = SampleMonitor(dut.clk, dut.sample_out, dut.sample_out_valid)
+        await drive_samples(dut.clk, dut.sample_in, dut.sample_in_valid, x, n_in, end=int(400*SAMPLE_PERIOD_IN))
+        monitor.stop()
+        n_out = monitor.cycles
+        y = monitor.samples
+        for i, sample in zip(n_out, y):
+            print(f'Received sample: {sample}, cycle={i}')
 
         ax.scatter(n_in, x, color='black', label='Input')
         ax.plot(n_out, y, marker='.', label='Output')
@@ -397,7 +304,7 @@ async def test_variable_f(dut):
         ax.legend()
         fig.suptitle(f'Input Frequency = {f} Hz')
         fig.tight_layout()
-        plt.show()
+        headless.show_figures(f'farrow_variable_f_{f}hz')
 
 
 def is_runner():
@@ -416,18 +323,16 @@ def is_runner():
     runner.build(
         sources=sources,
         hdl_toplevel=hdl_toplevel,
-        always=True,
+        always=False,
         build_args=build_test_args,
         parameters=parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
+        timescale = ('1ns','1ps')
     )
     run_test_args = []
     runner.test(
         hdl_toplevel=hdl_toplevel,
         test_module=test_file,
-        test_args=run_test_args,
-        waves=True
+        test_args=run_test_args
     )
 
 if __name__ == "__main__":
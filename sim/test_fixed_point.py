@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from fixed_point import wrap, saturate, get_signed_bits
+
+
+# fixed_point against hand-computed Verilog results (no simulator needed)
+# Run with pytest or directly: python test_fixed_point.py
+
+
+def test_wrap():
+    # logic signed [15:0] r = x;
+    assert wrap(32768) == -32768
+    assert wrap(40000) == -25536
+    assert wrap(-32769) == 32767
+    assert wrap(0x12345) == 0x2345
+    assert wrap(200, 8) == -56
+    assert wrap(np.array([127, 128, -129]), 8).tolist() == [127, -128, 127]
+
+
+def test_saturate():
+    # clipper.sv
+    assert saturate(40000) == 32767
+    assert saturate(-40000) == -32768
+    assert saturate(100) == 100
+    assert saturate(np.array([2**17, -2**17, -5]), 18).tolist() == [2**17-1, -2**17, -5]
+
+
+def test_shift():
+    # x >>> n on a signed register rounds towards -inf, as >> does here
+    x = np.array([-5, 5, -1, -256])
+    assert (x >> 1).tolist() == [-3, 2, -1, -128]
+    assert (x >> 4).tolist() == [-1, 0, -1, -16]
+
+
+def test_part_select():
+    # $signed(x[hi:lo]) is wrap(x >> lo, hi-lo+1)
+    assert wrap(0x1234 >> 4, 8) == 0x23
+    assert wrap(0xABCD >> 8, 8) == -85     # 8'hAB
+    assert wrap(0xABCD, 8) == -51          # 8'hCD
+    assert wrap(0xABCD >> 8, 9) == 0xAB    # 9'h0AB
+    assert wrap(-1 >> 4, 4) == -1
+
+
+def test_signed_bits():
+    assert get_signed_bits(0, 0) == 1
+    assert get_signed_bits(-1, 0) == 1
+    assert get_signed_bits(0, 1) == 2
+    assert get_signed_bits(-32768, 32767) == 16
+    assert get_signed_bits(-32769, 0) == 17
+    assert get_signed_bits(0, 32768) == 17
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f'{name}: pass')
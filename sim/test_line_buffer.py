@@ -18,7 +18,7 @@ from cocotb.triggers import (
     Join,
 )
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from build_cache import get_runner
 
 from random import getrandbits
 
@@ -141,18 +141,16 @@ def test_line_buffer_runner():
     runner.build(
         sources=sources,
         hdl_toplevel="line_buffer",
-        always=True,
+        always=False,
         build_args=build_test_args,
         parameters=parameters,
         timescale=("1ns", "1ps"),
-        waves=True,
     )
     run_test_args = []
     runner.test(
         hdl_toplevel="line_buffer",
         test_module="test_line_buffer",
         test_args=run_test_args,
-        waves=True,
     )
 
 
@@ -19,7 +19,7 @@ from cocotb.triggers import (
     Join,
 )
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from build_cache import get_runner
 
 from random import getrandbits
 
@@ -166,18 +166,16 @@ def test_patch_reconstructor_runner():
     runner.build(
         sources=sources,
         hdl_toplevel="patch_reconstructor",
-        always=True,
+        always=False,
         build_args=build_test_args,
         parameters=parameters,
         timescale=("1ns", "1ps"),
-        waves=True,
     )
     run_test_args = []
     runner.test(
         hdl_toplevel="patch_reconstructor",
         test_module="test_patch_reconstructor",
         test_args=run_test_args,
-        waves=True,
     )
 
 
@@ -7,8 +7,9 @@ from pathlib import Path
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly, with_timeout, NextTimeStep
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from build_cache import get_runner
 #from vicoco.vivado_runner import get_runner
+import headless
 import matplotlib.pyplot as plt
 import numpy as np
 test_file = os.path.basename(__file__).replace(".py","")
@@ -88,7 +89,7 @@ async def test_a(dut):
     ax[1].set_ylabel('Sample Rate Step Size [cents]')
     ax[1].set_xlabel('Pitch (10-bit ADC output)')
     fig.tight_layout()
-    plt.show()
+    headless.show_figures('pitch_to_sample_period')
 
 
 def is_runner():
@@ -106,18 +107,16 @@ def is_runner():
     runner.build(
         sources=sources,
         hdl_toplevel=hdl_toplevel,
-        always=True,
+        always=False,
         build_args=build_test_args,
         parameters=parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
+        timescale = ('1ns','1ps')
     )
     run_test_args = []
     runner.test(
         hdl_toplevel=hdl_toplevel,
         test_module=test_file,
-        test_args=run_test_args,
-        waves=True
+        test_args=run_test_args
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,100 @@
+import cocotb
+import os
+import sys
+import math
+import logging
+from pathlib import Path
+from cocotb.clock import Clock
+from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
+from cocotb.utils import get_sim_time as gst
+from build_cache import get_runner
+import numpy as np
+from sample_stream import drive_samples, SampleMonitor
+#from vicoco.vivado_runner import get_runner
+test_file = os.path.basename(__file__).replace(".py","")
+
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+import resampler_model
+
+
+SAMPLE_MAX = 2**15-1
+SIN_F = 1000
+SIN_SAMPLE_RATE = 44100
+N_SAMPLES = 160
+
+
+@cocotb.test()
+async def test_pitch_sweep(dut):
+    # Compare the whole-stream model against the HDL over a pitch sweep.
+    # Full-scale input, so Farrow overshoot exercises the clipping too.
+    n = np.arange(N_SAMPLES)
+    samples = (SAMPLE_MAX * np.sin(2 * np.pi * SIN_F * n / SIN_SAMPLE_RATE)).astype(np.int64)
+    pitch = np.linspace(0, 1023, N_SAMPLES).astype(np.int64)
+    sample_period_in = resampler_model.pitch_to_sample_period(pitch)
+
+    in_cycles = resampler_model.get_input_cycles(sample_period_in)
+    farrow_expected, _, _ = resampler_model.farrow_upsample(samples, sample_period_in)
+    y_expected = resampler_model.downsample(farrow_expected)
+
+    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
+    dut.sample_period_in.value = int(sample_period_in[0])
+    dut.sample_period_farrow_out.value = resampler_model.SAMPLE_PERIOD_OUT
+    dut.sample_in.value = 0
+    dut.sample_in_valid.value = 0
+    dut.rst.value = 1
+    await ClockCycles(dut.clk, 2)
+    dut.rst.value = 0
+
+    farrow_monitor = SampleMonitor(dut.clk, dut.farrow_upsample, dut.farrow_upsample_valid)
+    monitor = SampleMonitor(dut.clk, dut.sample_out, dut.sample_out_valid)
+    await drive_samples(dut.clk, dut.sample_in, dut.sample_in_valid, samples, in_cycles,
+                        end=int(in_cycles[-1] + sample_period_in[-1]),
+                        extra={dut.sample_period_in: sample_period_in})
+    farrow_monitor.stop()
+    monitor.stop()
+    farrow_out = farrow_monitor.samples
+    y = monitor.samples
+
+    # The downsampler emits one zero shortly after reset
+    assert y[0] == 0
+    y = y[1:]
+
+    print(f'{len(farrow_out)} Farrow outputs, {len(y)} outputs')
+    assert len(farrow_out) > 0 and len(y) > 0
+    assert farrow_out == farrow_expected[:len(farrow_out)].tolist()
+    assert y == y_expected[:len(y)].tolist()
+
+
+def is_runner():
+    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
+    sim = os.getenv("SIM", "icarus")
+    #sim = os.getenv("SIM","vivado")
+    proj_path = Path(__file__).resolve().parent.parent
+    sys.path.append(str(proj_path / "sim" / "model"))
+    sources = [proj_path / "hdl" / "resampler.sv"]
+    sources += [proj_path / "hdl" / "farrow_upsampler.sv"]
+    sources += [proj_path / "hdl" / "downsampler.sv"]
+    sources += [proj_path / "hdl" / "divider.sv"]
+    sources += [proj_path / "hdl" / "xilinx_single_port_ram_read_first.v"]
+    build_test_args = ["-Wall"]
+    parameters = {}
+    hdl_toplevel = "resampler"
+    sys.path.append(str(proj_path / "sim"))
+    runner = get_runner(sim)
+    runner.build(
+        sources=sources,
+        hdl_toplevel=hdl_toplevel,
+        always=False,
+        build_args=build_test_args,
+        parameters=parameters,
+        timescale = ('1ns','1ps')
+    )
+    run_test_args = []
+    runner.test(
+        hdl_toplevel=hdl_toplevel,
+        test_module=test_file,
+        test_args=run_test_args
+    )
+
+if __name__ == "__main__":
+    is_runner()
@@ -7,10 +7,12 @@ from pathlib import Path
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from build_cache import get_runner
+import headless
 import matplotlib.pyplot as plt
 import wave
 import numpy as np
+from sample_stream import drive_samples, get_sample_cycles, SampleMonitor
 #from vicoco.vivado_runner import get_runner
 test_file = os.path.basename(__file__).replace(".py","")
 
@@ -44,57 +46,39 @@ async def test_sample_period_sweep_wav(dut):
         t = i / sin_sample_rate
         samples.append(int(SAMPLE_MAX * math.sin(2 * math.pi * sin_f * t)))
 
-    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
-    dut.rst.value = 1
-    await ClockCycles(dut.clk, 2)
-    dut.rst.value = 0
-
     fig, ax = plt.subplots()
-    i_in = []
-    x = []
-    i_out = []
-    y = []
 
     pitch_start = 1023
     pitch_stop = 1023
     clock_cycles = int(2272/4*300)#79123*32
     pitch_step = (pitch_stop-pitch_start) / clock_cycles
-    pitch_float = pitch_start
-    last_sample_cycle = 0
-    sample_index = 0
-    last_print_cycle = 0
-    for i in range(clock_cycles):
-        sample_period_in = int(9088 / 2**(pitch_float/256))
-        dut.pitch.value = int(pitch_float)
-
-        if i - last_sample_cycle >= sample_period_in:
-            i_in.append(i)
-            last_sample_cycle = i
-            if sample_index >= 10:
-                sample = int(samples[sample_index-10])
-            else:
-                sample = 0
-            x.append(sample)
-            dut.sample_in.value = sample
-            dut.sample_in_valid.value = 1
-            sample_index += 1
-        else:
-            dut.sample_in_valid.value = 0
+    # Same running sum as stepping pitch once per clock
+    pitch_float = np.cumsum(np.concatenate(([pitch_start], np.full(clock_cycles-1, pitch_step))))
+    sample_periods = (9088 / 2**(pitch_float/256)).astype(int)
+    i_in = get_sample_cycles(sample_periods)
+    x = ([0]*10 + samples)[:len(i_in)]
 
-        if i - last_print_cycle >= 2272:
-            last_print_cycle = i
-            sample = dut.sample_out.value.signed_integer
-            print(f'Sample value: {sample}')
-            y.append(sample)
-            i_out.append(i)
-
-        await ClockCycles(dut.clk, 1)
+    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
+    dut.pitch.value = int(pitch_float[0])
+    dut.rst.value = 1
+    await ClockCycles(dut.clk, 2)
+    dut.rst.value = 0
 
-        pitch_float += pitch_step
+    # pitch is set per sample (it reaches the resampler a few cycles later
+    # through pitch_to_sample_period, which only matters for fast sweeps).
+    # sample_out has no valid, so it is read every 2272 cycles
+    monitor = SampleMonitor(dut.clk, dut.sample_out, period=2272)
+    await drive_samples(dut.clk, dut.sample_in, dut.sample_in_valid, x, i_in, end=clock_cycles,
+                        extra={dut.pitch: pitch_float[i_in].astype(int)})
+    monitor.stop()
+    i_out = monitor.cycles
+    y = monitor.samples
+    for sample in y:
+        print(f'Sample value: {sample}')
 
     ax.plot(i_in, x, marker='.')
     ax.plot(i_out, y, marker='.')
-    plt.show()
+    headless.show_figures('resampler_and_upsampler')
 
 def is_runner():
     hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
@@ -119,18 +103,16 @@ def is_runner():
     runner.build(
         sources=sources,
         hdl_toplevel=hdl_toplevel,
-        always=True,
+        always=False,
         build_args=build_test_args,
         parameters=parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
+        timescale = ('1ns','1ps')
     )
     run_test_args = []
     runner.test(
         hdl_toplevel=hdl_toplevel,
         test_module=test_file,
-        test_args=run_test_args,
-        waves=True
+        test_args=run_test_args
     )
 
 
@@ -0,0 +1,196 @@
+import cocotb
+import os
+import sys
+import logging
+from pathlib import Path
+from cocotb.clock import Clock
+from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
+from cocotb.utils import get_sim_time as gst
+from build_cache import get_runner
+#from vicoco.vivado_runner import get_runner
+test_file = os.path.basename(__file__).replace(".py","")
+sys.path.append(str(Path(__file__).resolve().parent.parent / "scripts"))
+from send_wav import rice_encode, COMPRESSED_FLAG
+import numpy as np
+
+
+CLK_FREQ = 74250000
+UART_BAUD = 1500000
+UART_PERIOD = int(CLK_FREQ / UART_BAUD)  # Number of clk cycles per UART bit
+INSTRUMENT_COUNT = 2
+UPDATE_OPCODE = 0xC0
+
+
+def sample_bytes(samples, compress=False):
+    if compress:
+        data = (len(samples) | COMPRESSED_FLAG).to_bytes(3, 'little')
+        return data + rice_encode(np.array(samples, dtype='<i2'))
+    data = len(samples).to_bytes(3, 'little')
+    for sample in samples:
+        data += (sample & 0xFFFF).to_bytes(2, 'little')
+    return data
+
+
+def kit_bytes(kit, compress=False):
+    data = b''
+    for samples in kit:
+        data += sample_bytes(samples, compress)
+    return data
+
+
+def update_bytes(slot, offset, samples, compress=False):
+    data = bytes([UPDATE_OPCODE, slot])
+    data += offset.to_bytes(3, 'little')
+    return data + sample_bytes(samples, compress)
+
+
+async def write_uart(dut, data):
+    for byte in data:
+        bits = [0] + [(byte >> i) & 1 for i in range(8)] + [1]
+        for bit in bits:
+            dut.uart_din.value = bit
+            await ClockCycles(dut.clk_pixel, UART_PERIOD)
+
+
+async def monitor(dut, loaded, offsets, updates, update_addrs):
+    while True:
+        await RisingEdge(dut.clk_pixel)
+        if dut.sample_axis_tvalid.value == 1:
+            loaded.append(dut.sample_axis_tdata.value.signed_integer)
+        if dut.addr_offset_valid.value == 1:
+            offsets.append(int(dut.addr_offset.value))
+        if dut.update_axis_tvalid.value == 1 and dut.update_axis_tready.value == 1:
+            updates.append(dut.update_axis_tdata.value.signed_integer)
+        if dut.update_addr_valid.value == 1:
+            update_addrs.append(int(dut.update_addr.value))
+
+
+async def wait_update_done(dut):
+    await ClockCycles(dut.clk_pixel, 2)
+    while dut.update_active.value == 1:
+        await ClockCycles(dut.clk_pixel, 1)
+
+
+@cocotb.test()
+async def test_load_and_update(dut):
+    kit = [
+        list(range(1, 17)),
+        [-i for i in range(1, 9)],
+    ]
+
+    cocotb.start_soon(Clock(dut.clk_pixel, 10, units="ns").start())
+    dut.uart_din.value = 1
+    dut.update_axis_tready.value = 1
+    dut.rst_pixel.value = 1
+    await ClockCycles(dut.clk_pixel, 2)
+    dut.rst_pixel.value = 0
+
+    loaded = []
+    offsets = []
+    updates = []
+    update_addrs = []
+    cocotb.start_soon(monitor(dut, loaded, offsets, updates, update_addrs))
+
+    # Full kit load
+    await write_uart(dut, kit_bytes(kit))
+    await ClockCycles(dut.clk_pixel, UART_PERIOD*2)
+    assert loaded == kit[0] + kit[1]
+    assert offsets == [2, 3]
+    assert updates == []
+
+    # Replace slot 0 with a shorter sample; the rest of the slot is zeroed
+    new_sample = [100+i for i in range(8)]
+    await write_uart(dut, update_bytes(0, 0, new_sample))
+    await wait_update_done(dut)
+    assert update_addrs == [0]
+    assert updates == new_sample + [0]*8
+    assert loaded == kit[0] + kit[1]
+
+    # Doesn't fit in slot 1: consumed without writing anything
+    updates.clear()
+    await write_uart(dut, update_bytes(1, 2, list(range(16))))
+    await wait_update_done(dut)
+    assert update_addrs == [0]
+    assert updates == []
+
+    # Parameter frames are skipped, including ones containing UPDATE_OPCODE
+    await write_uart(dut, bytes([0x04, UPDATE_OPCODE, 0x30, 0x00]))
+    await ClockCycles(dut.clk_pixel, UART_PERIOD*2)
+    assert dut.update_active.value == 0
+
+    new_sample = [-200-i for i in range(8)]
+    await write_uart(dut, update_bytes(1, 2, new_sample))
+    await wait_update_done(dut)
+    assert update_addrs == [0, 2]
+    assert updates == new_sample
+
+
+@cocotb.test()
+async def test_compressed(dut):
+    # Mix of small deltas and full-scale jumps (Rice escape codes)
+    kit = [
+        [int(3000*np.sin(i/5)) for i in range(40)],
+        [(-1)**i * (2**15-1-i) for i in range(8)] + [0, -1, 1, 2, -2, 100, -100, 7],
+    ]
+
+    cocotb.start_soon(Clock(dut.clk_pixel, 10, units="ns").start())
+    dut.uart_din.value = 1
+    dut.update_axis_tready.value = 1
+    dut.rst_pixel.value = 1
+    await ClockCycles(dut.clk_pixel, 2)
+    dut.rst_pixel.value = 0
+
+    loaded = []
+    offsets = []
+    updates = []
+    update_addrs = []
+    cocotb.start_soon(monitor(dut, loaded, offsets, updates, update_addrs))
+
+    await write_uart(dut, kit_bytes(kit, compress=True))
+    await ClockCycles(dut.clk_pixel, UART_PERIOD*2)
+    assert loaded == kit[0] + kit[1]
+    assert offsets == [5, 7]
+
+    # Doesn't fit in slot 1: the compressed frame must still be skipped
+    await write_uart(dut, update_bytes(1, 5, kit[0], compress=True))
+    await wait_update_done(dut)
+    assert updates == []
+
+    new_sample = [-500*i for i in range(8)]
+    await write_uart(dut, update_bytes(1, 5, new_sample, compress=True))
+    await wait_update_done(dut)
+    assert update_addrs == [5]
+    assert updates == new_sample + [0]*8
+
+
+def is_runner():
+    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
+    sim = os.getenv("SIM", "icarus")
+    #sim = os.getenv("SIM","vivado")
+    proj_path = Path(__file__).resolve().parent.parent
+    sys.path.append(str(proj_path / "sim" / "model"))
+    sources = [proj_path / "hdl" / "sample_loader.sv"]
+    sources += [proj_path / "hdl" / "uart_receive.sv"]
+    sources += [proj_path / "hdl" / "rice_decoder.sv"]
+    build_test_args = ["-Wall"]
+    parameters = {'INSTRUMENT_COUNT': INSTRUMENT_COUNT}
+    hdl_toplevel = "sample_loader"
+    sys.path.append(str(proj_path / "sim"))
+    runner = get_runner(sim)
+    runner.build(
+        sources=sources,
+        hdl_toplevel=hdl_toplevel,
+        always=False,
+        build_args=build_test_args,
+        parameters=parameters,
+        timescale = ('1ns','1ps')
+    )
+    run_test_args = []
+    runner.test(
+        hdl_toplevel=hdl_toplevel,
+        test_module=test_file,
+        test_args=run_test_args
+    )
+
+if __name__ == "__main__":
+    is_runner()
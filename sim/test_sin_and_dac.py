@@ -4,6 +4,7 @@ from cocotb.triggers import Timer
 import os
 from pathlib import Path
 import sys
+import headless
 import matplotlib.pyplot as plt
 import scipy.fftpack
 import numpy as np
@@ -22,7 +23,7 @@ from cocotb.triggers import (
     Join,
 )
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from build_cache import get_runner
 
 from random import getrandbits
 
@@ -91,7 +92,7 @@ async def test_sin_and_dac(dut):
     ax2.set_xscale("log")
     ax2.set_ybound(-120, 1)
     ax2.set_xbound(20, sample_rate // 2)
-    plt.show()
+    headless.show_figures('sin_and_dac')
 
 
 def test_sin_and_dac_runner():
@@ -112,18 +113,16 @@ def test_sin_and_dac_runner():
     runner.build(
         sources=sources,
         hdl_toplevel="sin_and_dac",
-        always=True,
+        always=False,
         build_args=build_test_args,
         parameters=parameters,
         timescale=("1ns", "1ps"),
-        waves=True,
     )
     run_test_args = []
     runner.test(
         hdl_toplevel="sin_and_dac",
         test_module="test_sin_and_dac",
         test_args=run_test_args,
-        waves=True,
     )
 
 
@@ -5,6 +5,7 @@ import os
 from pathlib import Path
 import sys
 import math
+import headless
 import matplotlib.pyplot as plt
 import test_sin_gen_response
 
@@ -21,7 +22,7 @@ from cocotb.triggers import (
     Join,
 )
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from build_cache import get_runner
 
 from random import getrandbits
 
@@ -86,7 +87,7 @@ async def test_sin_gen(dut):
             for i in range(1 + avg_size, len(angles) - avg_size)
         ],
     )
-    plt.show()
+    headless.show_figures('sin_gen')
 
 
 def test_sin_gen_runner():
@@ -105,24 +106,21 @@ def test_sin_gen_runner():
     runner.build(
         sources=sources,
         hdl_toplevel="sin_gen",
-        always=True,
+        always=False,
         build_args=build_test_args,
         parameters=parameters,
         timescale=("1ns", "1ps"),
-        waves=True,
     )
     run_test_args = []
     runner.test(
         hdl_toplevel="sin_gen",
         test_module="test_sin_gen",
         test_args=run_test_args,
-        waves=True,
     )
     runner.test(
         hdl_toplevel="sin_gen",
         test_module="test_sin_gen_response",
         test_args=run_test_args,
-        waves=True,
     )
 
 
@@ -1,4 +1,5 @@
 import cocotb
+import headless
 import matplotlib.pyplot as plt
 import scipy.fftpack
 import numpy as np
@@ -17,7 +18,7 @@ from cocotb.triggers import (
     Join,
 )
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from build_cache import get_runner
 
 
 async def reset(rst, clk):
@@ -59,4 +60,4 @@ async def test_sin_gen_response(dut):
     fig, ax = plt.subplots()
     ax.semilogy(xf, 2.0 / N * np.abs(fft[: N // 2]))
     ax.set_ybound(1 / 100000, 1)
-    plt.show()
+    headless.show_figures('sin_gen_response')
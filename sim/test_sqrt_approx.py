@@ -4,6 +4,7 @@ from cocotb.triggers import Timer
 import os
 from pathlib import Path
 import sys
+import headless
 import matplotlib.pyplot as plt
 import math
 
@@ -20,7 +21,7 @@ from cocotb.triggers import (
     Join,
 )
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from build_cache import get_runner
 
 from random import getrandbits
 
@@ -59,7 +60,7 @@ async def test_sqrt_approx(dut):
     fig, ax = plt.subplots()
     ax.plot(vals)
     ax.plot(true_vals)
-    plt.show()
+    headless.show_figures('sqrt_approx')
 
 
 def test_sqrt_approx_runner():
@@ -78,18 +79,16 @@ def test_sqrt_approx_runner():
     runner.build(
         sources=sources,
         hdl_toplevel="sqrt_approx",
-        always=True,
+        always=False,
         build_args=build_test_args,
         parameters=parameters,
         timescale=("1ns", "1ps"),
-        waves=True,
     )
     run_test_args = []
     runner.test(
         hdl_toplevel="sqrt_approx",
         test_module="test_sqrt_approx",
         test_args=run_test_args,
-        waves=True,
     )
 
 
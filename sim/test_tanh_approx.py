@@ -7,7 +7,8 @@ from pathlib import Path
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from build_cache import get_runner
+import headless
 import matplotlib.pyplot as plt
 import wave
 import numpy as np
@@ -15,69 +16,67 @@ import numpy as np
 test_file = os.path.basename(__file__).replace(".py","")
 
 
-def tanh_approx_float(x):
-    n = x*2**30 + x*2**31 + x**3
-    d = 2**30 + x**2 + 2*x**2
-    return n/d
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+from tanh_approx_model import tanh_approx, tanh_approx_float
 
 
-def tanh_approx(x):
-    x = np.int64(x)
-    n = (x<<30) + (x<<31) + x**3
-    d = (1<<30) + x**2 + ((x**2)<<1)
-    n_sign = n < 0
-    out = abs(n)//d
-    if n_sign:
-        out = -out
-    return out
+async def stream_inputs(dut, samples, y):
+    # tanh_approx is iterative and only accepts din in IDLE, so keep
+    # din_valid high and present the next input in the cycle its previous
+    # result comes out (the cycle the FSM is back in IDLE)
+    dut.din.value = int(samples[0])
+    dut.din_valid.value = 1
+    for sample in samples[1:]:
+        await RisingEdge(dut.dout_valid)
+        await ReadOnly()
+        y.append(dut.dout.value.signed_integer)
+        await FallingEdge(dut.clk)
+        dut.din.value = int(sample)
+    await RisingEdge(dut.dout_valid)
+    await ReadOnly()
+    y.append(dut.dout.value.signed_integer)
 
 
 @cocotb.test()
-async def test_a(dut):
-    samples = np.linspace(-2**15, 2**15-1, 100)
-
-    fig, ax = plt.subplots()
-    y = []
-    y_tanh = []
-    y_expected = []
+async def test_exhaustive(dut):
+    # Every 16-bit input, against the model computed in one pass
+    samples = np.arange(-2**15, 2**15, dtype=np.int64)
+    y_expected = tanh_approx(samples)
+    y_tanh = 2**15 * np.tanh(3 * samples / 2**15)
 
     cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
+    dut.din_valid.value = 0
     dut.rst.value = 1
     await ClockCycles(dut.clk, 2)
     dut.rst.value = 0
 
-    for sample in samples:
-        sample = int(sample)
-
-        dut.din_valid.value = 1
-        dut.din.value = int(sample)
-
-        await ClockCycles(dut.clk, 1)
-        while dut.dout_valid == 0:
-            dut.din_valid.value = 0
-            await ClockCycles(dut.clk, 1)
-
-        dout = dut.dout.value.signed_integer
-        y.append(dout)
-
-        dout_tanh = 2**15 * math.tanh(3 * sample / 2**15)
-        y_tanh.append(dout_tanh)
-
-        dout_expected = tanh_approx(sample)
-        y_expected.append(dout_expected)
-
-        print(f'Received: {dout}, Expected: {dout_expected}')
-        assert dout == dout_expected
-
-    ax.plot(samples, y_expected, label='Expected')
-    ax.plot(samples, y, label='Actual')
-    ax.plot(samples, y_tanh, color='black', linestyle='dashed', label='tanh')
-
-    ax.set_xlabel('Input')
-    ax.set_ylabel('Output')
-    ax.legend()
+    y = []
+    await stream_inputs(dut, samples, y)
+    y = np.array(y, dtype=np.int64)
+
+    mismatches = np.nonzero(y != y_expected)[0]
+    for i in mismatches[:10]:
+        print(f'Input: {samples[i]}, Received: {y[i]}, Expected: {y_expected[i]}')
+    assert len(mismatches) == 0, f'{len(mismatches)} mismatches'
+
+    error = y - y_tanh
+    worst = np.argmax(np.abs(error))
+    error_float = y - tanh_approx_float(samples.astype(np.float64))
+    print(f'Max error vs 2**15*tanh(3x/2**15): {error[worst]:.2f} LSB '
+          f'({20*np.log10(abs(error[worst])/2**15):.1f} dBFS) at input {samples[worst]}, '
+          f'RMS {np.sqrt(np.mean(error**2)):.2f} LSB')
+    print(f'Max error vs the rational approximation (rounding): {np.max(np.abs(error_float)):.3f} LSB')
+
+    fig, ax = plt.subplots(2, 1, sharex=True)
+    ax[0].plot(samples, y, label='Actual')
+    ax[0].plot(samples, y_tanh, color='black', linestyle='dashed', label='tanh')
+    ax[0].set_ylabel('Output')
+    ax[0].legend()
+    ax[1].plot(samples, error)
+    ax[1].set_xlabel('Input')
+    ax[1].set_ylabel('Error vs tanh [LSB]')
     fig.tight_layout()
-    plt.show()
+    headless.show_figures('tanh_approx')
 
 
 def is_runner():
@@ -96,18 +95,16 @@ def is_runner():
     runner.build(
         sources=sources,
         hdl_toplevel=hdl_toplevel,
-        always=True,
+        always=False,
         build_args=build_test_args,
         parameters=parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
+        timescale = ('1ns','1ps')
     )
     run_test_args = []
     runner.test(
         hdl_toplevel=hdl_toplevel,
         test_module=test_file,
-        test_args=run_test_args,
-        waves=True
+        test_args=run_test_args
     )
 
 if __name__ == "__main__":
@@ -0,0 +1,99 @@
+import cocotb
+import os
+import sys
+import logging
+from pathlib import Path
+from cocotb.clock import Clock
+from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
+from cocotb.utils import get_sim_time as gst
+from build_cache import get_runner
+#from vicoco.vivado_runner import get_runner
+test_file = os.path.basename(__file__).replace(".py","")
+
+
+CLK_FREQ = 100e6
+UART_BAUD = 1500000
+UART_PERIOD = int(CLK_FREQ / UART_BAUD)  # Number of clk cycles per UART bit
+
+
+def param_frame(param_key, param_value):
+    return bytes([(param_key << 2) + (param_value >> 8), param_value & 0xFF])
+
+
+def note_frame(instrument, velocity):
+    param_key = 13 + (instrument >> 3)
+    return param_frame(param_key, ((instrument & 0b111) << 7) + velocity)
+
+
+async def write_uart(dut, data):
+    for byte in data:
+        bits = [0] + [(byte >> i) & 1 for i in range(8)] + [1]
+        for bit in bits:
+            dut.uart_din.value = bit
+            await ClockCycles(dut.clk, UART_PERIOD)
+
+
+async def note_monitor(dut, notes):
+    while True:
+        await RisingEdge(dut.clk)
+        if dut.note_valid.value == 1:
+            notes.append((int(dut.note_instrument.value), int(dut.note_velocity.value)))
+
+
+@cocotb.test()
+async def test_params_and_notes(dut):
+    cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
+    dut.uart_din.value = 1
+    dut.en.value = 1
+    dut.hold.value = 0
+    dut.rst.value = 1
+    await ClockCycles(dut.clk, 2)
+    dut.rst.value = 0
+
+    notes = []
+    cocotb.start_soon(note_monitor(dut, notes))
+
+    await write_uart(dut, param_frame(0, 1000) + param_frame(9, 3) + param_frame(12, 512))
+    await ClockCycles(dut.clk, UART_PERIOD*2)
+    assert dut.volume.value == 1000
+    assert dut.filter_cutoff.value == 3
+    assert dut.delay_rate_fast.value == 1
+    assert notes == []
+
+    await write_uart(dut, note_frame(0, 127) + note_frame(7, 1) + note_frame(9, 64) + param_frame(1, 700))
+    await ClockCycles(dut.clk, UART_PERIOD*2)
+    assert notes == [(0, 127), (7, 1), (9, 64)]
+    assert dut.pitch.value == 700
+    assert dut.volume.value == 1000
+
+
+def is_runner():
+    hdl_toplevel_lang = os.getenv("HDL_TOPLEVEL_LANG", "verilog")
+    sim = os.getenv("SIM", "icarus")
+    #sim = os.getenv("SIM","vivado")
+    proj_path = Path(__file__).resolve().parent.parent
+    sys.path.append(str(proj_path / "sim" / "model"))
+    sources = [proj_path / "hdl" / "uart_param_controller.sv"]
+    sources += [proj_path / "hdl" / "uart_receive.sv"]
+    build_test_args = ["-Wall"]
+    parameters = {}
+    hdl_toplevel = "uart_param_controller"
+    sys.path.append(str(proj_path / "sim"))
+    runner = get_runner(sim)
+    runner.build(
+        sources=sources,
+        hdl_toplevel=hdl_toplevel,
+        always=False,
+        build_args=build_test_args,
+        parameters=parameters,
+        timescale = ('1ns','1ps')
+    )
+    run_test_args = []
+    runner.test(
+        hdl_toplevel=hdl_toplevel,
+        test_module=test_file,
+        test_args=run_test_args
+    )
+
+if __name__ == "__main__":
+    is_runner()
@@ -8,15 +8,22 @@ from pathlib import Path
 from cocotb.clock import Clock
 from cocotb.triggers import Timer, ClockCycles, RisingEdge, FallingEdge, ReadOnly,with_timeout
 from cocotb.utils import get_sim_time as gst
-from cocotb.runner import get_runner
+from build_cache import get_runner
+import headless
 import matplotlib.pyplot as plt
+import numpy as np
+from sample_stream import drive_samples, SampleMonitor
 #from vicoco.vivado_runner import get_runner
 test_file = os.path.basename(__file__).replace(".py","")
 
+sys.path.append(str(Path(__file__).resolve().parent / "model"))
+import upsampler_model
+
 
 # Module parameters
 RATIO = 4
 VOLUME_EN = 1
+VOLUME = 700
 if RATIO == 16:
     FILTER_FILE = '"DAC_filter_coeffs.mem"'
     FILTER_TAPS = 1024
@@ -37,49 +44,24 @@ SAMPLE_MAX = 2**15 - 1
 @cocotb.test()
 async def test_a(dut):
     cocotb.start_soon(Clock(dut.clk, 10, units="ns").start())
-    dut.volume.value = 700
+    dut.volume.value = VOLUME
     dut.rst.value = 1
     await ClockCycles(dut.clk, 2)
     dut.rst.value = 0
 
-    i_in = []
-    x_list = []
-
-    i_out = []
-    y_list = []
+    i_in = np.arange(0, CLOCK_CYCLES, SAMPLE_PERIOD_IN)
+    x_list = [int(SAMPLE_MAX * math.sin(2 * math.pi * F * i * 10e-9)) for i in i_in]
 
     fig, ax = plt.subplots()
 
-    last_out_cycle = None
-
-    for i in range(CLOCK_CYCLES):
-        if i % SAMPLE_PERIOD_IN == 0:
-            t = i * 10e-9
-            x = int(SAMPLE_MAX * math.sin(2 * math.pi * F * t))
-            dut.sample_in.value = x
-            dut.sample_in_valid.value = 1
-
-            i_in.append(i)
-            x_list.append(x)
-        else:
-            dut.sample_in_valid.value = 0
-
-
-        if dut.sample_out_valid.value == 1:
-            if last_out_cycle is None:
-                last_out_cycle = i
-            else:
-                assert i - last_out_cycle == SAMPLE_PERIOD_IN/RATIO
-                last_out_cycle = i
-
-            y = dut.sample_out.value.signed_integer
-
-            i_out.append(i)
-            y_list.append(y)
-
-            print(f'Received sample: {y} on clock cycle: {i}')
-
-        await ClockCycles(dut.clk, 1)
+    monitor = SampleMonitor(dut.clk, dut.sample_out, dut.sample_out_valid)
+    await drive_samples(dut.clk, dut.sample_in, dut.sample_in_valid, x_list, i_in, end=CLOCK_CYCLES)
+    monitor.stop()
+    i_out = monitor.cycles
+    y_list = monitor.samples
+    for i, y in zip(i_out, y_list):
+        print(f'Received sample: {y} on clock cycle: {i}')
+    assert all(np.diff(i_out) == SAMPLE_PERIOD_IN//RATIO)
 
     ax.plot(i_in, x_list, marker='.', label='Input')
     ax.plot(i_out, y_list, marker='.', label='Output')
@@ -89,7 +71,13 @@ async def test_a(dut):
     fig.suptitle(f'Input Frequency = {F} Hz')
     fig.tight_layout()
 
-    plt.show()
+    # Bit-exact against the polyphase model
+    y_expected = upsampler_model.upsample(x_list, RATIO, VOLUME if VOLUME_EN else None)
+    print(f'{len(y_list)} outputs, {len(x_list)} inputs')
+    assert len(y_list) > 0
+    assert y_list == y_expected[:len(y_list)].tolist()
+
+    headless.show_figures(f'upsampler_x{RATIO}')
 
 
 def is_runner():
@@ -116,18 +104,16 @@ def is_runner():
     runner.build(
         sources=sources,
         hdl_toplevel=hdl_toplevel,
-        always=True,
+        always=False,
         build_args=build_test_args,
         parameters=parameters,
-        timescale = ('1ns','1ps'),
-        waves=True
+        timescale = ('1ns','1ps')
     )
     run_test_args = []
     runner.test(
         hdl_toplevel=hdl_toplevel,
         test_module=test_file,
-        test_args=run_test_args,
-        waves=True
+        test_args=run_test_args
     )
 
 if __name__ == "__main__":
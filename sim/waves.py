@@ -0,0 +1,67 @@
+import os
+
+
+# Waveform settings for build_cache.get_runner(), from the environment
+# Used when a runner leaves waves unset; nothing is dumped unless WAVES=1.
+#   WAVES_SCOPE  comma-separated instances to dump, relative to the toplevel
+#                (e.g. upsampler_l,audio_reverb_1); default the whole design
+#   WAVES_START  ns before which nothing is dumped
+#   WAVES_STOP   ns after which nothing is dumped
+# With Icarus the scope and window go into a generated dump module (the
+# window as plusargs, so moving it does not rebuild). Other simulators dump
+# everything when WAVES=1.
+
+DUMP_MODULE = 'waves_dump'
+
+
+def is_enabled():
+    return os.getenv('WAVES', '0') not in ('', '0')
+
+
+def get_scopes(hdl_toplevel):
+    scopes = [scope.strip() for scope in os.getenv('WAVES_SCOPE', '').split(',') if scope.strip()]
+    if not scopes:
+        return [hdl_toplevel]
+    return [scope if scope.split('.')[0] == hdl_toplevel else f'{hdl_toplevel}.{scope}' for scope in scopes]
+
+
+def get_window():
+    # (start_ns, stop_ns), None where unset
+    start = os.getenv('WAVES_START')
+    stop = os.getenv('WAVES_STOP')
+    return (int(float(start)) if start else None, int(float(stop)) if stop else None)
+
+
+def get_window_plusargs():
+    start, stop = get_window()
+    plusargs = []
+    if start is not None:
+        plusargs.append(f'+waves_start={start}')
+    if stop is not None:
+        plusargs.append(f'+waves_stop={stop}')
+    return plusargs
+
+
+def get_dump_module(hdl_toplevel, dump_file):
+    # Icarus dump module in place of cocotb's, which dumps everything
+    dumpvars = ''.join(f'    $dumpvars(0, {scope});\n' for scope in get_scopes(hdl_toplevel))
+    return (
+        '`timescale 1ns / 1ps\n'
+        f'module {DUMP_MODULE}();\n'
+        '  reg [63:0] start_ns;\n'
+        '  reg [63:0] stop_ns;\n'
+        '  initial begin\n'
+        f'    $dumpfile("{dump_file}");\n'
+        f'{dumpvars}'
+        '    fork\n'
+        '      if ($value$plusargs("waves_start=%d", start_ns)) begin\n'
+        '        $dumpoff;\n'
+        '        #(start_ns) $dumpon;\n'
+        '      end\n'
+        '      if ($value$plusargs("waves_stop=%d", stop_ns)) begin\n'
+        '        #(stop_ns) $dumpoff;\n'
+        '      end\n'
+        '    join\n'
+        '  end\n'
+        'endmodule\n'
+    )